@@ -0,0 +1,148 @@
+# backend/cache.py
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+CACHE_DIR = Path.home() / ".preservica_toolkit_cache"
+CACHE_FILE = "cache.sqlite3"
+
+
+class CacheStore:
+    """Small persistent key/value store (SQLite) shared by the engines.
+
+    Values are JSON-encoded and grouped by namespace (e.g. "entity_type").
+    Every entry carries the time it was written so callers can apply a max age.
+    Safe to use from several worker threads.
+    """
+
+    def __init__(self, directory: Optional[os.PathLike] = None):
+        self.directory = Path(directory) if directory else CACHE_DIR
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / CACHE_FILE
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, updated REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            self._conn.commit()
+
+    def get(self, namespace: str, key: str, max_age: Optional[float] = None) -> Any:
+        entry = self.get_entry(namespace, key)
+        if entry is None:
+            return None
+        value, updated = entry
+        if max_age is not None and time.time() - updated > max_age:
+            return None
+        return value
+
+    def get_entry(self, namespace: str, key: str):
+        """Returns (value, updated_timestamp) or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, updated FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def get_many(self, namespace: str, keys: Iterable[str], max_age: Optional[float] = None) -> Dict[str, Any]:
+        keys = list(keys)
+        oldest = time.time() - max_age if max_age is not None else 0
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                for key, value in self._conn.execute(
+                    f"SELECT key, value FROM entries WHERE namespace = ? AND updated >= ? AND key IN ({marks})",
+                    [namespace, oldest] + chunk
+                ):
+                    found[key] = json.loads(value)
+        return found
+
+    def iter_namespace(self, namespace: str, batch: int = 5000) -> Iterator[Tuple[str, Any]]:
+        """Yields every (key, value) in a namespace, reading batch rows at a time (the lock isn't held between batches)."""
+        last = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT key, value FROM entries WHERE namespace = ? AND key > ? ORDER BY key LIMIT ?",
+                    (namespace, last, batch)
+                ).fetchall()
+            for key, value in rows:
+                yield key, json.loads(value)
+            if len(rows) < batch:
+                return
+            last = rows[-1][0]
+
+    def set(self, namespace: str, key: str, value: Any):
+        self.set_many(namespace, {key: value})
+
+    def set_many(self, namespace: str, values: Dict[str, Any]):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, updated) VALUES (?, ?, ?, ?)",
+                [(namespace, k, json.dumps(v), now) for k, v in values.items()]
+            )
+            self._conn.commit()
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+            self._conn.commit()
+
+    def clear(self, namespace: Optional[str] = None):
+        with self._lock:
+            if namespace is None:
+                self._conn.execute("DELETE FROM entries")
+            else:
+                self._conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+            self._conn.commit()
+
+
+_cache = None
+_cache_dir = None
+_cache_disabled = False
+_cache_lock = threading.Lock()
+
+
+def set_cache_dir(directory: Optional[os.PathLike]):
+    """Points the shared cache at another directory (e.g. the CLI's --cache-dir)."""
+    global _cache, _cache_dir, _cache_disabled
+    with _cache_lock:
+        _cache = None
+        _cache_dir = directory
+        _cache_disabled = False
+
+
+def disable_cache():
+    global _cache, _cache_disabled
+    with _cache_lock:
+        _cache = None
+        _cache_disabled = True
+
+
+def get_cache() -> Optional[CacheStore]:
+    """Returns the shared CacheStore, or None if it is disabled or can't be opened (caching is best-effort)."""
+    global _cache
+    with _cache_lock:
+        if _cache_disabled:
+            return None
+        if _cache is None:
+            try:
+                _cache = CacheStore(_cache_dir)
+            except Exception as e:
+                print(f"⚠️ Cache unavailable: {e}", file=sys.stderr)
+                return None
+        return _cache
@@ -0,0 +1,50 @@
+# backend/checkpoint.py
+
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+
+class Checkpoint:
+    """Append-only JSON-lines record of finished items, so an interrupted run can resume.
+
+    Each line is {"key": ..., "value": ...}. Engines record every completed
+    reference (with whatever they need to rebuild its output row) and skip
+    keys that are already present when resumed.
+    """
+
+    def __init__(self, path: str, resume: bool = True):
+        self.path = path
+        self.completed: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        if resume and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by a crash
+                    self.completed[record["key"]] = record.get("value")
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.completed
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.completed.get(key)
+
+    def record(self, key: str, value: Any = None):
+        with self._lock:
+            self.completed[key] = value
+            self._file.write(json.dumps({"key": key, "value": value}) + "\n")
+            self._file.flush()
+
+    def close(self, remove: bool = False):
+        with self._lock:
+            self._file.close()
+        if remove:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
@@ -0,0 +1,74 @@
+# backend/coalesce.py
+
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Export/bookkeeping columns the updater ignores
+IGNORED_COLUMNS = ("reference", "title", "type", "qdc_xml")
+
+
+def unique_refs(refs: Iterable[str], duplicates: Optional[List[str]] = None) -> Iterator[str]:
+    """Yields each reference once, in first-seen order; repeats are appended to duplicates if given.
+
+    Lazy, so a streamed folder listing stays streamed.
+    """
+    seen = set()
+    for ref in refs:
+        if ref in seen:
+            if duplicates is not None:
+                duplicates.append(ref)
+            continue
+        seen.add(ref)
+        yield ref
+
+
+def _blank(value) -> bool:
+    return value is None or not str(value).strip()
+
+
+def coalesce_rows(csv_rows: List[Dict[str, str]]) -> List[Dict]:
+    """Merges update-sheet rows that share a reference into one row per reference.
+
+    Returns [{reference, lines, row, conflicts}] in the order references
+    first appear (lines are sheet line numbers, the header being line 1).
+    The rules:
+      - blank cells never contribute, so each row can carry its own group of fields;
+      - a column given the same value on several rows is written once;
+      - a column given different values is a conflict: conflicts maps it to
+        [(line, value)], and the reference must not be written;
+      - the bookkeeping columns (IGNORED_COLUMNS) keep their first value and never conflict.
+    Rows without a reference are left out.
+    """
+    merged: Dict[str, Dict] = {}
+    for i, row in enumerate(csv_rows):
+        ref = (row.get("reference") or "").strip()
+        if not ref:
+            continue
+        line = i + 2
+        entry = merged.get(ref)
+        if entry is None:
+            merged[ref] = {"reference": ref, "lines": [line], "row": dict(row), "conflicts": {},
+                           "_first": {k: line for k, v in row.items() if not _blank(v)}}
+            continue
+        entry["lines"].append(line)
+        target = entry["row"]
+        for column, value in row.items():
+            if _blank(value):
+                continue
+            if _blank(target.get(column)):
+                target[column] = value
+                entry["_first"][column] = line
+            elif column not in IGNORED_COLUMNS and str(target[column]).strip() != str(value).strip():
+                values = entry["conflicts"].setdefault(column, [(entry["_first"][column], target[column])])
+                values.append((line, value))
+    for entry in merged.values():
+        del entry["_first"]
+    return list(merged.values())
+
+
+def describe_conflicts(entry: Dict) -> str:
+    """One line per conflicting column: 'dc:title: "A" (row 2) vs "B" (row 5)'."""
+    parts = []
+    for column, values in entry["conflicts"].items():
+        listed = " vs ".join(f'"{value}" (row {line})' for line, value in values)
+        parts.append(f"{column}: {listed}")
+    return "Conflicting values, nothing written: " + "; ".join(parts)
@@ -0,0 +1,280 @@
+# backend/concurrency.py
+
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+DEFAULT_WORKERS = 8
+
+
+def bounded_map(fn: Callable[[Any], Any], items: Iterable[Any], max_workers: int = DEFAULT_WORKERS,
+                ordered: bool = False) -> Iterator[Tuple[Any, Any, Optional[BaseException]]]:
+    """Runs fn over items with at most max_workers calls in flight.
+
+    Items are pulled lazily, so a paged generator (e.g. client.descendants) is
+    never materialized. Yields (item, result, error) tuples; errors are handed
+    back instead of raised so one bad reference doesn't stop the whole batch
+    (anything that isn't an Exception, such as a job cancellation, is re-raised).
+    With ordered=True results come back in input order (a small reorder window
+    is kept so a single slow call can't make the buffer grow without bound).
+    """
+    max_workers = max(1, int(max_workers))
+    window = max_workers * 4
+    source = iter(items)
+    exhausted = False
+    next_seq = 0
+    emit_seq = 0
+    pending = {}
+    ready = {}
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        while True:
+            # Keep the pool full, but never let finished-but-unemitted results pile up
+            while not exhausted and len(pending) < max_workers and len(pending) + len(ready) < window:
+                try:
+                    item = next(source)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[executor.submit(fn, item)] = (next_seq, item)
+                next_seq += 1
+
+            if not pending:
+                break
+
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                seq, item = pending.pop(future)
+                error = future.exception()
+                if error is not None and not isinstance(error, Exception):
+                    raise error
+                result = None if error else future.result()
+                if ordered:
+                    ready[seq] = (item, result, error)
+                else:
+                    yield item, result, error
+
+            if ordered:
+                while emit_seq in ready:
+                    yield ready.pop(emit_seq)
+                    emit_seq += 1
+
+        while ordered and emit_seq in ready:
+            yield ready.pop(emit_seq)
+            emit_seq += 1
+    finally:
+        # If the consumer stopped early, don't start anything that hasn't begun yet
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Items a prefetch() producer may run ahead of its consumer
+PREFETCH_ITEMS = 5000
+
+
+class _SourceEnded:
+    """Queued by a prefetch() producer after its last item; error is what stopped the source, if anything."""
+
+    def __init__(self, error: Optional[BaseException] = None):
+        self.error = error
+
+
+def prefetch(items: Iterable[Any], max_items: int = PREFETCH_ITEMS) -> Iterator[Any]:
+    """Iterates items in a background thread, at most max_items ahead of the consumer.
+
+    For pipelines whose source is slow in its own right, such as a paged
+    tree listing feeding bounded_map: the listing keeps paging while the
+    workers fetch, instead of each page waiting for a free worker slot, so
+    the total time is the longer of the two rather than their sum. Anything
+    the source raises (a job cancellation included) is re-raised to the
+    consumer; closing the consumer stops the producer at its next item.
+    """
+    buffer = queue.Queue(max_items)
+    stop = threading.Event()
+
+    def put(entry) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(_SourceEnded(e))
+            return
+        put(_SourceEnded())
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item = buffer.get()
+            if isinstance(item, _SourceEnded):
+                if item.error is not None:
+                    raise item.error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+class RateLimiter:
+    """Spaces calls out to at most `rate` per second across every thread sharing it.
+
+    acquire() blocks until the caller's slot comes up; rate None or 0 means no limit.
+    """
+
+    def __init__(self, rate: Optional[float] = None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+# AIMD tuning for AdaptiveLimit
+ADAPTIVE_INITIAL = 8
+ADAPTIVE_MIN = 1
+# Once the limit has had to back off, it grows by one at most this often (seconds)
+INCREASE_INTERVAL = 2.0
+# Multiplicative decrease on a 429/503, and (gentler) on a latency spike
+THROTTLE_DECREASE = 0.5
+LATENCY_DECREASE = 0.75
+# A method's recent latency counts as a spike above this multiple of its long-run average...
+LATENCY_SPIKE_RATIO = 2.0
+# ...and only once it is this much slower in absolute terms, so fast calls' jitter is ignored
+LATENCY_SPIKE_MIN_SECONDS = 0.05
+# Calls of a method seen before its latency is trusted for spike detection
+LATENCY_WARMUP = 20
+# Longest Retry-After honoured
+MAX_RETRY_AFTER = 120.0
+THROTTLE_STATUSES = (429, 503)
+# Longest gap enforced between two decreases (normally the slowest method's average latency)
+MAX_DECREASE_COOLDOWN = 5.0
+# How urllib3 reports a status it gave up retrying (pyPreservica's session retries 502-504 itself)
+_RETRIES_EXHAUSTED = re.compile(r"too many (\d{3}) error responses")
+
+
+def http_status(error: BaseException) -> Optional[int]:
+    """HTTP status behind an API error (pyPreservica's http_status_code, or a requests response)."""
+    status = getattr(error, "http_status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is None:
+        match = _RETRIES_EXHAUSTED.search(str(error))
+        status = match.group(1) if match else None
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or an HTTP date), capped at MAX_RETRY_AFTER."""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+class AdaptiveLimit:
+    """AIMD controller for how many API requests may be in flight.
+
+    Until the first back-off, every healthy call that finished while the
+    limit was in use adds 1/limit (about +1 per round of calls); after that
+    the limit creeps up by one per INCREASE_INTERVAL of healthy, saturated
+    traffic, so it hovers just under what the server tolerates instead of
+    overshooting it every few calls. A 429/503 halves the limit and a
+    latency spike (a method's recent average well above its long-run one)
+    cuts it by a quarter, at most once per cooldown so one burst of
+    failures counts once. Retry-After pauses every request until it has
+    passed. The limit stays within [minimum, maximum].
+    """
+
+    def __init__(self, initial: int = ADAPTIVE_INITIAL, minimum: int = ADAPTIVE_MIN, maximum: int = 64):
+        self.minimum = max(1, int(minimum))
+        self.maximum = max(self.minimum, int(maximum))
+        self.window = float(min(max(initial, self.minimum), self.maximum))
+        self.throttled = 0
+        self.spikes = 0
+        self.resume_at = 0.0
+        self._latency: Dict[str, list] = {}  # method -> [count, fast average, slow average]
+        self._last_decrease = 0.0
+        self._last_increase = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        return int(self.window)
+
+    def set_maximum(self, maximum: int):
+        with self._lock:
+            self.maximum = max(self.minimum, int(maximum))
+            self.window = min(self.window, self.maximum)
+
+    def pause_remaining(self) -> float:
+        return max(0.0, self.resume_at - time.monotonic())
+
+    def pause(self, seconds: float):
+        """Holds every new request for `seconds` (a Retry-After)."""
+        with self._lock:
+            self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+
+    def _decrease(self, factor: float) -> bool:
+        now = time.monotonic()
+        slowest = max((s for _, _, s in self._latency.values()), default=0.0)
+        if now - self._last_decrease < max(1.0, min(slowest, MAX_DECREASE_COOLDOWN)):
+            return False
+        self._last_decrease = self._last_increase = now
+        self.window = max(self.minimum, self.window * factor)
+        return True
+
+    def on_success(self, method: str, seconds: float, saturated: bool = True):
+        """A call finished normally; saturated = the limit was in use, so growing it could help."""
+        with self._lock:
+            stats = self._latency.setdefault(method, [0, seconds, seconds])
+            stats[0] += 1
+            stats[1] += 0.3 * (seconds - stats[1])
+            stats[2] += 0.02 * (seconds - stats[2])
+            count, fast, slow = stats
+            if (count > LATENCY_WARMUP and fast > slow * LATENCY_SPIKE_RATIO
+                    and fast - slow > LATENCY_SPIKE_MIN_SECONDS):
+                if self._decrease(LATENCY_DECREASE):
+                    self.spikes += 1
+            elif saturated and not self._last_decrease:
+                self.window = min(self.maximum, self.window + 1.0 / self.window)
+            elif saturated and time.monotonic() - self._last_increase >= INCREASE_INTERVAL:
+                self._last_increase = time.monotonic()
+                self.window = min(self.maximum, self.window + 1.0)
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        """A 429/503 came back: back off, and hold every request for retry_after seconds if the server said so."""
+        with self._lock:
+            self.throttled += 1
+            self._decrease(THROTTLE_DECREASE)
+            if retry_after:
+                self.resume_at = max(self.resume_at, time.monotonic() + retry_after)
@@ -0,0 +1,250 @@
+# backend/export_engine.py
+
+import threading
+import time
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterable, List, Optional
+from .coalesce import unique_refs
+from .concurrency import bounded_map, prefetch
+from .export_utils import ParquetStream, detect_format, write_rows, write_summary
+from .instrumentation import stage
+from .jobs import JobCancelled, NullProgress
+from .row_buffer import RowBuffer
+from .subtree_stats import count_in_background
+from .traversal import iter_descendants
+from .metadata_utils import resolve_entity, qdc_columns, schema_columns, is_qdc_schema, QDC_ALIAS
+
+EXPORT_BASE_FIELDS = ["reference", "title", "type"]
+DEFAULT_EXPORT_WORKERS = 8
+# Most metadata blocks fetched at once for a single entity
+BLOCK_WORKERS = 4
+
+
+def schema_allowed(schema: str, schemas: Optional[Iterable[str]]) -> bool:
+    """True if a block's schema passes the allow-list (None = every block; "qdc" = the QDC block)."""
+    if schemas is None:
+        return True
+    return schema in schemas or (QDC_ALIAS in schemas and is_qdc_schema(schema))
+
+
+def fetch_export_row(client, ref: str, cache=None, schemas: Optional[Iterable[str]] = None) -> Dict[str, str]:
+    """Builds one export row: reference/title/type, then every metadata block's columns.
+
+    The QDC block gives the raw qdc_xml plus dc:*/dcterms:* columns; any other
+    schema gives schema::element(.N) columns, the header format the Update tab
+    writes back. Blocks are fetched concurrently; schemas limits which are fetched.
+    """
+    entity, etype = resolve_entity(client, ref, cache)
+    return entity_export_row(client, entity, etype, schemas)
+
+
+def entity_export_row(client, entity, etype: str, schemas: Optional[Iterable[str]] = None) -> Dict[str, str]:
+    """fetch_export_row for an entity already fetched: only its metadata blocks are downloaded."""
+    row = {
+        "reference": entity.reference,
+        "title": entity.title,
+        "type": etype,
+        "qdc_xml": ""
+    }
+
+    blocks = [(url, schema) for url, schema in (entity.metadata or {}).items() if schema_allowed(schema, schemas)]
+
+    def fetch_block(block):
+        return client.metadata(block[0]).strip()
+
+    def fetch_inline(block):
+        try:
+            return block, fetch_block(block), None
+        except Exception as e:
+            return block, None, e
+
+    if len(blocks) > 1:
+        fetched = bounded_map(fetch_block, blocks, max_workers=min(len(blocks), BLOCK_WORKERS), ordered=True)
+    else:
+        fetched = (fetch_inline(block) for block in blocks)
+
+    # The first QDC-like block is the QDC block (find_qdc_url); any later one is exported as a custom schema
+    qdc_url = next((url for url, schema in blocks if is_qdc_schema(schema)), None)
+    for (url, schema), xml, error in fetched:
+        if error is not None:
+            # One unreadable block shouldn't cost the whole row, same as a block that doesn't parse
+            print(f"⚠️ Skipped the {schema} block of {entity.reference}: {error}")
+            continue
+        try:
+            with stage(client, "parse"):
+                if url == qdc_url:
+                    row["qdc_xml"] = xml
+                    row.update(qdc_columns(xml))
+                else:
+                    row.update(schema_columns(schema, xml))
+        except ET.ParseError:
+            continue
+    return row
+
+
+def export_headers(fieldnames) -> List[str]:
+    """reference, title, type first; every other column (qdc_xml, dc:*, ...) sorted after them."""
+    headers = sorted(set(fieldnames) - set(EXPORT_BASE_FIELDS))
+    return EXPORT_BASE_FIELDS + headers
+
+
+def _write_export(client, results, out_path: str, fmt: Optional[str], checkpoint, progress,
+                  fieldnames) -> Dict:
+    """Consumes (key, row, error) results into out_path, recording rows in the checkpoint.
+
+    Parquet output is streamed in row groups as rows arrive; the other
+    formats need every dc:* column before the header can be written, so rows
+    are collected in a columnar RowBuffer (qdc_xml compressed) until the end.
+    If the job is cancelled, the rows finished so far are still written out
+    as a complete file and the summary is marked "cancelled".
+    """
+    fmt = detect_format(out_path, fmt)
+    stream = ParquetStream(out_path, column_order=export_headers) if fmt == "parquet" else None
+    fieldnames = set(fieldnames)
+    rows = RowBuffer()
+    written = 0
+    failed = 0
+    cancelled = False
+    started = time.monotonic()
+    first_row = None
+
+    try:
+        for key, row, error in results:
+            if error is not None or not row:
+                failed += 1
+                progress.advance(failed=1)
+                continue
+            if checkpoint is not None and key not in checkpoint:
+                checkpoint.record(key, row)
+            if stream is not None:
+                with stage(client, "write"):
+                    stream.write(row)
+            else:
+                rows.append(row)
+            written += 1
+            if first_row is None:
+                first_row = round(time.monotonic() - started, 3)
+            progress.advance()
+    except JobCancelled:
+        cancelled = True  # in-flight fetches are abandoned; what finished is still written below
+    except BaseException:
+        if stream is not None:
+            stream.close()  # keep the rows written so far
+        raise
+
+    summary = {"path": out_path, "rows": written, "failed": failed, "first_row_seconds": first_row}
+    if cancelled:
+        summary["cancelled"] = True
+    with stage(client, "write"):
+        if stream is not None:
+            stream.close()
+        else:
+            headers = export_headers(fieldnames | set(rows.columns()))
+            summary.update(write_summary(client, write_rows(out_path, rows, headers, fmt)))
+    return summary
+
+
+def export_metadata(client, refs: Iterable[str], out_path: str, fmt: Optional[str] = None,
+                    max_workers: int = DEFAULT_EXPORT_WORKERS, checkpoint=None, progress=None,
+                    cache=None, schemas: Optional[Iterable[str]] = None, row_cache=None) -> Dict:
+    """Exports metadata for refs (assets or folders) to out_path, keeping the input order.
+
+    Entities are fetched concurrently; schemas is an optional allow-list of
+    block schemas ("qdc" for the QDC block) so unneeded blocks are never
+    downloaded. With a Checkpoint, finished rows are
+    recorded as they arrive and rows already in it are reused without any API
+    calls; a RowCache (row_cache) likewise serves rows the Browser preview has
+    just fetched. Invalid references are skipped and counted as failed.
+    refs may also be a lazy iterable (see export_folder); the total is then
+    left for the caller to set. A reference listed more than once is
+    exported once, at its first position; the summary counts the duplicates.
+    """
+    progress = progress or NullProgress()
+    duplicates = []
+    if hasattr(refs, "__len__"):
+        refs = list(unique_refs(refs, duplicates))
+        progress.set_total(len(refs))
+    else:
+        refs = unique_refs(refs, duplicates)
+
+    def fetch(ref):
+        if checkpoint is not None and ref in checkpoint:
+            return checkpoint.get(ref)
+        if row_cache is not None:
+            row = row_cache.get(ref, schemas)
+            if row is not None:
+                return row
+        return fetch_export_row(client, ref, cache, schemas)
+
+    results = bounded_map(fetch, refs, max_workers=max_workers, ordered=True)
+    summary = _write_export(client, results, out_path, fmt, checkpoint, progress,
+                            {"reference", "title", "type", "qdc_xml"})
+    summary["duplicates"] = len(duplicates)
+    return summary
+
+
+def export_folder(client, folder_ref: str, out_path: str, fmt: Optional[str] = None,
+                  max_workers: int = DEFAULT_EXPORT_WORKERS, checkpoint=None, progress=None, cache=None,
+                  schemas: Optional[Iterable[str]] = None, row_cache=None, stats=None) -> Dict:
+    """Exports every asset below folder_ref (recursive), fetching while the tree is still being listed.
+
+    The first rows are fetched as soon as the first listing page arrives,
+    and the listing keeps going while they are, so the export takes about
+    as long as the slower of the two.
+
+    With stats (a SubtreeStats) the asset count is taken from its cache or
+    counted in the background, and becomes the progress total once known;
+    until then progress is indeterminate. Otherwise as export_metadata.
+    """
+    progress = progress or NullProgress()
+    stop = threading.Event()
+    if stats is not None:
+        count_in_background(stats, folder_ref, lambda counts: progress.set_total(counts["assets"]), stop)
+    # The listing runs in its own thread, paging ahead of the fetchers through a bounded queue
+    refs = prefetch(asset.reference for asset in iter_descendants(client, folder_ref, assets_only=True))
+    try:
+        return export_metadata(client, refs, out_path, fmt=fmt, max_workers=max_workers, checkpoint=checkpoint,
+                               progress=progress, cache=cache, schemas=schemas, row_cache=row_cache)
+    finally:
+        stop.set()
+
+
+def export_folder_indexed(client, search, folder_ref: str, out_path: str, fields: Optional[List[str]] = None,
+                          fmt: Optional[str] = None, max_workers: int = DEFAULT_EXPORT_WORKERS,
+                          checkpoint=None, progress=None, cache=None) -> Dict:
+    """Exports every asset below folder_ref from the search index (a SearchIndexBackend).
+
+    fields are dc:*/dcterms:* columns (default: every QDC field the index
+    holds); repeated values become dc:subject, dc:subject.1, ... as in the
+    regular export. Fields the index doesn't hold are fetched per asset, and
+    only then. There is no qdc_xml column: the raw block isn't indexed.
+    """
+    progress = progress or NullProgress()
+    fields = list(fields) if fields else search.qdc_columns()
+    columns = ["title"] + [f for f in fields if f != "title"]
+    _, fallback = search.split_columns(columns)
+    progress.set_total(search.count(folder_ref))
+
+    def fetch(item):
+        ref, values = item
+        if checkpoint is not None and ref in checkpoint:
+            return checkpoint.get(ref)
+        row = {"reference": ref, "type": "ASSET", **values}
+        if fallback:
+            full = fetch_export_row(client, ref, cache, schemas=[QDC_ALIAS])
+            for key, value in full.items():
+                if key.split(".")[0] in fallback:
+                    row[key] = value
+        return row
+
+    hits = search.iter_subtree(folder_ref, columns, repeat_suffixes=True)
+    if fallback:
+        results = ((ref, row, error) for (ref, _), row, error in
+                   bounded_map(fetch, hits, max_workers=max_workers, ordered=True))
+    else:
+        # Everything comes from the index: no per-asset calls, no thread pool
+        results = ((item[0], fetch(item), None) for item in hits)
+    summary = _write_export(client, results, out_path, fmt, checkpoint, progress,
+                            set(EXPORT_BASE_FIELDS) | set(fields))
+    summary["fallback_fields"] = fallback
+    return summary
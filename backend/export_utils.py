@@ -1,26 +1,470 @@
-from openpyxl import Workbook
+import csv
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+from xml.sax.saxutils import escape
 from openpyxl.utils import get_column_letter
+from .instrumentation import metrics_for
+
+FORMATS = ("xlsx", "csv", "jsonl", "parquet")
+
+# Excel's hard limit is 1,048,576 rows per sheet, one of which is the header
+XLSX_MAX_SHEET_ROWS = 1048575
+# A new .xlsx file is started once the current one reaches this size on disk
+XLSX_MAX_FILE_BYTES = 256 * 1024 * 1024
+# Fast deflate: xlsx output is dominated by compression time at higher levels
+XLSX_COMPRESS_LEVEL = 1
+XLSX_SHEET_TITLE = "Metadata Export"
+
+# Rows per Parquet row group (also the most rows held in memory while streaming)
+PARQUET_ROW_GROUP_SIZE = 10000
+PARQUET_COMPRESSION = "zstd"
+
+
+def detect_format(path, fmt=None):
+    """Returns the output format: the explicit fmt, else the file extension (default xlsx)."""
+    if fmt:
+        fmt = fmt.lower().lstrip(".")
+    else:
+        fmt = os.path.splitext(path)[1].lower().lstrip(".") or "xlsx"
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported output format: {fmt} (expected one of {', '.join(FORMATS)})")
+    return fmt
+
 
 def export_to_xlsx(path, rows, fieldnames):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Metadata Export"
-
-    # Write headers
-    for col_idx, field in enumerate(fieldnames, start=1):
-        ws.cell(row=1, column=col_idx, value=field)
-
-    # Write rows, force cell format to "Text"
-    for row_idx, row in enumerate(rows, start=2):
-        for col_idx, field in enumerate(fieldnames, start=1):
-            val = row.get(field, "")
-            cell = ws.cell(row=row_idx, column=col_idx, value=val)
-            cell.number_format = "@"  # This locks the cell as plain text
-
-    # Optional: Set each column format to text explicitly (redundant but safe)
-    for col_idx in range(1, len(fieldnames) + 1):
-        col_letter = get_column_letter(col_idx)
-        ws.column_dimensions[col_letter].number_format = "@"
-
-    wb.save(path)
-    return path
+    """Writes rows to path as text cells; returns the XlsxStream stats (files, rows/sec, ...)."""
+    with XlsxStream(path, fieldnames) as stream:
+        for row in rows:
+            stream.write(row)
+    return stream.stats()
+
+
+def write_rows(path, rows, fieldnames, fmt=None):
+    """Writes a complete set of row dicts in the requested format (xlsx, csv, jsonl or parquet).
+
+    Returns the writer's stats (see RowStream.stats).
+    """
+    with RowStream(path, fieldnames, fmt) as stream:
+        for row in rows:
+            stream.write(row)
+    return stream.stats()
+
+
+def write_summary(client, stats) -> dict:
+    """Job summary fields for a writer's stats; the rate also goes to the client's metrics as a gauge."""
+    metrics = metrics_for(client)
+    if metrics is not None and stats.get("rows_per_sec"):
+        metrics.set_gauge("write_rows_per_sec", stats["rows_per_sec"])
+    summary = {"write_rows_per_sec": stats.get("rows_per_sec")}
+    if len(stats.get("files", ())) > 1:
+        summary["files"] = stats["files"]
+    return summary
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("Parquet output needs pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def _text(value):
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+
+class ParquetStream:
+    """Writes row dicts to a Parquet file in row groups; every column is a string.
+
+    With fieldnames the schema is fixed and each row group goes straight into
+    the file. Without them (the export's dynamic dc:*/dcterms:* columns) each
+    full row group is spooled to a temporary Arrow file, and close() rewrites
+    them into one Parquet file over the union of all columns (ordered by
+    column_order, default sorted). Missing values are null. Either way only
+    one row group is held in memory.
+    """
+
+    def __init__(self, path, fieldnames=None, column_order=None,
+                 row_group_size=PARQUET_ROW_GROUP_SIZE, compression=PARQUET_COMPRESSION):
+        self.pa = _require_pyarrow()
+        self.path = path
+        self.fieldnames = list(fieldnames) if fieldnames else None
+        self.column_order = column_order or sorted
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.rows = 0
+        self._buffer = []
+        self._columns = {}
+        self._writer = None
+        self._spool_dir = None
+        self._parts = []
+
+    def _schema(self, names):
+        return self.pa.schema([(name, self.pa.string()) for name in names])
+
+    def _table(self, rows, names):
+        columns = {name: [_text(row.get(name)) for row in rows] for name in names}
+        return self.pa.Table.from_pydict(columns, schema=self._schema(names))
+
+    def write(self, row):
+        self._buffer.append(row)
+        if self.fieldnames is None:
+            for key in row:
+                self._columns[key] = None
+        if len(self._buffer) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        if self.fieldnames is not None:
+            if self._writer is None:
+                self._writer = self.pa.parquet.ParquetWriter(
+                    self.path, self._schema(self.fieldnames), compression=self.compression)
+            self._writer.write_table(self._table(self._buffer, self.fieldnames))
+        else:
+            if self._spool_dir is None:
+                self._spool_dir = tempfile.mkdtemp(prefix="parquet_spool_")
+            names = list({key: None for row in self._buffer for key in row})
+            part = os.path.join(self._spool_dir, f"part-{len(self._parts):05d}.arrow")
+            self.pa.feather.write_feather(self._table(self._buffer, names), part, compression="uncompressed")
+            self._parts.append(part)
+        self.rows += len(self._buffer)
+        self._buffer = []
+
+    def close(self):
+        self._flush()
+        if self.fieldnames is not None:
+            if self._writer is None:
+                self.pa.parquet.write_table(self._table([], self.fieldnames), self.path, compression=self.compression)
+            else:
+                self._writer.close()
+                self._writer = None
+            return
+
+        names = list(self.column_order(list(self._columns)))
+        schema = self._schema(names)
+        try:
+            with self.pa.parquet.ParquetWriter(self.path, schema, compression=self.compression) as writer:
+                for part in self._parts:
+                    table = self.pa.feather.read_table(part, memory_map=True)
+                    for name in names:
+                        if name not in table.column_names:
+                            table = table.append_column(name, self.pa.nulls(table.num_rows, self.pa.string()))
+                    writer.write_table(table.select(names))
+        finally:
+            if self._spool_dir is not None:
+                shutil.rmtree(self._spool_dir, ignore_errors=True)
+                self._spool_dir = None
+            self._parts = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+# Characters XML 1.0 can't carry; openpyxl raises on them, we drop them
+_ILLEGAL_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{sheets}</Types>'
+)
+_SHEET_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{n}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>'
+)
+# One shared named cell style, "Text" (built-in number format 49 = "@"); every cell points at it
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/><family val="2"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/>'
+    '<xf numFmtId="49" fontId="0" fillId="0" borderId="0" applyNumberFormat="1"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="49" fontId="0" fillId="0" borderId="0" xfId="1" applyNumberFormat="1"/></cellXfs>'
+    '<cellStyles count="2"><cellStyle name="Normal" xfId="0" builtinId="0"/>'
+    '<cellStyle name="Text" xfId="1"/></cellStyles>'
+    '</styleSheet>'
+)
+_TEXT_STYLE_ID = 1
+
+
+def _xlsx_text(value) -> str:
+    text = _ILLEGAL_XML.sub("", value if isinstance(value, str) else str(value))
+    if text != text.strip():
+        return f'<is><t xml:space="preserve">{escape(text)}</t></is>'
+    return f"<is><t>{escape(text)}</t></is>"
+
+
+class XlsxStream:
+    """Write-only .xlsx writer for large exports: rows are streamed into the zip as they come.
+
+    openpyxl (even in write-only mode) builds an element per cell and keeps a
+    style per cell; here each row is formatted straight to sheet XML and every
+    cell points at one shared named "Text" style, so numbers-as-text such as
+    identifiers keep their leading zeros. Past XLSX_MAX_SHEET_ROWS rows a new
+    sheet is started, and past max_file_bytes a new file (name_part2.xlsx,
+    ...), each with its own header row. stats() reports the files written and
+    the write throughput.
+    """
+
+    def __init__(self, path, fieldnames, sheet_title=XLSX_SHEET_TITLE,
+                 max_sheet_rows=XLSX_MAX_SHEET_ROWS, max_file_bytes=XLSX_MAX_FILE_BYTES):
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.sheet_title = sheet_title
+        self.max_sheet_rows = max_sheet_rows
+        self.max_file_bytes = max_file_bytes
+        self.files = []
+        self.sheets = 0
+        self.rows = 0
+        self._letters = [get_column_letter(i) for i in range(1, len(self.fieldnames) + 1)]
+        self._zip = None
+        self._sheet = None
+        self._sheet_names = []
+        self._sheet_rows = 0
+        self._pending = []
+        self._pending_bytes = 0
+        self._started = time.perf_counter()
+        self._elapsed = None
+        self._open_file()
+
+    # --- files and sheets -------------------------------------------------
+
+    def _next_path(self):
+        if not self.files:
+            return self.path
+        stem, ext = os.path.splitext(self.path)
+        return f"{stem}_part{len(self.files) + 1}{ext or '.xlsx'}"
+
+    def _open_file(self):
+        path = self._next_path()
+        self.files.append(path)
+        self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=XLSX_COMPRESS_LEVEL)
+        self._sheet_names = []
+        self._open_sheet()
+
+    def _open_sheet(self):
+        n = len(self._sheet_names) + 1
+        self._sheet_names.append(self.sheet_title if n == 1 else f"{self.sheet_title} {n}"[:31])
+        self._sheet = self._zip.open(f"xl/worksheets/sheet{n}.xml", "w", force_zip64=True)
+        self._sheet_rows = 0
+        self.sheets += 1
+        cols = ""
+        if self.fieldnames:
+            cols = f'<cols><col min="1" max="{len(self.fieldnames)}" width="20" style="{_TEXT_STYLE_ID}"/></cols>'
+        self._sheet.write((
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            f'{cols}<sheetData>'
+        ).encode("utf-8"))
+        self._row(self.fieldnames)
+
+    def _close_sheet(self):
+        self._flush()
+        self._sheet.write(b"</sheetData></worksheet>")
+        self._sheet.close()
+        self._sheet = None
+
+    def _close_file(self):
+        self._close_sheet()
+        count = len(self._sheet_names)
+        sheets = "".join(
+            f'<sheet name="{escape(name, {chr(34): "&quot;"})}" sheetId="{i}" r:id="rId{i}"/>'
+            for i, name in enumerate(self._sheet_names, start=1)
+        )
+        rels = "".join(
+            f'<Relationship Id="rId{i}" '
+            f'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{i}.xml"/>'
+            for i in range(1, count + 1)
+        )
+        self._zip.writestr("[Content_Types].xml", _CONTENT_TYPES.format(
+            sheets="".join(_SHEET_CONTENT_TYPE.format(n=i) for i in range(1, count + 1))))
+        self._zip.writestr("_rels/.rels", _ROOT_RELS)
+        self._zip.writestr("xl/styles.xml", _STYLES)
+        self._zip.writestr("xl/workbook.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets>{sheets}</sheets></workbook>'
+        ))
+        self._zip.writestr("xl/_rels/workbook.xml.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'{rels}<Relationship Id="rId{count + 1}" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+            'Target="styles.xml"/></Relationships>'
+        ))
+        self._zip.close()
+        self._zip = None
+
+    # --- rows ---------------------------------------------------------------
+
+    def _row(self, values):
+        self._sheet_rows += 1
+        r = self._sheet_rows
+        cells = "".join(
+            f'<c r="{letter}{r}" t="inlineStr" s="{_TEXT_STYLE_ID}">{_xlsx_text(value)}</c>'
+            for letter, value in zip(self._letters, values)
+            if value is not None and value != ""
+        )
+        line = f'<row r="{r}">{cells}</row>'
+        self._pending.append(line)
+        self._pending_bytes += len(line)
+        if self._pending_bytes >= 1 << 20:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self._sheet.write("".join(self._pending).encode("utf-8"))
+            self._pending = []
+            self._pending_bytes = 0
+
+    def _file_size(self):
+        return self._zip.fp.tell() if self._zip is not None else 0
+
+    def write(self, row):
+        if self._sheet_rows > self.max_sheet_rows:  # header + max_sheet_rows data rows
+            self._flush()
+            if self.max_file_bytes and self._file_size() >= self.max_file_bytes:
+                self._close_file()
+                self._open_file()
+            else:
+                self._close_sheet()
+                self._open_sheet()
+        elif self.max_file_bytes and self._pending_bytes == 0 and self._file_size() >= self.max_file_bytes:
+            # Checked right after a flush, when the on-disk size is current
+            self._close_file()
+            self._open_file()
+        self._row([row.get(f, "") for f in self.fieldnames])
+        self.rows += 1
+
+    def close(self):
+        if self._zip is not None:
+            self._close_file()
+            self._elapsed = time.perf_counter() - self._started
+
+    def stats(self):
+        """{files, sheets, rows, bytes, seconds, rows_per_sec, mb_per_sec} for what has been written."""
+        seconds = self._elapsed if self._elapsed is not None else time.perf_counter() - self._started
+        size = sum(os.path.getsize(f) for f in self.files if os.path.exists(f))
+        return {
+            "files": list(self.files),
+            "sheets": self.sheets,
+            "rows": self.rows,
+            "bytes": size,
+            "seconds": round(seconds, 3),
+            "rows_per_sec": round(self.rows / seconds, 1) if seconds > 0 else None,
+            "mb_per_sec": round(size / seconds / 1e6, 2) if seconds > 0 else None,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class RowStream:
+    """Writes rows one at a time for outputs whose columns are known up front.
+
+    csv and jsonl go straight to disk, xlsx through an XlsxStream (split across
+    sheets/files at Excel's limits) and parquet in row groups, so memory stays flat.
+    """
+
+    def __init__(self, path, fieldnames, fmt=None):
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.fmt = detect_format(path, fmt)
+        self._file = None
+        self._xlsx = None
+        self._parquet = None
+        self.rows = 0
+        self._started = time.perf_counter()
+        self._elapsed = None
+        if self.fmt == "parquet":
+            self._parquet = ParquetStream(path, self.fieldnames)
+        elif self.fmt == "xlsx":
+            self._xlsx = XlsxStream(path, self.fieldnames)
+        else:
+            self._file = open(path, "w", newline="", encoding="utf-8")
+            if self.fmt == "csv":
+                self._writer = csv.writer(self._file)
+                self._writer.writerow(self.fieldnames)
+
+    def write(self, row):
+        self.rows += 1
+        if self._parquet is not None:
+            self._parquet.write(row)
+            return
+        if self._xlsx is not None:
+            self._xlsx.write(row)
+            return
+        values = [row.get(f, "") for f in self.fieldnames]
+        if self.fmt == "csv":
+            self._writer.writerow(values)
+        else:
+            self._file.write(json.dumps(dict(zip(self.fieldnames, values)), ensure_ascii=False) + "\n")
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+        if self._xlsx is not None:
+            self._xlsx.close()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._elapsed is None:
+            self._elapsed = time.perf_counter() - self._started
+
+    def stats(self):
+        """Rows written and write throughput; xlsx adds its sheet/file split (XlsxStream.stats)."""
+        if self._xlsx is not None:
+            return self._xlsx.stats()
+        seconds = self._elapsed if self._elapsed is not None else time.perf_counter() - self._started
+        return {
+            "files": [self.path],
+            "rows": self.rows,
+            "seconds": round(seconds, 3),
+            "rows_per_sec": round(self.rows / seconds, 1) if seconds > 0 else None,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
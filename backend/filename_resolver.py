@@ -0,0 +1,118 @@
+# backend/filename_resolver.py
+
+import threading
+from typing import Dict, Iterable, Optional
+from .concurrency import bounded_map, DEFAULT_WORKERS
+
+FILENAME_NAMESPACE = "filename"
+# Bitstreams rarely change once ingested; re-check cached names after 30 days
+FILENAME_MAX_AGE = 30 * 24 * 3600
+# Cached names are written to the persistent store in batches of this size
+FLUSH_EVERY = 200
+
+
+def filename_from_entity(entity) -> Optional[str]:
+    """Fast path: the name when the entity already carries it (file_name/filename), else None."""
+    return getattr(entity, 'file_name', None) or getattr(entity, 'filename', None) or None
+
+
+def first_bitstream_name(client, entity) -> str:
+    """Name of the first named bitstream. bitstreams_for_asset is lazy, so this stops
+    after the first representation/content object/generation that has one."""
+    for bs in client.bitstreams_for_asset(entity):
+        name = getattr(bs, 'filename', None) or getattr(bs, 'name', None)
+        if name:
+            return name
+    return ''
+
+
+class FilenameResolver:
+    """Resolves asset filenames with as few bitstream lookups as possible.
+
+    Order: the entity's own attributes, then an in-memory map, then the
+    persistent cache (loaded a batch at a time with prime()), and only then
+    bitstreams_for_asset. Looked-up names, including "no name found", are
+    written back to the cache in batches. Safe to share between worker threads.
+    """
+
+    def __init__(self, client, cache=None, max_age: Optional[float] = FILENAME_MAX_AGE):
+        self.client = client
+        self.cache = cache
+        self.max_age = max_age
+        self.hits = 0
+        self.lookups = 0
+        self._known: Dict[str, str] = {}
+        self._pending: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def prime(self, refs: Iterable[str]):
+        """Loads cached names for many references with a single store query."""
+        if self.cache is None:
+            return
+        with self._lock:
+            missing = [r for r in refs if r not in self._known]
+        if not missing:
+            return
+        try:
+            found = self.cache.get_many(FILENAME_NAMESPACE, missing, max_age=self.max_age)
+        except Exception:
+            return  # caching is best-effort
+        with self._lock:
+            self._known.update(found)
+
+    def cached(self, reference: str) -> Optional[str]:
+        with self._lock:
+            return self._known.get(reference)
+
+    def resolve(self, entity) -> str:
+        name = filename_from_entity(entity)
+        if name:
+            return name
+        name = self.cached(entity.reference)
+        if name is not None:
+            with self._lock:
+                self.hits += 1
+            return name
+
+        try:
+            name = first_bitstream_name(self.client, entity)
+        except Exception:
+            return ''  # don't cache failures; the next run retries
+        self._remember(entity.reference, name)
+        return name
+
+    def resolve_many(self, entities, max_workers: int = DEFAULT_WORKERS) -> Dict[str, str]:
+        """Resolves a batch: fast path and cache first, then the remaining lookups concurrently."""
+        entities = list(entities)
+        self.prime(e.reference for e in entities)
+        names = {}
+        todo = []
+        for entity in entities:
+            name = filename_from_entity(entity) or self.cached(entity.reference)
+            if name is not None:
+                names[entity.reference] = name
+            else:
+                todo.append(entity)
+        for entity, name, error in bounded_map(self.resolve, todo, max_workers=max_workers):
+            names[entity.reference] = name if error is None else ''
+        self.flush()
+        return names
+
+    def _remember(self, reference: str, name: str):
+        with self._lock:
+            self.lookups += 1
+            self._known[reference] = name
+            self._pending[reference] = name
+            flush = len(self._pending) >= FLUSH_EVERY
+        if flush:
+            self.flush()
+
+    def flush(self):
+        """Writes names looked up since the last flush to the persistent cache."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending and self.cache is not None:
+            try:
+                self.cache.set_many(FILENAME_NAMESPACE, pending)
+            except Exception:
+                pass
@@ -0,0 +1,326 @@
+# backend/instrumentation.py
+
+import bisect
+import inspect
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+
+REPORTS_DIR = Path.home() / ".preservica_toolkit_reports"
+
+# Histogram bucket upper bounds in seconds (Prometheus style, +Inf implied)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Latency samples kept per method for percentiles (reservoir sampling beyond this)
+RESERVOIR_SIZE = 4096
+
+
+class TimingStats:
+    """Count, error classes, bytes and latency distribution for one API method or local stage."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.bytes = 0
+        self.errors: Dict[str, int] = {}
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.samples = []
+
+    def add(self, seconds: float, nbytes: int = 0, error: Optional[str] = None):
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.bytes += nbytes
+        if error:
+            self.errors[error] = self.errors.get(error, 0) + 1
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        if len(self.samples) < RESERVOIR_SIZE:
+            self.samples.append(seconds)
+        else:
+            slot = random.randrange(self.count)
+            if slot < RESERVOIR_SIZE:
+                self.samples[slot] = seconds
+
+    def percentile(self, pct: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self) -> Dict:
+        return {
+            "count": self.count,
+            "errors": dict(self.errors),
+            "bytes": self.bytes,
+            "latency_seconds": {
+                "mean": round(self.total_seconds / self.count, 6) if self.count else 0.0,
+                "p50": round(self.percentile(50), 6),
+                "p95": round(self.percentile(95), 6),
+                "p99": round(self.percentile(99), 6),
+                "max": round(self.max_seconds, 6),
+                "total": round(self.total_seconds, 6),
+            },
+        }
+
+
+class Metrics:
+    """Thread-safe registry of API call and local stage timings (plus a few gauges).
+
+    A job's Metrics forwards everything to a parent (the process-wide registry)
+    so live Prometheus output covers every job.
+    """
+
+    def __init__(self, parent: Optional["Metrics"] = None):
+        self.parent = parent
+        self.api: Dict[str, TimingStats] = {}
+        self.stages: Dict[str, TimingStats] = {}
+        self.gauges: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record_api(self, method: str, seconds: float, nbytes: int = 0, error: Optional[str] = None):
+        with self._lock:
+            self.api.setdefault(method, TimingStats()).add(seconds, nbytes, error)
+        if self.parent:
+            self.parent.record_api(method, seconds, nbytes, error)
+
+    def record_stage(self, name: str, seconds: float, error: Optional[str] = None):
+        with self._lock:
+            self.stages.setdefault(name, TimingStats()).add(seconds, 0, error)
+        if self.parent:
+            self.parent.record_stage(name, seconds, error)
+
+    def set_gauge(self, name: str, value: float):
+        with self._lock:
+            self.gauges[name] = value
+        if self.parent:
+            self.parent.set_gauge(name, value)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Times a local stage (parse, write, ...): `with metrics.stage("parse"): ...`"""
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self.record_stage(name, time.perf_counter() - start, error)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "api": {name: stats.summary() for name, stats in sorted(self.api.items())},
+                "stages": {name: stats.summary() for name, stats in sorted(self.stages.items())},
+                "gauges": dict(self.gauges),
+            }
+
+    def to_prometheus(self) -> str:
+        """Renders the registry in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            families = (("preservica_api", "method", self.api), ("toolkit_stage", "stage", self.stages))
+            for prefix, label, table in families:
+                lines.append(f"# TYPE {prefix}_calls_total counter")
+                for name, stats in sorted(table.items()):
+                    lines.append(f'{prefix}_calls_total{{{label}="{name}"}} {stats.count}')
+                lines.append(f"# TYPE {prefix}_errors_total counter")
+                for name, stats in sorted(table.items()):
+                    for error, count in sorted(stats.errors.items()):
+                        lines.append(f'{prefix}_errors_total{{{label}="{name}",error="{error}"}} {count}')
+                if prefix == "preservica_api":
+                    lines.append(f"# TYPE {prefix}_bytes_total counter")
+                    for name, stats in sorted(table.items()):
+                        lines.append(f'{prefix}_bytes_total{{{label}="{name}"}} {stats.bytes}')
+                lines.append(f"# TYPE {prefix}_duration_seconds histogram")
+                for name, stats in sorted(table.items()):
+                    cumulative = 0
+                    for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), stats.buckets):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f'{prefix}_duration_seconds_bucket{{{label}="{name}",le="{le}"}} {cumulative}')
+                    lines.append(f'{prefix}_duration_seconds_sum{{{label}="{name}"}} {stats.total_seconds:.6f}')
+                    lines.append(f'{prefix}_duration_seconds_count{{{label}="{name}"}} {stats.count}')
+            for name, value in sorted(self.gauges.items()):
+                lines.append(f"# TYPE toolkit_{name} gauge")
+                lines.append(f"toolkit_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _payload_size(value) -> int:
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    return 0
+
+
+# Per thread: the instrumented calls running on it, innermost last, as [metrics, method, requests seen]
+_active = threading.local()
+
+
+def _record_response(response, *args, **kwargs):
+    """requests response hook: records one HTTP request against the instrumented call on this thread.
+
+    The time is the request's elapsed time plus reading the body, the bytes
+    the body's length (Content-Length for streamed downloads, which aren't read here).
+    """
+    calls = getattr(_active, "calls", None)
+    if not calls:
+        return  # a request made outside any instrumented call
+    call = calls[-1]
+    call[2] += 1
+    seconds = response.elapsed.total_seconds()
+    if kwargs.get("stream"):
+        length = response.headers.get("Content-Length") or ""
+        nbytes = int(length) if length.isdigit() else 0
+    else:
+        start = time.perf_counter()
+        nbytes = len(response.content)  # requests reads it right after the hooks anyway
+        seconds += time.perf_counter() - start
+    error = None if response.ok else f"HTTP {response.status_code}"
+    call[0].record_api(call[1], seconds, nbytes, error)
+
+
+_hook_lock = threading.Lock()
+
+
+def _install_hook(client) -> bool:
+    """Adds _record_response to the client's requests session once; False if it has no session."""
+    hooks = getattr(getattr(client, "session", None), "hooks", None)
+    if not isinstance(hooks, dict):
+        return False
+    with _hook_lock:
+        responses = hooks.setdefault("response", [])
+        if _record_response not in responses:
+            responses.append(_record_response)
+    return True
+
+
+class InstrumentedClient:
+    """Proxy around an EntityAPI client that records its HTTP requests into a Metrics registry.
+
+    A response hook on the client's requests session times every request
+    and measures its payload, attributing it to the client method that made
+    it, so a paging generator (descendants, all_descendants, ...) counts
+    one call per page fetched rather than one per item. A method that fails
+    without getting any response is recorded with its exception class. A
+    client without a session (a stand-in) is timed per method call instead.
+    """
+
+    def __init__(self, client, metrics: Metrics):
+        self._client = client
+        self.instrument_metrics = metrics
+        self._http = _install_hook(client)
+
+    def _within(self, name, fn, *args, **kwargs):
+        """Runs fn as method `name`: requests it makes are recorded against it."""
+        call = [self.instrument_metrics, name, 0]
+        calls = getattr(_active, "calls", None)
+        if calls is None:
+            calls = _active.calls = []
+        calls.append(call)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except (StopIteration, GeneratorExit):
+            raise
+        except BaseException as e:
+            if call[2] == 0:
+                self.instrument_metrics.record_api(name, time.perf_counter() - start, error=type(e).__name__)
+            raise
+        finally:
+            calls.pop()
+
+    def _timed(self, name, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except StopIteration:
+            raise
+        except BaseException as e:
+            self.instrument_metrics.record_api(name, time.perf_counter() - start, error=type(e).__name__)
+            raise
+        if not inspect.isgenerator(result):
+            self.instrument_metrics.record_api(name, time.perf_counter() - start, _payload_size(result))
+        return result
+
+    def _paged(self, name, gen):
+        # Each step runs as the method, so the page requests it triggers are recorded; the steps aren't
+        while True:
+            try:
+                item = self._within(name, next, gen)
+            except StopIteration:
+                return
+            yield item
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            if self._http:
+                result = self._within(name, attr, *args, **kwargs)
+            else:
+                result = self._timed(name, attr, *args, **kwargs)
+            if inspect.isgenerator(result):
+                return self._paged(name, result) if self._http else result
+            return result
+
+        return call
+
+
+def metrics_for(client) -> Optional[Metrics]:
+    """Returns the Metrics behind an instrumented (or budgeted) client, if any."""
+    return getattr(client, "instrument_metrics", None)
+
+
+def stage(client, name: str):
+    """Context manager timing a local stage against the client's metrics (no-op for a raw client)."""
+    metrics = metrics_for(client)
+    return metrics.stage(name) if metrics else nullcontext()
+
+
+_global_metrics = Metrics()
+
+
+def get_global_metrics() -> Metrics:
+    """Process-wide registry that every job's metrics roll up into."""
+    return _global_metrics
+
+
+def write_report(path, metrics: Metrics, extra: Optional[Dict] = None) -> str:
+    """Writes a JSON performance report (extra fields first, then the metrics snapshot)."""
+    report = dict(extra or {})
+    report.update(metrics.snapshot())
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+    return str(path)
+
+
+def serve_metrics(port: int, metrics: Optional[Metrics] = None, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serves live metrics in Prometheus text format at http://host:port/metrics (background thread)."""
+    metrics = metrics or _global_metrics
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = metrics.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
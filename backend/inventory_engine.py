@@ -0,0 +1,316 @@
+# backend/inventory_engine.py
+
+import threading
+from typing import Dict, Iterable, List, Optional
+import pyPreservica as pyp
+from .concurrency import bounded_map, prefetch
+from .export_utils import RowStream, write_summary
+from .filename_resolver import FilenameResolver
+from .instrumentation import stage
+from .jobs import JobCancelled, NullProgress
+from .metadata_diff import parse_qdc_xml
+from .metadata_utils import find_qdc_url
+from .subtree_stats import count_in_background
+from .traversal import iter_descendants
+
+INVENTORY_FIELDS = ['reference', 'dc:title', 'dcterms:identifier', 'dc:identifier', 'filename']
+DEFAULT_INVENTORY_WORKERS = 8
+
+# Columns the children listing already carries (no per-asset call)
+TRAVERSAL_COLUMNS = ('reference', 'title', 'entity_type', 'parent', 'parent_path')
+# Entity attributes only a full client.asset() fetch returns
+ENTITY_COLUMNS = ('description', 'security_tag', 'custom_type')
+FILENAME_COLUMN = 'filename'
+
+
+def parse_columns(text: str) -> List[str]:
+    """"reference, dc:title ,filename" -> ['reference', 'dc:title', 'filename'] (duplicates dropped)."""
+    columns = []
+    for part in text.split(','):
+        part = part.strip()
+        if part and part not in columns:
+            columns.append(part)
+    return columns
+
+
+class InventoryPlan:
+    """Works out which API calls a column spec needs per asset.
+
+    - traversal columns: nothing beyond listing the tree
+    - parent_path: one client.folder() for the root, folders are tracked while listing
+    - entity attributes: client.asset()
+    - dc:*/dcterms:* columns: client.asset() + client.metadata() for the QDC block
+    - filename: bitstreams_for_asset(), unless the fetched entity already names the file
+
+    listed=False is for entities that didn't come from a children listing
+    (search hits): title and parent then need client.asset() too.
+    """
+
+    def __init__(self, columns: Optional[Iterable[str]] = None, listed: bool = True):
+        self.columns = list(columns or INVENTORY_FIELDS)
+        if not self.columns:
+            raise ValueError("No inventory columns given")
+        unknown = [c for c in self.columns
+                   if c not in TRAVERSAL_COLUMNS and c not in ENTITY_COLUMNS and c != FILENAME_COLUMN
+                   and not c.startswith(('dc:', 'dcterms:'))]
+        if unknown:
+            raise ValueError(
+                f"Unknown inventory column(s): {', '.join(unknown)}. Use dc:*/dcterms:* fields, "
+                f"{', '.join(TRAVERSAL_COLUMNS + ENTITY_COLUMNS)} or {FILENAME_COLUMN}."
+            )
+        self.qdc_fields = [c for c in self.columns if c.startswith(('dc:', 'dcterms:'))]
+        self.needs_metadata = bool(self.qdc_fields)
+        entity_columns = ENTITY_COLUMNS if listed else ENTITY_COLUMNS + ('title', 'parent')
+        self.needs_entity = self.needs_metadata or any(c in entity_columns for c in self.columns)
+        self.needs_filename = FILENAME_COLUMN in self.columns
+        self.needs_parent_path = 'parent_path' in self.columns
+
+    def calls_per_asset(self) -> List[str]:
+        calls = []
+        if self.needs_entity:
+            calls.append('asset')
+        if self.needs_metadata:
+            calls.append('metadata')
+        if self.needs_filename:
+            calls.append('bitstreams_for_asset')
+        return calls
+
+    def traversal_only(self) -> bool:
+        return not self.calls_per_asset()
+
+
+def qdc_value(meta: Dict[str, str], field: str) -> str:
+    """First value for field, counting repeated elements (dc:identifier.1, ...)."""
+    if field in meta:
+        return meta[field]
+    for key, value in meta.items():
+        if key.startswith(field + '.'):
+            return value
+    return ''
+
+
+# Assets whose cached filenames are loaded with one store query
+PRIME_BATCH = 500
+
+
+def inventory_row(client, entity, plan: Optional[InventoryPlan] = None, parent_path: str = '',
+                  filenames: Optional[FilenameResolver] = None) -> Dict[str, str]:
+    """Builds one inventory row from a listed entity, making only the calls the plan needs."""
+    plan = plan or InventoryPlan()
+    full = client.asset(entity.reference) if plan.needs_entity else None
+
+    meta = {}
+    if plan.needs_metadata:
+        qdc_url = find_qdc_url(full)
+        if qdc_url:
+            xml_text = client.metadata(qdc_url)
+            with stage(client, 'parse'):
+                meta = parse_qdc_xml(xml_text)
+
+    source = full or entity
+    row = {}
+    for column in plan.columns:
+        if column == 'reference':
+            row[column] = entity.reference
+        elif column == 'title':
+            row[column] = getattr(source, 'title', '') or ''
+        elif column == 'entity_type':
+            etype = getattr(entity, 'entity_type', None)
+            row[column] = getattr(etype, 'name', '') or ''
+        elif column == 'parent':
+            row[column] = getattr(source, 'parent', '') or ''
+        elif column == 'parent_path':
+            row[column] = parent_path
+        elif column in ENTITY_COLUMNS:
+            row[column] = getattr(full, column, '') or ''
+        elif column == FILENAME_COLUMN:
+            row[column] = (filenames or FilenameResolver(client)).resolve(source)
+        elif column == 'dc:title':
+            # Fall back to the entity title when the QDC block has none
+            row[column] = qdc_value(meta, column) or getattr(source, 'title', '') or ''
+        else:
+            row[column] = qdc_value(meta, column)
+    return row
+
+
+def _assets_with_paths(client, root_ref: str, with_paths: bool):
+    """Yields (asset, parent_path) in traversal order.
+
+    Paths are built from the folders seen while listing (all_descendants
+    yields a folder before its contents), so they cost one extra call for the
+    root folder's title and nothing per asset.
+    """
+    if not with_paths:
+        for asset in iter_descendants(client, root_ref, assets_only=True):
+            yield asset, ''
+        return
+
+    root = client.folder(root_ref)
+    paths = {root_ref: root.title or root_ref}
+    for entity in iter_descendants(client, root_ref):
+        if isinstance(entity, pyp.Asset):
+            yield entity, paths.get(entity.parent, '')
+        else:
+            parent_path = paths.get(entity.parent, '')
+            paths[entity.reference] = f"{parent_path}/{entity.title}" if parent_path else entity.title
+
+
+class FolderPaths:
+    """parent_path for entities that arrive without their ancestors (search hits).
+
+    Walks up with client.folder() until it reaches a folder it already knows,
+    so each folder costs one call per run however many assets it holds.
+    """
+
+    def __init__(self, client, root_ref: str):
+        self.client = client
+        self.root_ref = root_ref
+        self._paths = {}
+        self._lock = threading.Lock()
+
+    def path(self, folder_ref: Optional[str]) -> str:
+        chain = []
+        ref = folder_ref
+        while ref:
+            with self._lock:
+                known = self._paths.get(ref)
+            if known is not None:
+                break
+            folder = self.client.folder(ref)
+            chain.append((ref, folder.title or ref))
+            ref = None if ref == self.root_ref else folder.parent
+        path = known if ref else ''
+        for ref, title in reversed(chain):
+            path = f"{path}/{title}" if path else title
+            with self._lock:
+                self._paths[ref] = path
+        return path
+
+
+def _indexed_assets(search, root_ref: str, plan: InventoryPlan):
+    """Search-index mode: yields (asset stub, '', {column: value}) for every asset below root_ref."""
+    wanted = list(plan.columns)
+    if plan.needs_parent_path and 'parent' not in wanted:
+        wanted.append('parent')
+    for ref, values in search.iter_subtree(root_ref, wanted):
+        stub = pyp.Asset(ref, values.get('title'), None, None, values.get('parent'), None)
+        yield stub, '', values
+
+
+def _primed(items, filenames: FilenameResolver):
+    """Passes (asset, path, values) items through, loading cached filenames a PRIME_BATCH at a time."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= PRIME_BATCH:
+            filenames.prime(item[0].reference for item in batch)
+            yield from batch
+            batch = []
+    if batch:
+        filenames.prime(item[0].reference for item in batch)
+        yield from batch
+
+
+def export_inventory(client, root_ref: str, out_path: str, fmt: Optional[str] = None,
+                     max_workers: int = DEFAULT_INVENTORY_WORKERS, checkpoint=None, progress=None,
+                     columns: Optional[Iterable[str]] = None, cache=None, search=None, stats=None) -> Dict:
+    """Writes one row per asset below root_ref (recursive) while the tree is still being listed.
+
+    columns picks the output columns (default INVENTORY_FIELDS); only the API
+    calls those columns need are made, so a traversal-only spec (e.g. just
+    reference) costs nothing beyond listing the tree. Rows are written in
+    traversal order as soon as they are ready. With a Checkpoint, assets
+    finished by an earlier run are written from it without any API calls.
+    Filenames go through a FilenameResolver backed by cache (if given), so
+    repeat inventories skip the bitstream lookups.
+
+    With search (a SearchIndexBackend) the subtree is read from the search
+    index page by page instead of being walked, and per-asset calls are made
+    only for columns the index doesn't hold.
+
+    When walking the tree, stats (a SubtreeStats) supplies the asset count
+    for the progress total: from its cache, or counted in the background
+    while rows are already being written.
+
+    Cancelling the job stops the walk and closes the output with the rows
+    written so far (a valid file); the summary is then marked "cancelled".
+    """
+    progress = progress or NullProgress()
+    plan = InventoryPlan(columns)
+    filenames = FilenameResolver(client, cache) if plan.needs_filename else None
+
+    stop_count = threading.Event()
+    if search is None:
+        fetch_plan = plan
+        paths = None
+        if stats is not None:
+            count_in_background(stats, root_ref, lambda counts: progress.set_total(counts["assets"]), stop_count)
+        # Listed in its own thread, so later pages load while the first rows are fetched and written
+        items = prefetch((asset, path, {}) for asset, path in
+                         _assets_with_paths(client, root_ref, plan.needs_parent_path))
+    else:
+        _, fallback = search.split_columns(plan.columns)
+        fallback = [c for c in fallback if c not in ('entity_type', 'parent_path')]
+        if plan.needs_parent_path and search.index_field('parent') is None and 'parent' not in fallback:
+            fallback.append('parent')
+        fetch_plan = InventoryPlan(fallback, listed=False) if fallback else None
+        paths = FolderPaths(client, root_ref) if plan.needs_parent_path else None
+        progress.set_total(search.count(root_ref))
+        items = _indexed_assets(search, root_ref, plan)
+
+    def build_row(item):
+        asset, parent_path, values = item
+        row = {'reference': asset.reference, 'entity_type': 'ASSET'}
+        row.update(values)
+        if fetch_plan is not None:
+            row.update(inventory_row(client, asset, fetch_plan, parent_path, filenames))
+        if paths is not None:
+            row['parent_path'] = paths.path(row.get('parent'))
+        return row
+
+    def fetch(item):
+        if checkpoint is not None and item[0].reference in checkpoint:
+            return checkpoint.get(item[0].reference)
+        return build_row(item)
+
+    written = 0
+    failed = 0
+    cancelled = False
+    if filenames is not None and cache is not None:
+        items = _primed(items, filenames)
+    if (fetch_plan is None or fetch_plan.traversal_only()) and paths is None:
+        # Nothing to fetch per asset, so skip the thread pool entirely
+        results = ((item, build_row(item), None) for item in items)
+    else:
+        results = bounded_map(fetch, items, max_workers=max_workers, ordered=True)
+
+    try:
+        with RowStream(out_path, plan.columns, fmt) as stream:
+            try:
+                for (asset, _, _), row, error in results:
+                    if error is not None or not row:
+                        failed += 1
+                        progress.advance(failed=1)
+                        continue
+                    if checkpoint is not None and asset.reference not in checkpoint:
+                        checkpoint.record(asset.reference, row)
+                    with stage(client, "write"):
+                        stream.write(row)
+                    written += 1
+                    progress.advance()
+            except JobCancelled:
+                cancelled = True
+    finally:
+        stop_count.set()
+        if filenames is not None:
+            filenames.flush()
+
+    calls = fetch_plan.calls_per_asset() if fetch_plan is not None else []
+    summary = {"path": out_path, "rows": written, "failed": failed, "calls_per_asset": calls}
+    if cancelled:
+        summary["cancelled"] = True
+    summary.update(write_summary(client, stream.stats()))
+    if filenames is not None:
+        summary["filename_cache_hits"] = filenames.hits
+        summary["filename_lookups"] = filenames.lookups
+    return summary
@@ -0,0 +1,480 @@
+# backend/jobs.py
+
+import heapq
+import inspect
+import itertools
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from .concurrency import THROTTLE_STATUSES, AdaptiveLimit, http_status, parse_retry_after
+from .progress import RateTracker
+from .instrumentation import InstrumentedClient, Metrics, REPORTS_DIR, get_global_metrics, write_report
+
+PRIORITY_LOW = 1
+PRIORITY_NORMAL = 2
+PRIORITY_HIGH = 4
+
+DEFAULT_MAX_JOBS = 3
+# Ceiling on in-flight requests; with adaptive concurrency the live limit moves below it
+DEFAULT_REQUEST_BUDGET = 32
+# Times a call rejected with 429 Too Many Requests is retried (after the back-off) before it fails
+MAX_THROTTLE_RETRIES = 3
+# First retry delay for a 429 without Retry-After (doubles per attempt, with jitter)
+THROTTLE_RETRY_DELAY = 0.5
+
+QUEUED = "queued"
+RUNNING = "running"
+PAUSED = "paused"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(BaseException):
+    """Raised inside a job's thread once the job has been cancelled.
+
+    Derives from BaseException (like KeyboardInterrupt) so the per-item
+    `except Exception` handlers in the workers don't swallow it as a skip.
+    """
+
+
+class NullProgress:
+    """Stand-in progress sink for engines run outside a Job."""
+
+    def set_total(self, total):
+        pass
+
+    def advance(self, n=1, failed=0):
+        pass
+
+
+class Job:
+    """A unit of background work (an export, inventory, update or move run).
+
+    target is called as target(job) on the thread that runs the job. Engines
+    should do their API calls through job.client(client) so they share the
+    global request budget and honour pause/cancel between calls.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, name: str, target: Callable[["Job"], Any], priority: int = PRIORITY_NORMAL):
+        self.id = next(Job._ids)
+        self.name = name
+        self.target = target
+        self.priority = priority
+        self.state = QUEUED
+        self.done = 0
+        self.failed_items = 0
+        self.total = None
+        self.in_flight = 0
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.manager = None
+        self.on_progress = None  # optional callback(job) after every advance/set_total
+        self.metrics = Metrics(parent=get_global_metrics())
+        self.report_path = None  # where the performance report goes (default: REPORTS_DIR)
+        self._rate = RateTracker()
+        self._cancel = threading.Event()
+        self._resume = threading.Event()
+        self._resume.set()
+
+    # --- control -------------------------------------------------------
+    def cancel(self):
+        self._cancel.set()
+        self._resume.set()  # wake a paused job so it can notice the cancel
+
+    def pause(self):
+        if self.state == RUNNING:
+            self._resume.clear()
+            self.state = PAUSED
+
+    def resume(self):
+        if self.state == PAUSED:
+            self.state = RUNNING
+        self._resume.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def wait(self, seconds: float) -> bool:
+        """Sleeps for up to seconds, waking early on cancel; returns True if the job was cancelled."""
+        return self._cancel.wait(seconds)
+
+    def checkpoint(self):
+        """Blocks while the job is paused and raises JobCancelled once it has been cancelled."""
+        if self._cancel.is_set():
+            raise JobCancelled(self.name)
+        self._resume.wait()
+        if self._cancel.is_set():
+            raise JobCancelled(self.name)
+
+    # --- progress ------------------------------------------------------
+    def set_total(self, total: Optional[int]):
+        self.total = total
+        if self.on_progress:
+            self.on_progress(self)
+
+    def advance(self, n: int = 1, failed: int = 0):
+        self.done += n
+        self.failed_items += failed
+        if self.on_progress:
+            self.on_progress(self)
+
+    def percent(self) -> Optional[int]:
+        if not self.total:
+            return None
+        return min(100, int(self.done / self.total * 100))
+
+    def elapsed(self) -> float:
+        if not self.started_at:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def throughput(self) -> float:
+        """Items per second: rolling over the last few seconds while running, the overall average once finished."""
+        elapsed = self.elapsed()
+        average = self.done / elapsed if elapsed > 0 else 0.0
+        if self.finished_at or not self.started_at:
+            return average
+        rate = self._rate.sample(self.done)
+        return average if rate is None else rate
+
+    def eta(self) -> Optional[float]:
+        """Seconds remaining, or None when the total (or the rate) isn't known yet."""
+        rate = self.throughput()
+        if self.total is None or rate <= 0:
+            return None
+        return max(0.0, (self.total - self.done) / rate)
+
+    def client(self, client):
+        """Wraps an EntityAPI client so every call goes through this job's request budget
+        and is timed into job.metrics (budget waits are not counted as API latency)."""
+        budget = self.manager.budget if self.manager else None
+        if budget is not None:
+            budget.watch(client)
+        return BudgetedClient(InstrumentedClient(client, self.metrics), self, budget)
+
+    def write_report(self) -> Optional[str]:
+        """Writes the job's JSON performance report; returns its path (None if it couldn't be written)."""
+        if self.report_path is None:
+            stamp = datetime.fromtimestamp(self.started_at or self.submitted_at).strftime("%Y%m%d-%H%M%S")
+            kind = self.name.split()[0].lower() if self.name else "job"
+            self.report_path = str(REPORTS_DIR / f"{stamp}-{kind}-{self.id}.json")
+        summary = {
+            "job": self.name,
+            "id": self.id,
+            "state": self.state,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_seconds": round(self.elapsed(), 3),
+            "items_done": self.done,
+            "items_failed": self.failed_items,
+            "items_total": self.total,
+            "items_per_second": round(self.throughput(), 3),
+            "error": f"{type(self.error).__name__}: {self.error}" if self.error else None,
+        }
+        try:
+            return write_report(self.report_path, self.metrics, summary)
+        except Exception as e:
+            print(f"⚠️ Could not write performance report {self.report_path}: {e}", file=sys.stderr)
+            return None
+
+
+class RequestBudget:
+    """Global cap on in-flight API requests, shared fairly across running jobs.
+
+    When a slot frees up it goes to the waiting job with the lowest
+    in_flight / priority ratio, so a HIGH priority job gets roughly twice the
+    share of a NORMAL one and no job can starve the others.
+
+    With adaptive on (the default) `limit` is only the ceiling: an
+    AdaptiveLimit fed by every call's latency and 429/503 responses sets how
+    many requests actually run, and a Retry-After holds them all back.
+    current_limit() is published as the concurrency_limit gauge.
+    """
+
+    def __init__(self, limit: int = DEFAULT_REQUEST_BUDGET, adaptive: bool = True):
+        self.limit = max(1, int(limit))
+        self.in_flight = 0
+        self.adaptive = AdaptiveLimit(maximum=self.limit) if adaptive else None
+        self._waiting: Dict[Job, int] = {}
+        self._cond = threading.Condition()
+        self._watched = set()  # ids of sessions with our response hook
+
+    def set_limit(self, limit: int):
+        with self._cond:
+            self.limit = max(1, int(limit))
+            if self.adaptive is not None:
+                self.adaptive.set_maximum(self.limit)
+            self._cond.notify_all()
+
+    def set_adaptive(self, enabled: bool):
+        with self._cond:
+            if enabled and self.adaptive is None:
+                self.adaptive = AdaptiveLimit(maximum=self.limit)
+            elif not enabled:
+                self.adaptive = None
+            self._cond.notify_all()
+
+    def current_limit(self) -> int:
+        adaptive = self.adaptive
+        return min(self.limit, adaptive.limit) if adaptive is not None else self.limit
+
+    def watch(self, client):
+        """Hooks the client's HTTP session so a Retry-After on a 429/503 pauses the budget.
+
+        pyPreservica's exceptions carry the status but not the headers, so
+        the header is read from the response itself. No-op for clients
+        without a requests session.
+        """
+        hooks = getattr(getattr(client, "session", None), "hooks", None)
+        if not isinstance(hooks, dict) or id(client.session) in self._watched:
+            return
+        self._watched.add(id(client.session))
+
+        def on_response(response, *args, **kwargs):
+            adaptive = self.adaptive
+            if adaptive is not None and response.status_code in THROTTLE_STATUSES:
+                seconds = parse_retry_after(response.headers.get("Retry-After"))
+                if seconds:
+                    adaptive.pause(seconds)
+            return response
+
+        hooks.setdefault("response", []).append(on_response)
+
+    def _next_in_line(self) -> Job:
+        return min(self._waiting, key=lambda j: (j.in_flight / max(j.priority, 1), j.id))
+
+    def acquire(self, job: Job):
+        with self._cond:
+            self._waiting[job] = self._waiting.get(job, 0) + 1
+            try:
+                while True:
+                    paused = self.adaptive.pause_remaining() if self.adaptive is not None else 0.0
+                    if not paused and self.in_flight < self.current_limit() and self._next_in_line() is job:
+                        break
+                    self._cond.wait(timeout=min(paused, 0.5) or 0.5)
+                    if job.cancelled:
+                        raise JobCancelled(job.name)
+            finally:
+                self._waiting[job] -= 1
+                if not self._waiting[job]:
+                    del self._waiting[job]
+            self.in_flight += 1
+            job.in_flight += 1
+            # Another job may be next in line now that our in_flight grew
+            self._cond.notify_all()
+
+    def release(self, job: Job, method: Optional[str] = None, seconds: Optional[float] = None,
+                error: Optional[BaseException] = None):
+        """Frees the slot; method/seconds/error (when given) are the call's outcome for the adaptive limit.
+
+        Without a method a success says nothing about latency; a throttled error still counts.
+        """
+        with self._cond:
+            saturated = self.in_flight >= self.current_limit()
+            self.in_flight -= 1
+            job.in_flight -= 1
+            adaptive = self.adaptive
+            status = http_status(error) if error is not None else None
+            if adaptive is not None and (method is not None or status is not None):
+                if status in THROTTLE_STATUSES:
+                    adaptive.on_throttle(_retry_after(error))
+                elif error is None:
+                    adaptive.on_success(method, seconds, saturated)
+                job.metrics.set_gauge("concurrency_limit", self.current_limit())
+                job.metrics.set_gauge("throttled_responses", adaptive.throttled)
+                job.metrics.set_gauge("latency_backoffs", adaptive.spikes)
+            self._cond.notify_all()
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    return parse_retry_after(headers.get("Retry-After"))
+
+
+class BudgetedClient:
+    """Proxy around an EntityAPI client that charges each call to a job's request budget.
+
+    Generators returned by the client (descendants, all_descendants,
+    bitstreams_for_asset, ...) fetch lazily, so each step of the generator is
+    charged instead of the call that created it.
+    """
+
+    def __init__(self, client, job: Job, budget: Optional[RequestBudget]):
+        self._client = client
+        self._job = job
+        self._budget = budget
+
+    def _charged(self, name, fn, *args, **kwargs):
+        self._job.checkpoint()
+        if self._budget is None:
+            return fn(*args, **kwargs)
+        self._budget.acquire(self._job)
+        start = time.perf_counter()
+        error = None
+        try:
+            return fn(*args, **kwargs)
+        except StopIteration:
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._budget.release(self._job, name, time.perf_counter() - start, error)
+
+    def _retried(self, name, fn, *args, **kwargs):
+        """_charged, retrying a 429: after the Retry-After pause (which the budget enforces), or else
+        after an exponential, jittered delay of its own."""
+        for attempt in range(MAX_THROTTLE_RETRIES + 1):
+            try:
+                return self._charged(name, fn, *args, **kwargs)
+            except Exception as e:
+                if attempt == MAX_THROTTLE_RETRIES or http_status(e) != 429:
+                    raise
+            adaptive = self._budget.adaptive if self._budget is not None else None
+            if adaptive is None or not adaptive.pause_remaining():
+                self._job._cancel.wait(THROTTLE_RETRY_DELAY * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    def _charged_generator(self, name, gen):
+        # A generator can't be resumed after it raised, so its steps aren't retried. Most steps are
+        # served from a page already fetched, so their times are not fed to the latency controller.
+        while True:
+            try:
+                item = self._charged(None, next, gen)
+            except StopIteration:
+                return
+            yield item
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = self._retried(name, attr, *args, **kwargs)
+            if inspect.isgenerator(result):
+                return self._charged_generator(name, result)
+            return result
+
+        return call
+
+
+class JobManager:
+    """Queues jobs, runs up to max_jobs at once and owns the shared request budget."""
+
+    def __init__(self, max_jobs: int = DEFAULT_MAX_JOBS, request_budget: int = DEFAULT_REQUEST_BUDGET):
+        self.max_jobs = max(1, int(max_jobs))
+        self.budget = RequestBudget(request_budget)
+        self._jobs: List[Job] = []
+        self._queue = []
+        self._running = 0
+        self._cond = threading.Condition()
+
+    def set_max_jobs(self, max_jobs: int):
+        with self._cond:
+            self.max_jobs = max(1, int(max_jobs))
+            self._cond.notify_all()
+
+    def jobs(self) -> List[Job]:
+        with self._cond:
+            return list(self._jobs)
+
+    def clear_finished(self):
+        with self._cond:
+            self._jobs = [j for j in self._jobs if j.state not in FINISHED_STATES]
+
+    def set_priority(self, job: Job, priority: int):
+        with self._cond:
+            job.priority = priority
+            self._queue = [(-j.priority, j.id, j) for _, _, j in self._queue]
+            heapq.heapify(self._queue)
+            self._cond.notify_all()
+
+    def submit(self, job: Job) -> Job:
+        """Runs the job on a new background thread once a slot is free."""
+        self._register(job)
+
+        def run_quietly():
+            try:
+                self._run_registered(job)
+            except Exception:
+                pass  # already recorded on job.error / job.state
+
+        threading.Thread(target=run_quietly, daemon=True).start()
+        return job
+
+    def run(self, job: Job) -> Any:
+        """Runs the job on the calling thread (e.g. a QThread worker), waiting for a slot first.
+
+        Returns the target's result; errors are stored on the job and re-raised.
+        """
+        self._register(job)
+        return self._run_registered(job)
+
+    def _register(self, job: Job):
+        with self._cond:
+            job.manager = self
+            self._jobs.append(job)
+            heapq.heappush(self._queue, (-job.priority, job.id, job))
+
+    def _admit(self, job: Job):
+        with self._cond:
+            while not job.cancelled and (self._running >= self.max_jobs or self._queue[0][2] is not job):
+                self._cond.wait(timeout=0.5)
+            self._queue = [entry for entry in self._queue if entry[2] is not job]
+            heapq.heapify(self._queue)
+            self._cond.notify_all()
+            if job.cancelled:
+                raise JobCancelled(job.name)
+            self._running += 1
+
+    def _run_registered(self, job: Job) -> Any:
+        try:
+            self._admit(job)
+        except JobCancelled:
+            job.state = CANCELLED
+            job.finished_at = time.time()
+            return None
+
+        job.state = PAUSED if not job._resume.is_set() else RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = job.target(job)
+            job.state = CANCELLED if job.cancelled else DONE
+            return job.result
+        except JobCancelled:
+            job.state = CANCELLED
+            return None
+        except Exception as e:
+            job.error = e
+            job.state = FAILED
+            raise
+        finally:
+            job.finished_at = time.time()
+            with self._cond:
+                self._running -= 1
+                self._cond.notify_all()
+            job.write_report()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Returns the process-wide JobManager shared by every tab (and the CLI)."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
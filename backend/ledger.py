@@ -0,0 +1,56 @@
+# backend/ledger.py
+
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Optional
+from .checkpoint import Checkpoint
+
+LEDGER_DIR = Path.home() / ".preservica_toolkit_ledgers"
+
+
+def file_hash(path: str) -> str:
+    """sha256 of a file's bytes, read in 1 MB chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def row_key(index: int, row: Dict[str, str]) -> str:
+    """Ledger key for a sheet row: its line number (header = line 1) and reference."""
+    return lines_key([index + 2], (row.get('reference') or '').strip())
+
+
+def lines_key(lines: List[int], reference: str) -> str:
+    """Ledger key for a reference's rows coalesced into one write: "2:REF", or "2,5:REF" for several lines."""
+    return f"{','.join(str(line) for line in lines)}:{reference}"
+
+
+def applied_hash(blocks: List[Dict[str, str]]) -> Optional[str]:
+    """One hash over the XML written for every block of a row (None if nothing was written)."""
+    hashes = [f"{b['schema']}={b['xml_hash']}" for b in blocks if b.get("xml_hash")]
+    if not hashes:
+        return None
+    return hashlib.sha256("\n".join(hashes).encode("utf-8")).hexdigest()[:16]
+
+
+class UpdateLedger(Checkpoint):
+    """Durable record of the rows of one update sheet that are done: row key -> {xml, message}.
+
+    The ledger file is named after the sheet's content hash, so rerunning the
+    same sheet (even renamed or moved) after a crash or Cancel picks up
+    exactly where it stopped, while an edited sheet starts a fresh ledger.
+    xml is the applied_hash of what was written, None for rows that needed
+    no change. run_update takes it as its checkpoint.
+    """
+
+    def __init__(self, sheet_path: str, resume: bool = True, directory: Optional[str] = None):
+        self.sheet_path = sheet_path
+        self.file_hash = file_hash(sheet_path)
+        directory = Path(directory) if directory else LEDGER_DIR
+        directory.mkdir(parents=True, exist_ok=True)
+        super().__init__(str(directory / f"{self.file_hash[:24]}.jsonl"), resume=resume)
+
+    def applied(self) -> int:
+        return len(self.completed)
@@ -1,10 +1,13 @@
 # update_metadata/metadata_diff.py
 
 import csv
+import os
+import re
 import pandas as pd
 import xml.etree.ElementTree as ET
 from typing import List, Dict, Tuple
 from pyPreservica import EntityAPI
+from .instrumentation import stage
 
 NAMESPACES = {
     "dc": "http://purl.org/dc/elements/1.1/",
@@ -13,8 +16,7 @@ NAMESPACES = {
 
 def parse_csv(file_path: str) -> List[Dict[str, str]]:
     if file_path.endswith(".xlsx"):
-        df = pd.read_excel(file_path, dtype=str).fillna("")
-        return df.to_dict(orient="records")
+        return parse_sheet(file_path).to_dict(orient="records")
     else:
         with open(file_path, newline="", encoding="utf-8") as f:
             reader = csv.DictReader(f)
@@ -52,7 +54,8 @@ def fetch_current_metadata(client: EntityAPI, reference: str) -> Tuple[str, Dict
 
     if qdc_url:
         qdc_xml = client.metadata(qdc_url)
-        metadata_dict = parse_qdc_xml(qdc_xml)
+        with stage(client, "parse"):
+            metadata_dict = parse_qdc_xml(qdc_xml)
         return qdc_xml, metadata_dict
     else:
         return "", {}
@@ -65,31 +68,144 @@ def compare_metadata(csv_row: Dict[str, str], preservica_meta: Dict[str, str]) -
             # skip empty cells
             continue
 
-        # Standard QDC fields (dc:... or dcterms:...)
-        if key.startswith("dc:") or key.startswith("dcterms:"):
+        # QDC fields (dc:... or dcterms:...) and custom-schema schemaURL::element cells; a value
+        # missing from preservica_meta (custom blocks aren't fetched for a live diff) is a change
+        if is_diff_column(key):
             old_value = preservica_meta.get(key, "")
             if (old_value or "").strip() != (new_value or "").strip():
                 changes[key] = (old_value, new_value)
-        # Custom schema header format: schemaURL::elementName
-        elif "::" in key:
-            # We don't fetch custom-schema current values here; treat non-empty CSV cell as a change/add
-            changes[key] = ("", new_value)
     return changes
 
-def generate_diffs(client: EntityAPI, csv_rows: List[Dict[str, str]]) -> List[Dict]:
-    """Returns list of row diffs: {reference, csv_row, old_metadata, changes}"""
-    results = []
-    for row in csv_rows:
-        ref = row.get("reference")
-        if not ref:
-            continue
-        qdc_xml, current_meta = fetch_current_metadata(client, ref)
-        changes = compare_metadata(row, current_meta)
-        results.append({
-            "reference": ref,
-            "csv_row": row,
-            "qdc_xml": qdc_xml,
-            "current_metadata": current_meta,
-            "changes": changes
-        })
-    return results
+def is_diff_column(key: str) -> bool:
+    """Columns compare_metadata looks at: dc:*/dcterms:* fields and schemaURL::element headers."""
+    return key.startswith("dc:") or key.startswith("dcterms:") or "::" in key
+
+
+def compare_frames(sheet: pd.DataFrame, current: pd.DataFrame) -> List[Dict[str, Tuple[str, str]]]:
+    """Vectorized compare_metadata over a whole sheet: one changes dict per sheet row.
+
+    current holds the Preservica values row-aligned with sheet (row i of
+    both is the same entity). Each column is compared in one pass instead of
+    looping over rows and keys; only changed cells are turned back into
+    Python tuples. The result matches compare_metadata row by row.
+    """
+    changes = [{} for _ in range(len(sheet))]
+    columns = [c for c in sheet.columns if is_diff_column(str(c))]
+    if not columns or sheet.empty:
+        return changes
+    current = current.reset_index(drop=True).reindex(index=range(len(sheet)), columns=columns).fillna("")
+
+    for column in columns:
+        raw = sheet[column].fillna("").astype(str)
+        new = raw.str.strip()
+        # Empty cells are never changes; columns current lacks (custom schemas in a live diff) compare with ""
+        mask = (new != "") & (current[column].astype(str).str.strip() != new)
+        raw_values = raw.to_numpy()
+        old_values = current[column].to_numpy()
+        for i in mask.to_numpy().nonzero()[0]:
+            changes[i][column] = (old_values[i], raw_values[i])
+    return changes
+
+
+def xlsx_parts(file_path: str) -> List[str]:
+    """The files of an .xlsx export: file_path, then the name_part2.xlsx, ... files XlsxStream split off.
+
+    Raises ValueError when file_path is itself a part of a split export, so
+    the rest of it can't be dropped by reading that part alone.
+    """
+    stem, ext = os.path.splitext(file_path)
+    match = re.match(r"^(.*)_part(\d+)$", stem)
+    if match and int(match.group(2)) >= 2 and os.path.exists(match.group(1) + ext):
+        raise ValueError(f"{file_path} is part {match.group(2)} of a split export; "
+                         f"pass its first file, {match.group(1) + ext}")
+    parts = [file_path]
+    while os.path.exists(f"{stem}_part{len(parts) + 1}{ext}"):
+        parts.append(f"{stem}_part{len(parts) + 1}{ext}")
+    return parts
+
+
+def parse_sheet(file_path: str) -> pd.DataFrame:
+    """Reads an update sheet as a DataFrame of strings (blank cells are "").
+
+    An .xlsx is read in full: every sheet of every part file (xlsx_parts),
+    in order, since large exports are split across sheets and files.
+    """
+    if file_path.endswith(".xlsx"):
+        frames = []
+        for part in xlsx_parts(file_path):
+            frames.extend(pd.read_excel(part, sheet_name=None, dtype=str).values())
+        return pd.concat(frames, ignore_index=True).fillna("")
+    return pd.read_csv(file_path, dtype=str, keep_default_na=False, encoding="utf-8")
+
+
+def load_snapshot(path: str) -> pd.DataFrame:
+    """Reads an earlier export (.csv/.xlsx/.parquet) as current values, indexed by reference.
+
+    A split .xlsx export is read whole (parse_sheet): a reference missing
+    from the snapshot would have every filled cell treated as a change.
+    """
+    if path.lower().endswith(".parquet"):
+        frame = pd.read_parquet(path).fillna("")
+    else:
+        frame = parse_sheet(path)
+    if "reference" not in frame.columns:
+        raise ValueError(f"{path} has no reference column")
+    frame = frame[frame["reference"] != ""]
+    return frame.drop_duplicates("reference", keep="last").set_index("reference")
+
+
+def diff_against_snapshot(csv_rows, snapshot: pd.DataFrame) -> List[Dict]:
+    """generate_diffs without any API calls: current values come from a load_snapshot() frame.
+
+    csv_rows is a list of row dicts or a parse_sheet() DataFrame. References
+    missing from the snapshot compare against empty values, so every filled
+    cell counts as a change. The snapshot is only as fresh as its export.
+    """
+    sheet = csv_rows if isinstance(csv_rows, pd.DataFrame) else pd.DataFrame.from_records(csv_rows)
+    if sheet.empty or "reference" not in sheet.columns:
+        return []
+    sheet = sheet[sheet["reference"].fillna("") != ""].reset_index(drop=True)
+    current = snapshot.reindex(sheet["reference"]).fillna("")
+    changes = compare_frames(sheet, current)
+
+    meta_columns = [c for c in current.columns if c.startswith("dc:") or c.startswith("dcterms:")]
+    qdc_xml = current["qdc_xml"].tolist() if "qdc_xml" in current.columns else [""] * len(sheet)
+    meta = current[meta_columns].to_dict(orient="records")
+    rows = sheet.fillna("").to_dict(orient="records")
+    return [{
+        "reference": row["reference"],
+        "csv_row": row,
+        "qdc_xml": qdc_xml[i],
+        "current_metadata": {k: v for k, v in meta[i].items() if v},
+        "changes": changes[i]
+    } for i, row in enumerate(rows)]
+
+
+def generate_diffs(client: EntityAPI, csv_rows: List[Dict[str, str]], max_workers: int = 1) -> List[Dict]:
+    """Returns list of row diffs: {reference, csv_row, old_metadata, changes}
+
+    With max_workers > 1 the current metadata is fetched concurrently; the
+    result order still follows csv_rows. Once everything is fetched the
+    sheet is compared in one vectorized pass (compare_frames).
+    """
+    from .concurrency import bounded_map
+
+    rows = [row for row in csv_rows if row.get("reference")]
+    fetched = bounded_map(lambda r: fetch_current_metadata(client, r["reference"]), rows,
+                          max_workers=max_workers, ordered=True)
+    current = []
+    for row, result, error in fetched:
+        if error is not None:
+            raise error
+        current.append(result)
+
+    with stage(client, "diff"):
+        changes = compare_frames(pd.DataFrame.from_records(rows, index=range(len(rows))),
+                                 pd.DataFrame.from_records([meta for _, meta in current], index=range(len(rows))))
+    return [{
+        "reference": row.get("reference"),
+        "csv_row": row,
+        "qdc_xml": qdc_xml,
+        "current_metadata": current_meta,
+        "changes": row_changes
+    } for row, (qdc_xml, current_meta), row_changes in zip(rows, current, changes)]
@@ -1,13 +1,16 @@
 # update_metadata/metadata_updater.py
 
+import hashlib
 import xml.etree.ElementTree as ET
 from pyPreservica import EntityAPI
-from typing import Dict
-from .metadata_diff import NAMESPACES
+from typing import Dict, List, Optional
+from .metadata_diff import NAMESPACES, is_diff_column
 from collections import defaultdict
 import re
 from xml.etree.ElementTree import Element, SubElement, tostring, register_namespace
-from .metadata_diff import fetch_current_metadata
+from .concurrency import bounded_map
+from .metadata_utils import find_qdc_url, resolve_entity, schema_leaves
+from .row_cache import get_row_cache
 
 QDC_NAMESPACE = "http://www.openarchives.org/OAI/2.0/oai_dc/"
 DC_NAMESPACE = "http://purl.org/dc/elements/1.1/"
@@ -53,17 +56,35 @@ def build_qdc_xml(metadata: Dict[str, str]) -> str:
 
 
 
-def update_asset_metadata(client: EntityAPI, reference: str, updated_metadata: Dict[str, str]) -> str:
-    try:
-        entity = client.asset(reference)
-    except Exception:
-        entity = client.folder(reference)
+# Most block writes issued at once for a single entity
+BLOCK_WRITE_WORKERS = 4
+
+
+class BlockWriteError(Exception):
+    """Raised by update_asset_metadata when some of an entity's block writes failed.
+
+    results holds every block's outcome, including the writes that succeeded.
+    """
+
+    def __init__(self, results: List[Dict[str, str]]):
+        self.results = results
+        super().__init__(describe_block_results(results))
+
 
-    metadata_blocks = entity.metadata or {}
+def describe_block_results(results: List[Dict[str, str]]) -> str:
+    if not results:
+        return "No changes applied"
+    return "; ".join(r["message"] for r in results)
 
-    # Prepare grouped DC values and custom-schema values
+
+def group_columns(updated_metadata: Dict[str, str]):
+    """Splits a sheet row into ({dc:key: [values]}, {schema_url: {element: {index: value}}}).
+
+    A custom column's index is its .N suffix (0 without one), schema_columns'
+    numbering of the element's leaves.
+    """
     dc_grouped = defaultdict(list)  # base dc:key -> [values]
-    custom_schemas = defaultdict(lambda: defaultdict(list))  # schema_url -> {element: [values]}
+    custom_schemas = defaultdict(lambda: defaultdict(dict))  # schema_url -> {element: {index: value}}
 
     for key, value in updated_metadata.items():
         # Skip known non-metadata columns commonly present in CSV exports
@@ -81,98 +102,268 @@ def update_asset_metadata(client: EntityAPI, reference: str, updated_metadata: D
         elif "::" in key:
             schema_url, elem = key.split("::", 1)
             schema_url = schema_url.strip()
-            elem = elem.strip()
+            # Repeated elements are exported as schema::element.1, .2, ...
+            match = re.match(r"^(.*)\.(\d+)$", elem.strip())
+            elem, index = (match.group(1), int(match.group(2))) if match else (elem.strip(), 0)
             if schema_url and elem:
-                custom_schemas[schema_url][elem].append(val)
+                custom_schemas[schema_url][elem][index] = val
         else:
             # Non-dc single unknown headers: treat as a DC-less custom field under a generic metadata block
             # Put them under a generic local schema URL so they get added as a separate metadata block
-            custom_schemas["urn:local:custom"][key].append(val)
+            custom_schemas["urn:local:custom"][key][0] = val
+    return dc_grouped, custom_schemas
 
-    results = []
 
-    # Handle QDC (dc:) metadata
-    if dc_grouped:
-        schema_url = DC_NAMESPACE
+def block_schema(column: str) -> str:
+    """The block a dc:/dcterms:/schemaURL::element column is written to (DC_NAMESPACE for QDC fields)."""
+    if column.startswith("dc:") or column.startswith("dcterms:"):
+        return DC_NAMESPACE
+    return column.split("::", 1)[0].strip()
 
-        # Try to fetch existing QDC XML
-        qdc_xml, _ = fetch_current_metadata(client, reference)
 
-        if qdc_xml:
-            # Parse existing XML and replace groups
-            root = ET.fromstring(qdc_xml)
-            ns = {"dc": DC_NAMESPACE, "dcterms": DCTERMS_NAMESPACE}
+def changed_blocks_only(row: Dict[str, str], changes: Dict) -> Dict[str, str]:
+    """row without the diffed cells of blocks none of whose cells changed, so those blocks aren't written.
 
-            for base_key, values in dc_grouped.items():
-                prefix, tag = base_key.split(":", 1)
-                ns_uri = ns.get(prefix, DC_NAMESPACE)
+    A changed block keeps all its cells: QDC elements are replaced per tag,
+    so an unchanged dc:subject.1 has to travel with a changed dc:subject.
+    """
+    changed = {block_schema(column) for column in changes}
+    return {k: v for k, v in row.items() if not is_diff_column(k) or block_schema(k) in changed}
 
-                # Remove existing elements of this tag (using the correct namespace)
-                for elem in list(root.findall(f".//{{{ns_uri}}}{tag}")):
-                    parent = root
-                    parent.remove(elem)
 
-                # Add new elements
-                for v in values:
-                    new_elem = ET.SubElement(root, f"{{{ns_uri}}}{tag}")
-                    new_elem.text = v
+def build_qdc_target(client, entity, dc_grouped, qdc_xml: Optional[str] = None) -> str:
+    """New QDC XML: the entity's current block with the grouped dc:/dcterms: elements replaced, or a fresh block.
+
+    qdc_xml is the current block when the caller already read it. Raises
+    ET.ParseError if the current block isn't valid XML.
+    """
+    if qdc_xml is None:
+        qdc_url = find_qdc_url(entity)
+        qdc_xml = client.metadata(qdc_url) if qdc_url else ""
+
+    if qdc_xml:
+        # Parse existing XML and replace groups
+        root = ET.fromstring(qdc_xml)
+        ns = {"dc": DC_NAMESPACE, "dcterms": DCTERMS_NAMESPACE}
+
+        for base_key, values in dc_grouped.items():
+            prefix, tag = base_key.split(":", 1)
+            ns_uri = ns.get(prefix, DC_NAMESPACE)
+
+            # Remove existing elements of this tag (using the correct namespace)
+            for elem in list(root.findall(f".//{{{ns_uri}}}{tag}")):
+                parent = root
+                parent.remove(elem)
+
+            # Add new elements
+            for v in values:
+                new_elem = ET.SubElement(root, f"{{{ns_uri}}}{tag}")
+                new_elem.text = v
+
+        return ET.tostring(root, encoding="unicode")
+
+    # Build fresh QDC XML
+    # build_qdc_xml filters keys starting with dc: and dcterms: and will create a proper DC-rooted XML
+    # build a flat mapping like dc:tag, dc:tag.1 ...
+    flat = {}
+    for base_key, values in dc_grouped.items():
+        for idx, v in enumerate(values):
+            keyname = base_key if idx == 0 else f"{base_key}.{idx}"
+            flat[keyname] = v
+    return build_qdc_xml(flat)
+
+
+def build_custom_xml(schema_url, elements) -> str:
+    """XML for a new custom-schema block built from {element: {index: value}}."""
+    # Preservica requires a default namespace matching the schemaUri. It's written as an
+    # explicit xmlns on unqualified tags rather than through register_namespace, whose
+    # prefix map is process-global and shared by builds for other schemas on other threads.
+    root = Element("metadata", {"xmlns": schema_url})
+    for elem_name, vals in elements.items():
+        for _, v in sorted(vals.items()):
+            SubElement(root, elem_name).text = v
+    return tostring(root, encoding="unicode")
+
+
+def _tostring(root) -> str:
+    """Serializes a parsed block (modifying it) with the root's namespace as an explicit default xmlns.
+
+    Tags in that namespace are made unqualified and xmlns is set on the
+    root, so ElementTree's process-global prefix map is never touched. A
+    block holding elements outside any namespace keeps generated prefixes.
+    """
+    if not root.tag.startswith("{"):
+        return tostring(root, encoding="unicode")
+    elements = [e for e in root.iter() if isinstance(e.tag, str)]
+    if any(not e.tag.startswith("{") for e in elements):
+        return tostring(root, encoding="unicode")
+    ns = root.tag[1:].split("}")[0]
+    qualifier = f"{{{ns}}}"
+    for e in elements:
+        if e.tag.startswith(qualifier):
+            e.tag = e.tag[len(qualifier):]
+    root.set("xmlns", ns)
+    return tostring(root, encoding="unicode")
 
-            updated_xml = ET.tostring(root, encoding="unicode")
-        else:
-            # Build fresh QDC XML
-            # build_qdc_xml filters keys starting with dc: and dcterms: and will create a proper DC-rooted XML
-            # build a flat mapping like dc:tag, dc:tag.1 ...
-            flat = {}
-            for base_key, values in dc_grouped.items():
-                for idx, v in enumerate(values):
-                    keyname = base_key if idx == 0 else f"{base_key}.{idx}"
-                    flat[keyname] = v
-            updated_xml = build_qdc_xml(flat)
-
-        # Add or update QDC block
-        if DC_NAMESPACE in (metadata_blocks or {}).values():
-            client.update_metadata(entity, DC_NAMESPACE, updated_xml)
-            results.append("Updated existing QDC metadata")
-        else:
-            client.add_metadata(entity, DC_NAMESPACE, updated_xml)
-            results.append("Added new QDC metadata")
 
-    # Handle custom schema blocks
+def patch_custom_xml(xml_text: str, elements) -> Optional[str]:
+    """The current custom-schema block with only the edited leaf texts changed; None if nothing changed.
+
+    elements is {element: {index: value}}, index N meaning the Nth leaf of
+    that name as schema_columns numbers them. The root, its attributes,
+    nested elements and every other leaf are kept as they are, and a value
+    past the last leaf of its name is added right after that leaf. Raises
+    ET.ParseError if the block isn't valid XML.
+    """
+    root = ET.fromstring(xml_text)
+    leaves = defaultdict(list)
+    for elem in schema_leaves(root):
+        leaves[elem.tag.split("}")[-1]].append(elem)
+    root_ns = root.tag[1:].split("}")[0] if root.tag.startswith("{") else ""
+
+    changed = False
+    for name, values in elements.items():
+        existing = leaves[name]
+        for index, value in sorted(values.items()):
+            if index < len(existing):
+                if existing[index].text.strip() != value:
+                    existing[index].text = value
+                    changed = True
+                continue
+            tag = existing[0].tag if existing else (f"{{{root_ns}}}{name}" if root_ns else name)
+            child = Element(tag)
+            child.text = value
+            if existing:
+                root.insert(list(root).index(existing[-1]) + 1, child)
+            else:
+                root.append(child)
+            existing.append(child)
+            changed = True
+    return _tostring(root) if changed else None
+
+
+def block_url(entity, schema: str) -> Optional[str]:
+    """URL of the entity's block with exactly this schema, if it has one."""
+    return next((url for url, s in (entity.metadata or {}).items() if s == schema), None)
+
+
+def _write_block(client, entity, schema_url, updated_xml, previous, journal, added, updated) -> Dict[str, str]:
+    """add_metadata or update_metadata, journaled ahead of the write (previous is None for a new block).
+
+    The journal gets the previous XML before the block is touched and a
+    commit once the write succeeds, so a failed or interrupted write can
+    still be restored.
+    """
+    if block_url(entity, schema_url):
+        result = {"schema": schema_url, "action": "updated", "message": updated}
+        write = client.update_metadata
+    else:
+        result = {"schema": schema_url, "action": "added", "message": added}
+        write = client.add_metadata
+        previous = None
+    record_id = None
+    if journal is not None:
+        record_id = journal.begin(entity.reference, schema_url, result["action"], previous, updated_xml)
+    try:
+        write(entity, schema_url, updated_xml)
+    finally:
+        get_row_cache().invalidate(entity.reference)  # the block may have changed even if the call failed
+    if journal is not None:
+        journal.commit(record_id)
+    result["xml_hash"] = hashlib.sha256(updated_xml.encode("utf-8")).hexdigest()[:16]
+    return result
+
+
+def _write_qdc(client, entity, dc_grouped, journal=None) -> Dict[str, str]:
+    """Replaces the grouped dc:/dcterms: elements in the entity's QDC block, or adds a new block."""
+    qdc_url = find_qdc_url(entity)
+    qdc_xml = client.metadata(qdc_url) if qdc_url else ""
+    updated_xml = build_qdc_target(client, entity, dc_grouped, qdc_xml)
+    previous = None
+    if journal is not None:
+        # The block written is the DC_NAMESPACE one, which isn't always the "dc" block just read
+        target_url = block_url(entity, DC_NAMESPACE)
+        previous = qdc_xml if target_url == qdc_url else (client.metadata(target_url) if target_url else None)
+    return _write_block(client, entity, DC_NAMESPACE, updated_xml, previous, journal,
+                        "Added new QDC metadata", "Updated existing QDC metadata")
+
+
+def custom_target(client, entity, schema_url, elements):
+    """(current XML or None, XML to write or None if the edited cells already match) for one custom block."""
+    url = block_url(entity, schema_url)
+    current = client.metadata(url) if url else None
+    if current:
+        return current, patch_custom_xml(current, elements)
+    return current, build_custom_xml(schema_url, elements)
+
+
+def _write_custom(client, entity, schema_url, elements, journal=None) -> Dict[str, str]:
+    """Patches one custom-schema block with {element: {index: value}}, or adds it; skips it if unchanged."""
+    previous, updated_xml = custom_target(client, entity, schema_url, elements)
+    if updated_xml is None:
+        return {"schema": schema_url, "action": "unchanged", "message": f"No changes for {schema_url}"}
+    return _write_block(client, entity, schema_url, updated_xml, previous, journal,
+                        f"Added metadata for {schema_url}", f"Updated metadata for {schema_url}")
+
+
+def plan_metadata_blocks(client, entity, updated_metadata: Dict[str, str]) -> List[Dict[str, str]]:
+    """Builds (without writing) the XML every block of a sheet row would get: [{schema, action, xml}].
+
+    Used by the pre-flight check; custom blocks whose edited cells already
+    match are left out. Raises ET.ParseError if a current block is unreadable.
+    """
+    dc_grouped, custom_schemas = group_columns(updated_metadata)
+    existing = set((entity.metadata or {}).values())
+    plans = []
+    if dc_grouped:
+        plans.append({"schema": DC_NAMESPACE, "action": "update" if DC_NAMESPACE in existing else "add",
+                      "xml": build_qdc_target(client, entity, dc_grouped)})
     for schema_url, elements in custom_schemas.items():
-        # Build XML for this custom schema. Preservica requires a default namespace
-        # that matches the schemaUri; create namespaced elements when possible.
-        try:
-            # register default namespace so tostring() emits it
-            register_namespace('', schema_url)
-        except Exception:
-            pass
-
-        # Create root element with the schema_url as the default namespace
-        try:
-            root = Element(f"{{{schema_url}}}metadata")
-        except Exception:
-            # fallback to non-namespaced element if schema_url not usable as namespace
-            root = Element("metadata")
-
-        for elem_name, vals in elements.items():
-            for v in vals:
-                try:
-                    child = SubElement(root, f"{{{schema_url}}}{elem_name}")
-                except Exception:
-                    child = SubElement(root, elem_name)
-                child.text = v
-
-        updated_xml = tostring(root, encoding="unicode")
-
-        if schema_url in (metadata_blocks or {}).values():
-            client.update_metadata(entity, schema_url, updated_xml)
-            results.append(f"Updated metadata for {schema_url}")
-        else:
-            client.add_metadata(entity, schema_url, updated_xml)
-            results.append(f"Added metadata for {schema_url}")
+        _, xml = custom_target(client, entity, schema_url, elements)
+        if xml is not None:
+            plans.append({"schema": schema_url, "action": "update" if schema_url in existing else "add",
+                          "xml": xml})
+    return plans
+
+
+def apply_metadata_blocks(client: EntityAPI, reference: str, updated_metadata: Dict[str, str],
+                          cache=None, journal=None) -> List[Dict[str, str]]:
+    """Writes a sheet row to an entity and returns one result per metadata block.
 
-    if results:
-        return "; ".join(results)
+    The entity is resolved once and each block (QDC, every custom schema) is
+    written concurrently; blocks are independent, so one failed write doesn't
+    stop the others. Custom blocks are read first and only their edited
+    leaves patched; a block whose cells already match isn't written.
+    Results are {schema, action, message, xml_hash} with action "added",
+    "updated", "unchanged" or "failed", in the order QDC first, then the
+    sheet's schema order. With a Journal every successful write is recorded
+    along with the block's previous XML.
+    """
+    dc_grouped, custom_schemas = group_columns(updated_metadata)
+    if not dc_grouped and not custom_schemas:
+        return []
+
+    entity, _ = resolve_entity(client, reference, cache)
+
+    writes = []
+    if dc_grouped:
+        writes.append((DC_NAMESPACE, lambda: _write_qdc(client, entity, dc_grouped, journal)))
+    for schema_url, elements in custom_schemas.items():
+        writes.append((schema_url, lambda s=schema_url, e=elements: _write_custom(client, entity, s, e, journal)))
+
+    results = []
+    workers = min(len(writes), BLOCK_WRITE_WORKERS)
+    for (schema_url, _), result, error in bounded_map(lambda w: w[1](), writes, max_workers=workers, ordered=True):
+        if error is not None:
+            result = {"schema": schema_url, "action": "failed",
+                      "message": f"Failed to write metadata for {schema_url}: {error}"}
+        results.append(result)
+    return results
 
-    return "No changes applied"
 
+def update_asset_metadata(client: EntityAPI, reference: str, updated_metadata: Dict[str, str], cache=None) -> str:
+    """Applies a sheet row to one entity; raises BlockWriteError if any block write failed."""
+    results = apply_metadata_blocks(client, reference, updated_metadata, cache)
+    if any(r["action"] == "failed" for r in results):
+        raise BlockWriteError(results)
+    return describe_block_results(results)
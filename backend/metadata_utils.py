@@ -0,0 +1,88 @@
+# backend/metadata_utils.py
+
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Tuple
+from .metadata_diff import NAMESPACES
+
+ENTITY_TYPE_NAMESPACE = "entity_type"
+# Allow-list name for the QDC block, whatever its exact schema URI
+QDC_ALIAS = "qdc"
+
+
+def resolve_entity(client, reference: str, cache=None) -> Tuple[object, str]:
+    """Fetches a reference as an asset or folder and returns (entity, "ASSET"/"FOLDER").
+
+    Without a hint this costs a failed client.asset() call for every folder; when
+    a cache is given the known type is tried first and newly learned types are stored.
+    """
+    known = cache.get(ENTITY_TYPE_NAMESPACE, reference) if cache else None
+    order = ["FOLDER", "ASSET"] if known == "FOLDER" else ["ASSET", "FOLDER"]
+
+    error = None
+    for etype in order:
+        try:
+            entity = client.asset(reference) if etype == "ASSET" else client.folder(reference)
+        except Exception as e:
+            error = e
+            continue
+        if cache and known != etype:
+            cache.set(ENTITY_TYPE_NAMESPACE, reference, etype)
+        return entity, etype
+    raise error
+
+
+def is_qdc_schema(schema: str) -> bool:
+    """The toolkit's long-standing test for the QDC block: the schema URI contains "dc"."""
+    return "dc" in schema.lower()
+
+
+def find_qdc_url(entity) -> Optional[str]:
+    """Returns the URL of the entity's QDC block (first schema containing "dc"), if any."""
+    return next((url for url, schema in (entity.metadata or {}).items() if is_qdc_schema(schema)), None)
+
+
+def qdc_columns(xml_text: str) -> Dict[str, str]:
+    """Flattens a QDC block into export columns (dc:title, dc:subject.1, ...), skipping empty elements.
+
+    Raises ET.ParseError for malformed XML.
+    """
+    root = ET.fromstring(xml_text)
+    columns = {}
+    counts = {}
+    for prefix, uri in NAMESPACES.items():
+        for elem in root.findall(f".//{{{uri}}}*"):
+            tag = elem.tag.split("}")[-1]
+            value = (elem.text or "").strip()
+            if not value:
+                continue
+            base = f"{prefix}:{tag}"
+            count = counts.get(base, 0)
+            col = base if count == 0 else f"{base}.{count}"
+            columns[col] = value
+            counts[base] = count + 1
+    return columns
+
+
+def schema_leaves(root) -> List[ET.Element]:
+    """The root's direct children that become schema:: columns: elements with text and no child elements."""
+    return [elem for elem in root
+            if isinstance(elem.tag, str) and len(elem) == 0 and (elem.text or "").strip()]
+
+
+def schema_columns(schema: str, xml_text: str) -> Dict[str, str]:
+    """Flattens a custom-schema block into schema::element(.N) columns.
+
+    Only text leaves directly under the root are columns (schema_leaves);
+    nested elements, attributes and the root itself aren't exported, and
+    the updater patches the edited leaves in place so they survive a
+    round trip. Raises ET.ParseError for malformed XML.
+    """
+    root = ET.fromstring(xml_text)
+    columns = {}
+    counts = {}
+    for elem in schema_leaves(root):
+        base = f"{schema}::{elem.tag.split('}')[-1]}"
+        count = counts.get(base, 0)
+        columns[base if count == 0 else f"{base}.{count}"] = elem.text.strip()
+        counts[base] = count + 1
+    return columns
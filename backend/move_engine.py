@@ -0,0 +1,263 @@
+# backend/move_engine.py
+
+import csv
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+import pyPreservica as pyp
+from .concurrency import bounded_map
+from .jobs import JobCancelled
+from .traversal import iter_descendants
+
+DEFAULT_MOVE_WORKERS = 4
+
+# Server-side move states that mean "still working" (see pyPreservica AsyncProgress)
+ACTIVE_STATES = ("ACTIVE", "PENDING", "SUSPENDING")
+POLL_START = 0.25
+POLL_MAX = 5.0
+# Longest a single move is followed before it's given up on and reported as failed
+MOVE_TIMEOUT = 3600.0
+TIMEOUT_STATUS = "TIMEOUT"
+
+MANIFEST_FIELDS = ["reference", "status", "server_status", "error"]
+
+# Move modes: "flatten" moves every descendant asset individually into the destination;
+# "subtree" moves the source folder's immediate children (folders as whole units).
+MODE_FLATTEN = "flatten"
+MODE_SUBTREE = "subtree"
+
+CHILDREN_PAGE_SIZE = 100
+# A move is one move_async call plus at least one progress poll
+CALLS_PER_MOVE = 2
+
+
+def move_entity(client, entity, destination_folder, job=None, timeout: Optional[float] = None) -> str:
+    """Starts an asynchronous move and follows the server's progress until it settles.
+
+    Returns the final status reported by the server (e.g. "COMPLETED"), or
+    TIMEOUT_STATUS if it is still running after timeout seconds (default
+    MOVE_TIMEOUT). When job is given, a cancel is noticed between polls and
+    raises JobCancelled, so the caller reports the move as cancelled.
+    """
+    pid = client.move_async(entity, destination_folder)
+    deadline = time.monotonic() + (MOVE_TIMEOUT if timeout is None else timeout)
+    delay = POLL_START
+    while True:
+        status = client.get_async_progress(pid)
+        if status not in ACTIVE_STATES:
+            return status
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return TIMEOUT_STATUS
+        if job is None:
+            time.sleep(min(delay, remaining))
+        elif job.wait(min(delay, remaining)):
+            raise JobCancelled(job.name)
+        delay = min(delay * 2, POLL_MAX)
+
+
+def _manifest_entry(reference, server_status="", error=None) -> Dict[str, str]:
+    ok = error is None and server_status == "COMPLETED"
+    if error is None and server_status == TIMEOUT_STATUS:
+        error = f"Still running after {MOVE_TIMEOUT:.0f}s; stopped following it (the server may still complete it)"
+    elif error is None and not ok:
+        error = f"Server reported {server_status or 'no status'}"
+    return {
+        "reference": reference,
+        "status": "moved" if ok else "failed",
+        "server_status": server_status or "",
+        "error": "" if ok else str(error),
+    }
+
+
+def _cancelled_entry(reference) -> Dict[str, str]:
+    return {
+        "reference": reference,
+        "status": "cancelled",
+        "server_status": "",
+        "error": "Cancelled before the server confirmed the move; it may still complete",
+    }
+
+
+def _run_moves(items: Iterable, do_move: Callable, max_workers: int,
+               on_result: Optional[Callable[[Dict[str, str]], None]], checkpoint=None) -> List[Dict[str, str]]:
+    """Moves items concurrently and returns the manifest.
+
+    If the job is cancelled, no further moves start and the ones in flight
+    are no longer followed: they go into the manifest as "cancelled" (the
+    server may still finish them) and the manifest is returned as usual.
+    When items is a list, a run that finishes is checked against it: every
+    listed reference must have a manifest entry, and any that don't are
+    added as failed.
+    """
+    listed = items if isinstance(items, list) else None
+    if checkpoint is not None:
+        # References already moved by an earlier run are skipped without any API call
+        items = (i for i in items if checkpoint.get(getattr(i, "reference", i)) != "moved")
+
+    started = {}  # sequence number -> item, for moves that began but haven't been reported
+    lock = threading.Lock()
+
+    def tracked(numbered):
+        seq, item = numbered
+        with lock:
+            started[seq] = item
+        return do_move(item)
+
+    manifest = []
+
+    def report(entry):
+        manifest.append(entry)
+        if checkpoint is not None:
+            checkpoint.record(entry["reference"], entry["status"])
+        if on_result:
+            on_result(entry)
+
+    try:
+        for (seq, item), status, error in bounded_map(tracked, enumerate(items), max_workers=max_workers):
+            with lock:
+                started.pop(seq, None)
+            report(_manifest_entry(getattr(item, "reference", item), status, error))
+    except JobCancelled:
+        with lock:
+            abandoned = [started[seq] for seq in sorted(started)]
+        for item in abandoned:
+            report(_cancelled_entry(getattr(item, "reference", item)))
+        return manifest
+
+    if listed is not None:
+        reported = {m["reference"] for m in manifest}
+        missing = [ref for ref in (getattr(i, "reference", i) for i in listed)
+                   if ref not in reported and (checkpoint is None or checkpoint.get(ref) != "moved")]
+        if missing:
+            print(f"⚠️ {len(missing)} of {len(listed)} listed item(s) were never moved; marked as failed")
+            for ref in missing:
+                report(_manifest_entry(ref, error="Listed but never moved"))
+    return manifest
+
+
+def move_folder_assets(client, source_ref: str, destination_ref: str, max_workers: int = DEFAULT_MOVE_WORKERS,
+                       on_result: Optional[Callable[[Dict[str, str]], None]] = None,
+                       checkpoint=None, job=None) -> List[Dict[str, str]]:
+    """Moves every asset below source_ref into destination_ref (flattening the tree).
+
+    The whole tree is listed before the first move: the listings are paged by
+    offset, so moving assets out of a folder while its pages are still being
+    read would shift later items past the offset and skip them.
+    Returns a per-reference manifest; on_result is called after each move settles.
+    """
+    destination_folder = client.folder(destination_ref)
+    assets = list(iter_descendants(client, source_ref, assets_only=True))
+    return _run_moves(assets, lambda asset: move_entity(client, asset, destination_folder, job), max_workers, on_result,
+                      checkpoint)
+
+
+def move_folder_children(client, source_ref: str, destination_ref: str, max_workers: int = DEFAULT_MOVE_WORKERS,
+                         on_result: Optional[Callable[[Dict[str, str]], None]] = None,
+                         checkpoint=None, job=None) -> List[Dict[str, str]]:
+    """Moves the immediate children of source_ref into destination_ref, keeping their structure.
+
+    Child folders move as whole units, so the call count is O(children) rather
+    than O(assets). The (now empty) source folder itself stays where it is.
+    The children are listed in full before the first move, for the same
+    paging reason as move_folder_assets.
+    """
+    destination_folder = client.folder(destination_ref)
+    children = list(client.descendants(source_ref))
+    return _run_moves(children, lambda entity: move_entity(client, entity, destination_folder, job), max_workers,
+                      on_result, checkpoint)
+
+
+def move_folder(client, source_ref: str, destination_ref: str, mode: str = MODE_FLATTEN,
+                max_workers: int = DEFAULT_MOVE_WORKERS,
+                on_result: Optional[Callable[[Dict[str, str]], None]] = None,
+                checkpoint=None, job=None) -> List[Dict[str, str]]:
+    """Moves the contents of source_ref using the given mode (MODE_FLATTEN or MODE_SUBTREE)."""
+    if mode == MODE_SUBTREE:
+        return move_folder_children(client, source_ref, destination_ref, max_workers, on_result, checkpoint, job)
+    if mode == MODE_FLATTEN:
+        return move_folder_assets(client, source_ref, destination_ref, max_workers, on_result, checkpoint, job)
+    raise ValueError(f"Unknown move mode: {mode}")
+
+
+def _list_children(client, folder_ref: str):
+    """Returns (children, page_calls) for one folder."""
+    children = []
+    pages = 1
+    paged = client.children(folder_ref, maximum=CHILDREN_PAGE_SIZE)
+    children.extend(paged.results)
+    while paged.has_more:
+        paged = client.children(folder_ref, maximum=CHILDREN_PAGE_SIZE, next_page=paged.next_page)
+        children.extend(paged.results)
+        pages += 1
+    return children, pages
+
+
+def plan_move(client, source_ref: str, include_flatten: bool = True) -> Dict[str, int]:
+    """Dry run: estimates how many API calls each move mode would need, without moving anything.
+
+    The subtree estimate only lists the source folder. The flatten estimate has
+    to walk the whole tree (which is exactly why that mode is expensive); pass
+    include_flatten=False to skip it.
+    """
+    children, pages = _list_children(client, source_ref)
+    child_folders = [c.reference for c in children if isinstance(c, pyp.Folder)]
+
+    plan = {
+        "children": len(children),
+        "child_folders": len(child_folders),
+        "child_assets": len(children) - len(child_folders),
+        MODE_SUBTREE: 1 + pages + CALLS_PER_MOVE * len(children),
+    }
+
+    if include_flatten:
+        assets = plan["child_assets"]
+        folders = 0
+        listing_calls = pages
+        stack = list(child_folders)
+        while stack:
+            ref = stack.pop()
+            folders += 1
+            sub, sub_pages = _list_children(client, ref)
+            listing_calls += sub_pages
+            for c in sub:
+                if isinstance(c, pyp.Folder):
+                    stack.append(c.reference)
+                else:
+                    assets += 1
+        plan["assets"] = assets
+        plan["folders"] = folders
+        plan[MODE_FLATTEN] = 1 + listing_calls + CALLS_PER_MOVE * assets
+
+    return plan
+
+
+def move_references(client, refs: List[str], destination_ref: str, max_workers: int = DEFAULT_MOVE_WORKERS,
+                    on_result: Optional[Callable[[Dict[str, str]], None]] = None,
+                    checkpoint=None, job=None) -> List[Dict[str, str]]:
+    """Moves a list of asset or folder references into destination_ref."""
+    destination_folder = client.folder(destination_ref)
+
+    def resolve_and_move(ref):
+        try:
+            entity = client.asset(ref)
+        except Exception:
+            entity = client.folder(ref)
+        return move_entity(client, entity, destination_folder, job)
+
+    return _run_moves(refs, resolve_and_move, max_workers, on_result, checkpoint)
+
+
+def summarize_manifest(manifest: List[Dict[str, str]]):
+    """Returns (moved, failed) counts for a manifest (entries cancelled mid-move count as neither)."""
+    moved = sum(1 for m in manifest if m["status"] == "moved")
+    failed = sum(1 for m in manifest if m["status"] == "failed")
+    return moved, failed
+
+
+def write_manifest(path: str, manifest: List[Dict[str, str]]) -> str:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=MANIFEST_FIELDS)
+        writer.writeheader()
+        writer.writerows(manifest)
+    return path
@@ -0,0 +1,165 @@
+# backend/preflight.py
+
+import re
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+from .coalesce import IGNORED_COLUMNS, coalesce_rows
+from .concurrency import bounded_map
+from .jobs import NullProgress
+from .metadata_updater import plan_metadata_blocks
+from .metadata_utils import resolve_entity
+
+DEFAULT_PREFLIGHT_WORKERS = 8
+ERROR = "error"
+WARNING = "warning"
+
+# XML element names (NCName, simplified to ASCII) with an optional .N repeat suffix
+_ELEMENT_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_.-]*$")
+_REPEAT_SUFFIX = re.compile(r"\.\d+$")
+# Characters XML 1.0 can't carry
+_ILLEGAL_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _problem(severity, message, row=None, reference=None, column=None) -> Dict:
+    # row is the sheet line number (the header is line 1)
+    return {"severity": severity, "row": row, "reference": reference, "column": column, "message": message}
+
+
+def check_headers(columns: Iterable[str]) -> List[Dict]:
+    """Header syntax problems: dc:/dcterms: fields, schemaURL::element headers and plain custom names."""
+    problems = []
+    columns = list(columns)
+    if "reference" not in columns:
+        problems.append(_problem(ERROR, "The sheet has no reference column"))
+    for column in columns:
+        if column in IGNORED_COLUMNS:
+            continue
+        if column.startswith(("dc:", "dcterms:")):
+            element = _REPEAT_SUFFIX.sub("", column.split(":", 1)[1])
+            if not _ELEMENT_NAME.match(element):
+                problems.append(_problem(ERROR, f"'{element}' is not a valid element name", column=column))
+        elif "::" in column:
+            schema_url, element = (part.strip() for part in column.split("::", 1))
+            element = _REPEAT_SUFFIX.sub("", element)
+            if not schema_url or re.search(r"\s", schema_url) or ":" not in schema_url:
+                problems.append(_problem(ERROR, "Expected schemaURL::element with a schema URI", column=column))
+            if not _ELEMENT_NAME.match(element):
+                problems.append(_problem(ERROR, f"'{element}' is not a valid element name", column=column))
+        elif not _ELEMENT_NAME.match(column):
+            problems.append(_problem(ERROR, "Not a valid element name for the urn:local:custom block",
+                                     column=column))
+        else:
+            problems.append(_problem(WARNING, "Not a dc:/dcterms:/schema::element header; "
+                                              "it will be written to a urn:local:custom block", column=column))
+    return problems
+
+
+def _check_values(row: Dict[str, str], line: int) -> List[Dict]:
+    problems = []
+    for column, value in row.items():
+        if column not in IGNORED_COLUMNS and isinstance(value, str) and _ILLEGAL_XML.search(value):
+            problems.append(_problem(ERROR, "Value contains control characters XML can't carry",
+                                     line, row.get("reference"), column))
+    return problems
+
+
+def validate_sheet(client, csv_rows: List[Dict[str, str]], max_workers: int = DEFAULT_PREFLIGHT_WORKERS,
+                   cache=None, progress=None) -> Dict:
+    """Checks an update sheet before any write and returns a validation report.
+
+    One pass covers the headers, every row's values, and every distinct
+    reference: each is resolved concurrently (the entity-type cache, when
+    given, saves the failed asset() call for folders) and the XML each of its
+    blocks would get is built, which also reads and parses the current QDC
+    block. Nothing is written. The report is
+    {rows, references, errors, warnings, problems: [{severity, row, reference, column, message}]}.
+    """
+    progress = progress or NullProgress()
+    problems = []
+    columns = list(dict.fromkeys(key for row in csv_rows for key in row))
+    problems.extend(check_headers(columns))
+    header_errors = {p["column"] for p in problems if p["severity"] == ERROR and p["column"]}
+
+    rows_by_ref = defaultdict(list)
+    bad_values = set()  # (line, column) cells already reported
+    for i, row in enumerate(csv_rows):
+        line = i + 2
+        ref = (row.get("reference") or "").strip()
+        if not ref:
+            if any(str(v).strip() for k, v in row.items() if v is not None and k != "reference"):
+                problems.append(_problem(ERROR, "Row has values but no reference", line))
+            continue
+        value_problems = _check_values(row, line)
+        problems.extend(value_problems)
+        bad_values.update((line, p["column"]) for p in value_problems)
+        rows_by_ref[ref].append((line, row))
+
+    for ref, entries in rows_by_ref.items():
+        if len(entries) > 1:
+            lines = ", ".join(str(line) for line, _ in entries)
+            problems.append(_problem(WARNING, f"Reference appears on rows {lines}; they are merged into "
+                                              f"one write", entries[-1][0], ref))
+    for entry in coalesce_rows(csv_rows):
+        for column, values in entry["conflicts"].items():
+            listed = ", ".join(f"row {line}: {value!r}" for line, value in values)
+            problems.append(_problem(ERROR, f"Rows for this reference disagree ({listed})",
+                                     values[1][0], entry["reference"], column))
+
+    progress.set_total(len(rows_by_ref))
+
+    def entries_line(ref):
+        return rows_by_ref[ref][0][0]
+
+    def check(ref):
+        found = []
+        try:
+            entity, _ = resolve_entity(client, ref, cache)
+        except Exception as e:
+            return [_problem(ERROR, f"Reference not found: {e}", entries_line(ref), ref)]
+        # Broken headers and values are already reported; don't build XML from them
+        usable = [{k: v for k, v in row.items() if k not in header_errors and (line, k) not in bad_values}
+                  for line, row in rows_by_ref[ref]]
+        # The rows are written as one, so the XML is built once from their merge
+        line = entries_line(ref)
+        try:
+            plans = plan_metadata_blocks(client, entity, coalesce_rows(usable)[0]["row"])
+        except ET.ParseError as e:
+            return [_problem(ERROR, f"A current metadata block is not valid XML: {e}", line, ref)]
+        except Exception as e:
+            return [_problem(ERROR, f"Could not build metadata: {e}", line, ref)]
+        for plan in plans:
+            try:
+                ET.fromstring(plan["xml"])
+            except ET.ParseError as e:
+                found.append(_problem(ERROR, f"Built {plan['schema']} block is not valid XML: {e}", line, ref))
+        return found
+
+    for ref, found, error in bounded_map(check, list(rows_by_ref), max_workers=max_workers):
+        if error is not None:
+            found = [_problem(ERROR, f"Check failed: {error}", entries_line(ref), ref)]
+        problems.extend(found)
+        progress.advance(failed=1 if any(p["severity"] == ERROR for p in found) else 0)
+
+    problems.sort(key=lambda p: (p["row"] or 0, p["column"] or ""))
+    errors = sum(1 for p in problems if p["severity"] == ERROR)
+    return {
+        "rows": len(csv_rows),
+        "references": len(rows_by_ref),
+        "errors": errors,
+        "warnings": len(problems) - errors,
+        "problems": problems,
+    }
+
+
+def describe_problems(report: Dict, limit: Optional[int] = 20) -> str:
+    """Readable lines for a validation report (the first `limit` problems)."""
+    lines = [f"{report['errors']} error(s), {report['warnings']} warning(s) "
+             f"in {report['rows']} row(s) / {report['references']} reference(s)"]
+    shown = report["problems"] if limit is None else report["problems"][:limit]
+    for p in shown:
+        where = [f"row {p['row']}" if p["row"] else "", p["reference"] or "", p["column"] or ""]
+        lines.append(f"{p['severity'].upper()}: {' / '.join(w for w in where if w)}: {p['message']}")
+    if limit is not None and len(report["problems"]) > limit:
+        lines.append(f"... and {len(report['problems']) - limit} more")
+    return "\n".join(lines)
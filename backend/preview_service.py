@@ -0,0 +1,108 @@
+# backend/preview_service.py
+
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+from .concurrency import bounded_map
+from .export_engine import entity_export_row, export_headers
+from .metadata_utils import resolve_entity
+from .row_cache import RowCache, get_row_cache
+
+# Entities previewed at once when a selection is warmed
+PREVIEW_WORKERS = 6
+# Items shown side by side in the comparison table (the rest are still fetched)
+MAX_COMPARE_COLUMNS = 8
+
+
+class PreviewService:
+    """Fetches preview rows for the Browser: each entity and its metadata blocks exactly once.
+
+    A preview row is the export row (fetch_export_row, every block), so the
+    same RowCache entry serves the preview, the side-by-side comparison and
+    a later export of the selection. warm() fetches a whole selection
+    concurrently and can be stopped when the selection changes.
+    """
+
+    def __init__(self, client, cache=None, row_cache: Optional[RowCache] = None):
+        self.client = client
+        self.cache = cache  # CacheStore for the asset/folder type hint
+        self.row_cache = row_cache or get_row_cache()
+        self._pending: Dict[str, threading.Event] = {}  # reference -> set when its fetch finishes
+        self._lock = threading.Lock()
+
+    def cached(self, refs: List[str]) -> Dict[str, Dict[str, str]]:
+        return self.row_cache.rows(refs)
+
+    def entity(self, ref: str):
+        entry = self.row_cache.entry(ref)
+        return entry["entity"] if entry else None
+
+    def fetch(self, ref: str) -> Dict[str, str]:
+        """The preview row for ref, from the row cache or one entity fetch plus its blocks.
+
+        A ref already being fetched (say by the worker of a selection that has
+        since changed) is waited for rather than fetched a second time.
+        """
+        while True:
+            entry = self.row_cache.entry(ref)
+            if entry is not None and entry["schemas"] is None:
+                return entry["row"]
+            with self._lock:
+                pending = self._pending.get(ref)
+                if pending is None:
+                    pending = self._pending[ref] = threading.Event()
+                    break
+            pending.wait()  # then use its row, or fetch here if it failed
+
+        try:
+            entity, etype = resolve_entity(self.client, ref, self.cache)
+            row = entity_export_row(self.client, entity, etype)
+            self.row_cache.put(ref, row, entity, (entity.metadata or {}).values())
+            return row
+        finally:
+            with self._lock:
+                del self._pending[ref]
+            pending.set()
+
+    def warm(self, refs: List[str], stop: Optional[threading.Event] = None,
+             on_row: Optional[Callable[[str, Optional[Dict], Optional[BaseException]], None]] = None,
+             max_workers: int = PREVIEW_WORKERS) -> int:
+        """Fetches every ref not already cached, concurrently; returns how many were fetched.
+
+        on_row(ref, row, error) is called as each one finishes. Setting stop
+        skips whatever hasn't started yet.
+        """
+        cached = self.cached(refs)
+        missing = [ref for ref in dict.fromkeys(refs) if ref not in cached]
+
+        def fetch(ref):
+            if stop is not None and stop.is_set():
+                return None
+            return self.fetch(ref)
+
+        fetched = 0
+        for ref, row, error in bounded_map(fetch, missing, max_workers=max_workers):
+            if row is None and error is None:
+                continue  # stopped before it started
+            fetched += row is not None
+            if on_row:
+                on_row(ref, row, error)
+        return fetched
+
+    def invalidate(self, refs: List[str]):
+        for ref in refs:
+            self.row_cache.invalidate(ref)
+
+
+def compare_rows(rows: List[Dict[str, str]], max_columns: int = MAX_COMPARE_COLUMNS) -> Tuple[List[str], List[Dict]]:
+    """Side-by-side view of up to max_columns rows: (fields, [{field, values, differs}]).
+
+    Fields are every column any of the rows has, in export order, without the
+    raw qdc_xml; differs is True when the items don't all share the value.
+    """
+    rows = rows[:max_columns]
+    fields = [f for f in export_headers(set().union(*rows) if rows else set()) if f not in ("reference", "qdc_xml")]
+    table = []
+    for field in fields:
+        values = [row.get(field, "") for row in rows]
+        table.append({"field": field, "values": values, "differs": len(set(values)) > 1})
+    return fields, table
@@ -0,0 +1,141 @@
+# backend/progress.py
+
+import collections
+import threading
+import time
+from typing import Callable, Optional
+
+# Seconds between progress callbacks (GUI signals, CLI progress events)
+PROGRESS_INTERVAL = 0.25
+# Seconds of history used for the rolling items/sec rate
+RATE_WINDOW = 10.0
+# Minimum span of history before the rolling rate is trusted
+RATE_MIN_SPAN = 0.5
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return ""
+    seconds = int(seconds)
+    hours, rem = divmod(seconds, 3600)
+    minutes, secs = divmod(rem, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m"
+    if minutes:
+        return f"{minutes}m {secs:02d}s"
+    return f"{secs}s"
+
+
+class RateTracker:
+    """Rolling items/sec over the last `window` seconds, from (time, done) samples.
+
+    Sampled by whoever reads the rate (the reporter, the Jobs tab), never per
+    item, so workers pay nothing for it.
+    """
+
+    def __init__(self, window: float = RATE_WINDOW):
+        self.window = window
+        self._samples = collections.deque()
+        self._lock = threading.Lock()
+
+    def sample(self, done: int, now: Optional[float] = None) -> Optional[float]:
+        """Records the current count and returns the rate, or None until RATE_MIN_SPAN seconds are covered."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if not self._samples or now > self._samples[-1][0]:
+                self._samples.append((now, done))
+            while len(self._samples) > 2 and now - self._samples[1][0] >= self.window:
+                self._samples.popleft()
+            (t0, d0), (t1, d1) = self._samples[0], self._samples[-1]
+        return (d1 - d0) / (t1 - t0) if t1 - t0 >= RATE_MIN_SPAN else None
+
+
+class ProgressSnapshot:
+    """Point-in-time view of a job's progress, passed to every progress callback."""
+
+    def __init__(self, done, failed, total, rate, eta, elapsed, state):
+        self.done = done
+        self.failed = failed
+        self.total = total
+        self.rate = rate
+        self.eta = eta
+        self.elapsed = elapsed
+        self.state = state
+
+    @classmethod
+    def from_job(cls, job) -> "ProgressSnapshot":
+        rate = job.throughput()
+        eta = None
+        if job.total is not None and rate > 0:
+            eta = max(0.0, (job.total - job.done) / rate)
+        return cls(job.done, job.failed_items, job.total, rate, eta, job.elapsed(), job.state)
+
+    def percent(self) -> Optional[int]:
+        if not self.total:
+            return None
+        return min(100, int(self.done / self.total * 100))
+
+    def describe(self, verb: str = "Processed", noun: str = "item(s)") -> str:
+        """e.g. "Exported 120/500 item(s) (2 failed) - 45.3/s - ETA 8s"."""
+        count = f"{self.done}/{self.total}" if self.total else str(self.done)
+        text = f"{verb} {count} {noun}"
+        if self.failed:
+            text += f" ({self.failed} failed)"
+        if self.rate:
+            text += f" - {self.rate:.1f}/s"
+        if self.eta is not None and self.total:
+            text += f" - ETA {format_eta(self.eta)}"
+        return text
+
+
+class ProgressReporter:
+    """Polls a job's counters on its own thread and calls callback(snapshot) at a fixed cadence.
+
+    Engines just bump job.advance(); nothing is signalled per item. The
+    callback fires only when the counts changed since the last tick, plus
+    once more when the reporter stops so the final numbers always arrive.
+
+        with ProgressReporter(job, self.progress.emit):
+            export_metadata(...)
+    """
+
+    def __init__(self, job, callback: Callable[[ProgressSnapshot], None], interval: float = PROGRESS_INTERVAL):
+        self.job = job
+        self.callback = callback
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._last = None
+
+    def _emit(self, force=False):
+        snapshot = ProgressSnapshot.from_job(self.job)
+        key = (snapshot.done, snapshot.failed, snapshot.total)
+        if force or key != self._last:
+            self._last = key
+            try:
+                self.callback(snapshot)
+            except Exception:
+                pass  # a broken listener must not take the job down
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self._emit()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._emit(force=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
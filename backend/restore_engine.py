@@ -0,0 +1,121 @@
+# backend/restore_engine.py
+
+import xml.etree.ElementTree as ET
+from typing import Callable, Dict, List, Optional
+from .concurrency import RateLimiter, bounded_map
+from .jobs import NullProgress
+from .journal import PENDING, read_journal
+from .metadata_updater import block_url
+from .metadata_utils import resolve_entity
+from .row_cache import get_row_cache
+
+DEFAULT_RESTORE_WORKERS = 8
+# Default ceiling on restore writes per second (0 = unlimited)
+DEFAULT_RESTORE_RATE = 20
+
+
+def _canonical(xml_text: Optional[str]) -> Optional[str]:
+    """Prefix- and whitespace-insensitive form of a block, for checking it wasn't changed since the journal."""
+    if xml_text is None:
+        return None
+    try:
+        return ET.canonicalize(xml_text, strip_text=True, rewrite_prefixes=True)
+    except ET.ParseError:
+        return xml_text.strip()
+
+
+def plan_restore(records) -> List[Dict]:
+    """Collapses journal records into one restore per entity, walking the journal backwards.
+
+    For each (reference, schema) block the target is the XML from before the
+    block's first journaled write, and the expected current XML is its last
+    write; if that write is still pending it may not have happened, so its
+    previous XML is expected too. Entities come out most recently written
+    first. Returns [{reference, blocks: [{schema, restore, expected}]}]
+    (restore None = delete the block; expected is a list of XML, None = no block).
+    """
+    entities = {}
+    for record in reversed(list(records)):
+        blocks = entities.setdefault(record["reference"], {})
+        if record["schema"] not in blocks:
+            expected = [record["new"]]
+            if record.get("state") == PENDING:
+                expected.append(record["previous"])
+            blocks[record["schema"]] = {"schema": record["schema"], "expected": expected}
+        blocks[record["schema"]]["restore"] = record["previous"]  # ends at the first write's previous
+    return [{"reference": ref, "blocks": list(blocks.values())} for ref, blocks in entities.items()]
+
+
+def restore_entity(client, plan: Dict, limiter: RateLimiter, force: bool = False, cache=None) -> Dict:
+    """Puts one entity's journaled blocks back; blocks changed since the journal are skipped unless force."""
+    entity, _ = resolve_entity(client, plan["reference"], cache)
+    blocks = []
+    for block in plan["blocks"]:
+        schema = block["schema"]
+        url = block_url(entity, schema)
+        try:
+            if not force:
+                current = client.metadata(url) if url else None
+                if _canonical(current) not in [_canonical(xml) for xml in block["expected"]]:
+                    blocks.append({"schema": schema, "action": "conflict",
+                                   "message": f"{schema} changed since it was journaled; skipped"})
+                    continue
+            if block["restore"] is None and not url:
+                # The block the write would have added isn't there (say the add failed): nothing to undo
+                blocks.append({"schema": schema, "action": "unchanged", "message": f"{schema} already absent"})
+                continue
+            limiter.acquire()
+            if block["restore"] is None:
+                client.delete_metadata(entity, schema)
+                action = "deleted"
+            elif url:
+                client.update_metadata(entity, schema, block["restore"])
+                action = "restored"
+            else:
+                client.add_metadata(entity, schema, block["restore"])
+                action = "restored"
+            get_row_cache().invalidate(plan["reference"])
+            blocks.append({"schema": schema, "action": action, "message": f"{action.capitalize()} {schema}"})
+        except Exception as e:
+            blocks.append({"schema": schema, "action": "failed", "message": f"Failed to restore {schema}: {e}"})
+    return {"reference": plan["reference"], "blocks": blocks}
+
+
+def restore_journal(client, journal_path: str, max_workers: int = DEFAULT_RESTORE_WORKERS,
+                    rate: Optional[float] = DEFAULT_RESTORE_RATE, force: bool = False, progress=None,
+                    on_result: Optional[Callable[[Dict], None]] = None, cache=None) -> Dict:
+    """Reverts every write recorded in a Journal, newest first.
+
+    Entities are restored concurrently (max_workers) and the writes are held
+    to `rate` per second across all workers, so a large revert doesn't
+    swamp the server. Before writing, each block is compared with the XML
+    the journal says was written; if someone changed it since, that block is
+    left alone and reported as a conflict (force=True restores it anyway).
+    Returns counts plus one result per entity: {reference, status, message, blocks}.
+    """
+    progress = progress or NullProgress()
+    plans = plan_restore(read_journal(journal_path))
+    progress.set_total(len(plans))
+    limiter = RateLimiter(rate)
+
+    results = []
+    for plan, outcome, error in bounded_map(lambda p: restore_entity(client, p, limiter, force, cache), plans,
+                                            max_workers=max_workers):
+        if error is not None:
+            outcome = {"reference": plan["reference"],
+                       "blocks": [{"schema": "", "action": "failed", "message": f"Failed to restore: {error}"}]}
+        actions = {b["action"] for b in outcome["blocks"]}
+        status = "failed" if "failed" in actions else "conflict" if "conflict" in actions else "restored"
+        result = {"reference": plan["reference"], "status": status,
+                  "message": "; ".join(b["message"] for b in outcome["blocks"]), "blocks": outcome["blocks"]}
+        progress.advance(failed=0 if status == "restored" else 1)
+        results.append(result)
+        if on_result:
+            on_result(result)
+
+    return {
+        "restored": sum(1 for r in results if r["status"] == "restored"),
+        "conflicts": sum(1 for r in results if r["status"] == "conflict"),
+        "failed": sum(1 for r in results if r["status"] == "failed"),
+        "results": results,
+    }
@@ -0,0 +1,96 @@
+# backend/row_buffer.py
+
+import sys
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Raw XML columns kept zlib-compressed while rows wait to be written
+COMPRESSED_COLUMNS = ("qdc_xml",)
+# zlib level 1: several times smaller than the XML at a fraction of level 9's cost
+COMPRESS_LEVEL = 1
+# Values up to this length are interned, so repeated ones ("ASSET", common subjects) are stored once
+INTERN_MAX_LEN = 32
+
+
+class ColumnRegistry:
+    """Interned column names and their positions, shared by every row of a buffer."""
+
+    def __init__(self):
+        self.names: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def index(self, name: str) -> int:
+        """Position of name, registering it on first sight."""
+        i = self._index.get(name)
+        if i is None:
+            name = sys.intern(name)
+            i = len(self.names)
+            self._index[name] = i
+            self.names.append(name)
+        return i
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+
+class RowBuffer:
+    """Columnar stand-in for a list of row dicts: append(row), len(), and iterate them back.
+
+    Each column is one list indexed by row number (None = the row had no such
+    key), so a row costs a slot per column instead of a dict repeating every
+    key string. Columns in `compressed` (the raw qdc_xml by default) are held
+    zlib-compressed and only inflated again while the rows are read back.
+
+        rows = RowBuffer()
+        rows.append(row)
+        write_rows(path, rows, export_headers(rows.columns()), fmt)
+    """
+
+    def __init__(self, compressed: Optional[Iterable[str]] = COMPRESSED_COLUMNS):
+        self.registry = ColumnRegistry()
+        self._compressed = set(compressed or ())
+        self._columns: List[list] = []
+        self._packed: List[bool] = []
+        self._count = 0
+
+    def append(self, row: Dict[str, str]):
+        for name, value in row.items():
+            i = self.registry.index(name)
+            if i == len(self._columns):
+                self._columns.append([])
+                self._packed.append(name in self._compressed)
+            column = self._columns[i]
+            if len(column) < self._count:
+                column.extend([None] * (self._count - len(column)))  # rows that lacked this key
+            column.append(self._pack(value, self._packed[i]))
+        self._count += 1
+
+    @staticmethod
+    def _pack(value, compress: bool):
+        if not isinstance(value, str):
+            return value
+        if compress and value:
+            return zlib.compress(value.encode("utf-8"), COMPRESS_LEVEL)
+        return sys.intern(value) if len(value) <= INTERN_MAX_LEN else value
+
+    def columns(self) -> List[str]:
+        return list(self.registry.names)
+
+    def row(self, index: int) -> Dict[str, str]:
+        """Rebuilds one row dict (keys the row didn't have are left out)."""
+        row = {}
+        for name, column, packed in zip(self.registry.names, self._columns, self._packed):
+            if index < len(column) and column[index] is not None:
+                value = column[index]
+                row[name] = zlib.decompress(value).decode("utf-8") if packed and isinstance(value, bytes) else value
+        return row
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        for index in range(self._count):
+            yield self.row(index)
@@ -0,0 +1,116 @@
+# backend/row_cache.py
+
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+# How long a fetched row is trusted (seconds); writes made through the toolkit invalidate it sooner
+DEFAULT_ROW_TTL = 600
+# Rows kept at most; the oldest are dropped first
+DEFAULT_MAX_ROWS = 50000
+
+
+class RowCache:
+    """Process-wide, in-memory cache of export rows (fetch_export_row output), keyed by reference.
+
+    The Browser preview fills it and the Export tab reads it, so exporting a
+    selection that was just previewed costs no API calls. Each entry keeps
+    the entity, the schemas of its metadata blocks and the schemas allow-list
+    it was fetched with (None = every block), so a full row can also serve
+    an export limited to some schemas. Entries expire after ttl seconds, and
+    the updater and restore engine drop the references they write.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_ROW_TTL, max_rows: int = DEFAULT_MAX_ROWS):
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.hits = 0
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def put(self, ref: str, row: Dict[str, str], entity=None, block_schemas: Iterable[str] = (),
+            schemas: Optional[Iterable[str]] = None):
+        with self._lock:
+            self._entries.pop(ref, None)  # re-insert so dict order stays oldest-first
+            self._entries[ref] = {
+                "time": time.monotonic(),
+                "row": row,
+                "entity": entity,
+                "block_schemas": list(block_schemas),
+                "schemas": None if schemas is None else set(schemas),
+            }
+            while len(self._entries) > self.max_rows:
+                del self._entries[next(iter(self._entries))]
+
+    def entry(self, ref: str) -> Optional[Dict]:
+        """The live entry for ref ({time, row, entity, block_schemas, schemas}), or None."""
+        with self._lock:
+            entry = self._entries.get(ref)
+            if entry is None:
+                return None
+            if time.monotonic() - entry["time"] > self.ttl:
+                del self._entries[ref]
+                return None
+            return entry
+
+    def get(self, ref: str, schemas: Optional[Iterable[str]] = None) -> Optional[Dict[str, str]]:
+        """The cached row for ref, limited to schemas (None = every block), or None if it can't serve it."""
+        entry = self.entry(ref)
+        if entry is None:
+            return None
+        wanted = None if schemas is None else set(schemas)
+        if entry["schemas"] is not None and (wanted is None or not wanted <= entry["schemas"]):
+            return None  # fetched with a narrower allow-list than this request needs
+        self.hits += 1
+        if wanted is None or wanted == entry["schemas"]:
+            return dict(entry["row"])
+        return limit_row(entry["row"], entry["block_schemas"], wanted)
+
+    def rows(self, refs: Iterable[str]) -> Dict[str, Dict[str, str]]:
+        """Cached full rows for whichever of refs have one (rows fetched with an allow-list don't count)."""
+        found = {}
+        for ref in refs:
+            entry = self.entry(ref)
+            if entry is not None and entry["schemas"] is None:
+                found[ref] = entry["row"]
+        return found
+
+    def invalidate(self, ref: str):
+        with self._lock:
+            self._entries.pop(ref, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def limit_row(row: Dict[str, str], block_schemas: List[str], schemas) -> Dict[str, str]:
+    """A full export row cut down to the columns an allow-listed export would have produced."""
+    # Imported here: export_engine's helpers live beside the fetch that produces these rows
+    from .export_engine import EXPORT_BASE_FIELDS, schema_allowed
+    from .metadata_utils import is_qdc_schema
+
+    qdc = any(is_qdc_schema(s) and schema_allowed(s, schemas) for s in block_schemas)
+    limited = {}
+    for key, value in row.items():
+        if key in EXPORT_BASE_FIELDS:
+            limited[key] = value
+        elif key == "qdc_xml":
+            limited[key] = value if qdc else ""
+        elif "::" in key:
+            if schema_allowed(key.split("::", 1)[0], schemas):
+                limited[key] = value
+        elif qdc:
+            limited[key] = value
+    return limited
+
+
+_row_cache = RowCache()
+
+
+def get_row_cache() -> RowCache:
+    """The RowCache shared by the Browser preview, the Export tab and the writers that invalidate it."""
+    return _row_cache
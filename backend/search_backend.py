@@ -0,0 +1,146 @@
+# backend/search_backend.py
+
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import pyPreservica as pyp
+
+# Hits per search request; a 500k-asset subtree is ~1000 requests instead of ~1M asset()/metadata() calls
+SEARCH_PAGE_SIZE = 500
+
+# Candidate index short names for each QDC prefix, in order of preference
+INDEX_PREFIXES = {"dc": ("oai_dc", "dc"), "dcterms": ("dcterms",)}
+# Entity columns the index holds under xip.* names
+ENTITY_INDEX_FIELDS = {
+    "title": "xip.title",
+    "description": "xip.description",
+    "parent": "xip.parent_ref",
+    "security_tag": "xip.security_descriptor",
+}
+SUBTREE_FIELD = "xip.parent_hierarchy"
+DOCUMENT_TYPE_FIELD = "xip.document_type"
+ASSET_DOCUMENT_TYPE = "IO"
+
+_content_clients = {}
+_content_lock = threading.Lock()
+
+
+def content_client_for(client) -> pyp.ContentAPI:
+    """Returns a ContentAPI logged in the same way as an EntityAPI client (one per account).
+
+    Every login setting the EntityAPI holds is passed on, shared-secret
+    authentication included, so the search client never falls back to a
+    different kind of login.
+    """
+    shared_secret = getattr(client, "shared_secret", False)
+    key = (client.server, client.tenant, client.username, shared_secret)
+    with _content_lock:
+        content = _content_clients.get(key)
+        if content is None:
+            content = pyp.ContentAPI(
+                username=client.username, password=client.password, tenant=client.tenant,
+                server=client.server, use_shared_secret=shared_secret,
+                two_fa_secret_key=client.two_fa_secret_key, protocol=client.protocol
+            )
+            _content_clients[key] = content
+        return content
+
+
+def _values(value) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if v is not None and str(v).strip()]
+    value = str(value).strip()
+    return [value] if value else []
+
+
+class SearchIndexBackend:
+    """Bulk retrieval of indexed fields for a whole subtree through paged content searches.
+
+    Columns use the toolkit's names (dc:title, dcterms:identifier, title,
+    description, ...). split_columns() tells the caller which of them the
+    index holds; anything else has to be fetched per entity as before.
+    """
+
+    def __init__(self, content_client, page_size: int = SEARCH_PAGE_SIZE):
+        self.content = content_client
+        self.page_size = page_size
+        self._indexed = None
+
+    def indexed_fields(self) -> set:
+        if self._indexed is None:
+            self._indexed = set(self.content.indexed_fields())
+        return self._indexed
+
+    def index_field(self, column: str) -> Optional[str]:
+        """Index short name holding column, or None if it isn't indexed."""
+        indexed = self.indexed_fields()
+        if column in ENTITY_INDEX_FIELDS:
+            field = ENTITY_INDEX_FIELDS[column]
+            return field if field in indexed else None
+        if ":" not in column:
+            return None
+        prefix, element = column.split(":", 1)
+        for short_name in INDEX_PREFIXES.get(prefix, ()):
+            field = f"{short_name}.{element}"
+            if field in indexed:
+                return field
+        return None
+
+    def split_columns(self, columns: Iterable[str]) -> Tuple[Dict[str, str], List[str]]:
+        """Returns ({column: index field} for indexed columns, [columns the index doesn't hold])."""
+        indexed, fallback = {}, []
+        for column in columns:
+            if column == "reference":
+                continue  # every hit carries its reference
+            field = self.index_field(column)
+            if field:
+                indexed[column] = field
+            else:
+                fallback.append(column)
+        return indexed, fallback
+
+    def qdc_columns(self) -> List[str]:
+        """Every dc:*/dcterms:* column the index holds (used when no fields are requested)."""
+        columns = []
+        for field in sorted(self.indexed_fields()):
+            short_name, _, element = field.partition(".")
+            for prefix, short_names in INDEX_PREFIXES.items():
+                if short_name in short_names and element:
+                    column = f"{prefix}:{element}"
+                    if column not in columns and self.index_field(column) == field:
+                        columns.append(column)
+        return columns
+
+    def _filters(self, folder_ref: str, fields: Iterable[str], assets_only: bool) -> Dict[str, str]:
+        filters = {SUBTREE_FIELD: folder_ref}
+        if assets_only:
+            filters[DOCUMENT_TYPE_FIELD] = ASSET_DOCUMENT_TYPE
+        for field in fields:
+            filters.setdefault(field, "")  # empty value = return the field without filtering on it
+        return filters
+
+    def count(self, folder_ref: str, assets_only: bool = True) -> int:
+        """Number of entities below folder_ref according to the index (a single request)."""
+        return self.content.search_index_filter_hits("%", self._filters(folder_ref, (), assets_only))
+
+    def iter_subtree(self, folder_ref: str, columns: Iterable[str], assets_only: bool = True,
+                     repeat_suffixes: bool = False) -> Iterator[Tuple[str, Dict[str, str]]]:
+        """Yields (reference, {column: value}) for every entity below folder_ref, page by page.
+
+        Only indexed columns are filled. Multi-valued fields give their first
+        value, or with repeat_suffixes every value as column, column.1, ...
+        (the export's column layout).
+        """
+        indexed, _ = self.split_columns(columns)
+        filters = self._filters(folder_ref, indexed.values(), assets_only)
+        for hit in self.content.search_index_filter_list("%", self.page_size, filters):
+            row = {}
+            for column, field in indexed.items():
+                values = _values(hit.get(field))
+                if repeat_suffixes:
+                    for i, value in enumerate(values):
+                        row[column if i == 0 else f"{column}.{i}"] = value
+                else:
+                    row[column] = values[0] if values else ""
+            yield hit.get("xip.reference"), row
@@ -0,0 +1,120 @@
+# backend/subtree_stats.py
+
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+import pyPreservica as pyp
+from .concurrency import bounded_map
+from .jobs import JobCancelled
+
+# CacheStore namespace: folder ref -> {"assets": n, "folders": n} for its whole subtree
+STATS_NAMESPACE = "subtree_stats"
+# Counts older than this (seconds) are recounted; they only size progress bars, so a day is fine
+DEFAULT_STATS_MAX_AGE = 24 * 3600
+# Folders listed at once while counting
+STATS_WORKERS = 8
+
+
+class SubtreeStats:
+    """Asset/folder counts for folder subtrees, counted in parallel and cached per folder.
+
+    Counting walks the tree breadth-first, listing each level's folders
+    concurrently, and stops descending wherever the cache already holds a
+    fresh count. Every folder counted is stored with its timestamp, so a
+    later run on the folder or any folder inside it is answered from the
+    cache without an API call.
+    """
+
+    def __init__(self, client, cache=None, max_age: float = DEFAULT_STATS_MAX_AGE,
+                 max_workers: int = STATS_WORKERS):
+        self.client = client
+        self.cache = cache
+        self.max_age = max_age
+        self.max_workers = max_workers
+
+    def cached(self, folder_ref: str) -> Optional[Dict[str, int]]:
+        """The fresh cached counts for folder_ref, or None."""
+        if self.cache is None:
+            return None
+        return self.cache.get(STATS_NAMESPACE, folder_ref, max_age=self.max_age)
+
+    def _list(self, folder_ref: str) -> Tuple[int, List[str]]:
+        """(assets directly in the folder, its subfolder refs), from one paged listing."""
+        assets = 0
+        folders = []
+        for entity in self.client.descendants(folder_ref):
+            if isinstance(entity, pyp.Folder):
+                folders.append(entity.reference)
+            else:
+                assets += 1
+        return assets, folders
+
+    def count(self, folder_ref: str, stop: Optional[threading.Event] = None) -> Optional[Dict[str, int]]:
+        """{"assets", "folders"} below folder_ref (recursive); None if stop was set before it finished."""
+        known: Dict[str, Dict[str, int]] = {}
+        listed: Dict[str, Tuple[int, List[str]]] = {}
+        order = []
+        frontier = [folder_ref]
+        while frontier:
+            if stop is not None and stop.is_set():
+                return None
+            if self.cache is not None:
+                known.update(self.cache.get_many(STATS_NAMESPACE, frontier, max_age=self.max_age))
+            todo = [ref for ref in frontier if ref not in known]
+            frontier = []
+
+            def list_folder(ref):
+                return None if stop is not None and stop.is_set() else self._list(ref)
+
+            for ref, result, error in bounded_map(list_folder, todo, max_workers=self.max_workers):
+                if error is not None:
+                    raise error
+                if result is None:
+                    return None
+                listed[ref] = result
+                order.append(ref)
+                frontier.extend(result[1])
+
+        # Children were listed after their parents, so walking backwards sums bottom-up
+        totals = {}
+        for ref in reversed(order):
+            assets, subfolders = listed[ref]
+            folders = len(subfolders)
+            for sub in subfolders:
+                counts = totals.get(sub) or known[sub]
+                assets += counts["assets"]
+                folders += counts["folders"]
+            totals[ref] = {"assets": assets, "folders": folders}
+        if self.cache is not None and totals:
+            try:
+                self.cache.set_many(STATS_NAMESPACE, totals)
+            except Exception as e:
+                print(f"⚠️ Could not cache subtree counts: {e}")
+        return totals.get(folder_ref) or known[folder_ref]
+
+
+def count_in_background(stats: SubtreeStats, folder_ref: str, on_count: Callable[[Dict[str, int]], None],
+                        stop: Optional[threading.Event] = None) -> Optional[threading.Thread]:
+    """Calls on_count(counts) for folder_ref: right away if cached, otherwise from a counting thread.
+
+    Meant to run beside a streaming job, which sets stop when it no longer
+    needs the count. A failed count only leaves the progress indeterminate.
+    """
+    cached = stats.cached(folder_ref)
+    if cached is not None:
+        on_count(cached)
+        return None
+
+    def run():
+        try:
+            counts = stats.count(folder_ref, stop)
+        except JobCancelled:
+            return
+        except Exception as e:
+            print(f"⚠️ Could not count the items below {folder_ref}: {e}")
+            return
+        if counts is not None and not (stop is not None and stop.is_set()):
+            on_count(counts)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,17 @@
+# backend/traversal.py
+
+from typing import Iterator
+import pyPreservica as pyp
+
+
+def iter_descendants(client, folder_ref: str, assets_only: bool = False) -> Iterator[pyp.Entity]:
+    """Streams every entity below a folder (recursively), one children page at a time.
+
+    client.descendants only pages through the immediate children, so nested
+    folders are walked with client.all_descendants. Nothing is materialized:
+    callers can start working on the first page while later pages load.
+    """
+    for entity in client.all_descendants(folder_ref):
+        if assets_only and not isinstance(entity, pyp.Asset):
+            continue
+        yield entity
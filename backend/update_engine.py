@@ -0,0 +1,95 @@
+# backend/update_engine.py
+
+from typing import Callable, Dict, List, Optional
+from .concurrency import bounded_map
+from .jobs import NullProgress
+from .metadata_diff import diff_against_snapshot, generate_diffs
+from .coalesce import coalesce_rows, describe_conflicts
+from .ledger import applied_hash, lines_key
+from .metadata_updater import apply_metadata_blocks, changed_blocks_only, describe_block_results
+
+DEFAULT_UPDATE_WORKERS = 4
+
+
+def run_update(client, csv_rows: List[Dict[str, str]], max_workers: int = DEFAULT_UPDATE_WORKERS,
+               checkpoint=None, progress=None,
+               on_result: Optional[Callable[[Dict[str, str]], None]] = None, snapshot=None,
+               journal=None) -> Dict:
+    """Diffs csv_rows against Preservica and writes the rows that changed.
+
+    Rows sharing a reference are first coalesced into one row
+    (coalesce.coalesce_rows), so each entity is diffed and written once; a
+    reference whose rows give a column different values is reported as
+    failed and not written. Checkpoint keys are ledger.lines_key (sheet
+    lines + reference); rows already in it are skipped before any API call,
+    and every row that finishes (written, or found unchanged) is recorded as {xml, message},
+    xml being the hash of what was written. Pass an UpdateLedger to make a
+    sheet's runs resumable. Returns counts plus one result per written reference
+    ({reference, status, message, blocks}, blocks being each metadata block's
+    own outcome); on_result is called as each write finishes. With snapshot
+    (a load_snapshot() frame of an earlier export) the diff is computed
+    locally instead of fetching every row's current metadata, custom-schema
+    cells included. Only the metadata blocks with a changed cell are
+    written. With a Journal every block write is recorded with its previous
+    XML, so the run can be reverted with restore_engine.restore_journal.
+    """
+    progress = progress or NullProgress()
+
+    entries = coalesce_rows(csv_rows)
+    conflicted = [e for e in entries if e["conflicts"]]
+    keyed = [(lines_key(e["lines"], e["reference"]), e["row"]) for e in entries if not e["conflicts"]]
+    pending = [(key, row) for key, row in keyed if checkpoint is None or key not in checkpoint]
+    skipped = len(keyed) - len(pending)
+    rows = [row for _, row in pending]
+
+    if snapshot is not None:
+        diffs = diff_against_snapshot(rows, snapshot)
+    else:
+        diffs = generate_diffs(client, rows, max_workers=max_workers)
+    for (key, _), diff in zip(pending, diffs):
+        diff["row_key"] = key
+        if checkpoint is not None and not diff["changes"]:
+            checkpoint.record(key, {"xml": None, "message": "unchanged"})
+    changed = [d for d in diffs if d["changes"]]
+    progress.set_total(len(changed) + len(conflicted))
+
+    def apply(diff):
+        # Blocks without a changed cell are left alone
+        row = changed_blocks_only(diff["csv_row"], diff["changes"])
+        return apply_metadata_blocks(client, diff["reference"], row, journal=journal)
+
+    results = []
+    for entry in conflicted:
+        result = {"reference": entry["reference"], "status": "failed", "message": describe_conflicts(entry),
+                  "blocks": []}
+        progress.advance(failed=1)
+        results.append(result)
+        if on_result:
+            on_result(result)
+    for diff, blocks, error in bounded_map(apply, changed, max_workers=max_workers):
+        ref = diff["reference"]
+        if error is None and not any(b["action"] == "failed" for b in blocks):
+            message = describe_block_results(blocks)
+            result = {"reference": ref, "status": "updated", "message": message, "blocks": blocks}
+            if checkpoint is not None:
+                checkpoint.record(diff["row_key"], {"xml": applied_hash(blocks), "message": message})
+            progress.advance()
+        else:
+            # A partly written entity isn't checkpointed, so a resume rewrites all its blocks
+            message = str(error) if error is not None else describe_block_results(blocks)
+            result = {"reference": ref, "status": "failed", "message": message, "blocks": blocks or []}
+            progress.advance(failed=1)
+        results.append(result)
+        if on_result:
+            on_result(result)
+
+    updated = sum(1 for r in results if r["status"] == "updated")
+    return {
+        "updated": updated,
+        "failed": len(results) - updated,
+        "unchanged": len(diffs) - len(changed),
+        "skipped": skipped,
+        "conflicts": len(conflicted),
+        "coalesced": sum(len(e["lines"]) - 1 for e in entries),
+        "results": results,
+    }
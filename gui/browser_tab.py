@@ -3,23 +3,56 @@
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QPushButton, QTreeWidget, QTreeWidgetItem,
     QHBoxLayout, QFileDialog, QInputDialog, QStatusBar, QMessageBox,
-    QSplitter, QLabel, QTextEdit, QTableWidget, QTableWidgetItem, QApplication
+    QSplitter, QLabel, QTextEdit, QTableWidget, QTableWidgetItem, QApplication,
+    QLineEdit, QListWidget, QListWidgetItem
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QThread, QTimer, pyqtSignal
 from backend.preservica_client import PreservicaClient
-from backend.metadata_diff import fetch_current_metadata
+from backend.metadata_utils import resolve_entity
+from backend.cache import get_cache
+from backend.export_engine import EXPORT_BASE_FIELDS
+from backend.preview_service import PreviewService, compare_rows, MAX_COMPARE_COLUMNS
+from backend.tree_index import TreeIndex, load_mirror, mirror_nodes
 import pyPreservica as pyp
 import xml.etree.ElementTree as ET
 import openpyxl
+from PIL import Image
 from openpyxl.styles import Font
 from openpyxl.utils import get_column_letter
 import requests
 import threading
-from PyQt6.QtGui import QPixmap
+from PyQt6.QtGui import QFont, QPixmap
 import io
 import os
 import webbrowser
 
+# Pause in typing before the find box searches
+SEARCH_DELAY_MS = 150
+SEARCH_RESULTS = 50
+# Pause after preview rows arrive before the preview is redrawn
+PREVIEW_REDRAW_MS = 100
+
+
+class PreviewWorker(QThread):
+    """Fetches preview rows for a selection in the background (PreviewService.warm)."""
+    row_ready = pyqtSignal(str, object, object)  # reference, row (None on error), error
+
+    def __init__(self, service, refs):
+        super().__init__()
+        self.service = service
+        self.refs = refs
+        self._stop = threading.Event()
+
+    def run(self):
+        try:
+            self.service.warm(self.refs, self._stop, on_row=self.row_ready.emit)
+        except Exception as e:
+            print(f"⚠️ Preview failed: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+
 class BrowserTab(QWidget):
     def __init__(self, export_tab, move_tab, client):
         super().__init__()
@@ -30,6 +63,26 @@ class BrowserTab(QWidget):
         self.layout = QVBoxLayout()
         self.setLayout(self.layout)
 
+        # Find-in-tree: every node loaded so far (plus the mirror of earlier sessions) is searchable
+        self.index = TreeIndex()
+        self.tree_items = {}  # reference -> QTreeWidgetItem
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Find in tree: title, identifier or reference")
+        self.search_input.textChanged.connect(lambda _: self.search_timer.start())
+        self.search_input.returnPressed.connect(self.jump_to_first_result)
+        self.layout.addWidget(self.search_input)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.run_search)
+        self.search_results = QListWidget()
+        self.search_results.setMaximumHeight(180)
+        self.search_results.hide()
+        self.search_results.itemActivated.connect(self.on_search_result)
+        self.search_results.itemClicked.connect(self.on_search_result)
+        self.layout.addWidget(self.search_results)
+        threading.Thread(target=self._load_mirror, daemon=True).start()
+
         # Splitter: tree on left, preview panel on right
         self.splitter = QSplitter()
 
@@ -56,6 +109,21 @@ class BrowserTab(QWidget):
         self.preview_type = QLabel("Type: ")
         pv_layout.addWidget(self.preview_type)
 
+        self.preview_status = QLabel("")
+        pv_layout.addWidget(self.preview_status)
+
+        # Preview rows are export rows, cached for the session: exporting a previewed selection is free
+        self.preview = PreviewService(client, get_cache())
+        self.preview_refs = []
+        self.preview_errors = {}
+        self.preview_worker = None
+        self.preview_workers = []  # kept referenced until they finish
+        self.thumbnail_ref = None
+        self.render_timer = QTimer(self)
+        self.render_timer.setSingleShot(True)
+        self.render_timer.setInterval(PREVIEW_REDRAW_MS)
+        self.render_timer.timeout.connect(self._render_preview)
+
         # Thumbnail + metadata table area
         thumb_meta_layout = QHBoxLayout()
 
@@ -136,6 +204,9 @@ class BrowserTab(QWidget):
             item.setData(0, Qt.ItemDataRole.UserRole + 1, "FOLDER")
             item.setChildIndicatorPolicy(QTreeWidgetItem.ChildIndicatorPolicy.ShowIndicator)
             self.tree.addTopLevelItem(item)
+            self.tree_items[folder.reference] = item
+            self._remember([{"reference": folder.reference, "title": folder.title,
+                             "parent": folder.parent, "type": "FOLDER"}])
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to load folder: {e}")
 
@@ -149,19 +220,105 @@ class BrowserTab(QWidget):
 
         try:
             children = self.client.children(ref_id)
+            nodes = []
             for child in children.results:
-                label = f"{child.title or 'Untitled'}"
-                child_item = QTreeWidgetItem([label])
-                child_item.setData(0, Qt.ItemDataRole.UserRole, child.reference)
-                if isinstance(child, pyp.Folder):
-                    child_item.setData(0, Qt.ItemDataRole.UserRole + 1, "FOLDER")
-                    child_item.setChildIndicatorPolicy(QTreeWidgetItem.ChildIndicatorPolicy.ShowIndicator)
-                else:
-                    child_item.setData(0, Qt.ItemDataRole.UserRole + 1, "ASSET")
-                item.addChild(child_item)
+                etype = "FOLDER" if isinstance(child, pyp.Folder) else "ASSET"
+                self._add_child_item(item, child.reference, child.title, etype)
+                nodes.append({"reference": child.reference, "title": child.title, "parent": ref_id, "type": etype})
+            self._remember(nodes)
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Failed to load children: {e}")
 
+    def _add_child_item(self, parent_item, ref, title, etype):
+        child_item = QTreeWidgetItem([f"{title or 'Untitled'}"])
+        child_item.setData(0, Qt.ItemDataRole.UserRole, ref)
+        child_item.setData(0, Qt.ItemDataRole.UserRole + 1, etype)
+        if etype == "FOLDER":
+            child_item.setChildIndicatorPolicy(QTreeWidgetItem.ChildIndicatorPolicy.ShowIndicator)
+        parent_item.addChild(child_item)
+        self.tree_items[ref] = child_item
+        return child_item
+
+    # --- find in tree -------------------------------------------------------
+    def _remember(self, nodes):
+        """Adds nodes to the find index and to the mirror the next session starts from."""
+        self.index.add_many(nodes)
+        mirror_nodes(get_cache(), nodes)
+
+    def _load_mirror(self):
+        try:
+            load_mirror(self.index, get_cache())
+        except Exception as e:
+            print(f"⚠️ Could not load the tree mirror: {e}")
+
+    def run_search(self):
+        results = self.index.search(self.search_input.text(), limit=SEARCH_RESULTS)
+        self.search_results.clear()
+        for node in results:
+            label = f"{node['title'] or 'Untitled'}  ({(node['type'] or '').lower()} {node['reference']})"
+            if node["identifiers"]:
+                label += "  " + ", ".join(node["identifiers"][:3])
+            result_item = QListWidgetItem(label)
+            result_item.setData(Qt.ItemDataRole.UserRole, node["reference"])
+            self.search_results.addItem(result_item)
+        self.search_results.setVisible(bool(results))
+
+    def jump_to_first_result(self):
+        self.search_timer.stop()
+        self.run_search()
+        if self.search_results.count():
+            self.on_search_result(self.search_results.item(0))
+
+    def on_search_result(self, result_item):
+        self.jump_to(result_item.data(Qt.ItemDataRole.UserRole))
+
+    def _parent_of(self, ref):
+        """Parent from the index, or (for nodes it doesn't know the parent of) from one fetch."""
+        node = self.index.get(ref)
+        if node and node["parent"]:
+            return node["parent"]
+        entity, etype = resolve_entity(self.client, ref, get_cache())
+        self._remember([{"reference": ref, "title": entity.title, "parent": entity.parent, "type": etype}])
+        return entity.parent
+
+    def jump_to(self, ref):
+        """Selects ref in the tree, expanding only the folders on the path to it.
+
+        The path comes from the index's parent links; ancestors it doesn't know
+        are fetched one at a time until a node already in the tree is reached
+        (or the top, which is then added as a new root).
+        """
+        chain = [ref]
+        try:
+            while chain[-1] not in self.tree_items:
+                parent = self._parent_of(chain[-1])
+                if not parent or parent in chain:
+                    break
+                chain.append(parent)
+        except Exception as e:
+            QMessageBox.warning(self, "Not Found", f"Could not locate {ref}: {e}")
+            return
+
+        if chain[-1] not in self.tree_items:
+            self.load_folder(chain[-1])
+            if chain[-1] not in self.tree_items:
+                return
+        item = self.tree_items[chain[-1]]
+        for child_ref in reversed(chain[:-1]):
+            item.setExpanded(True)  # loads the folder's children on first expansion
+            child = self.tree_items.get(child_ref)
+            if child is None or child.parent() is not item:
+                # Beyond the first page of children (or moved since): add just this node
+                node = self.index.get(child_ref) or {}
+                child = self._add_child_item(item, child_ref, node.get("title"), node.get("type") or "ASSET")
+            item = child
+
+        self.search_results.hide()
+        self.tree.clearSelection()
+        self.tree.setCurrentItem(item)
+        item.setSelected(True)
+        self.tree.scrollToItem(item)
+
     def get_selected_items(self):
         selected = self.tree.selectedItems()
         refs = []
@@ -173,15 +330,19 @@ class BrowserTab(QWidget):
         return refs
 
     def on_selection_changed(self):
-        selected = self.tree.selectedItems()
-        if not selected:
+        refs = [ref for ref, _ in self.get_selected_items()]
+        self.preview_refs = refs
+        if not refs:
+            self._stop_preview_worker()
             self.preview_title.setText("Title: ")
             self.preview_ref.setText("Reference: ")
             self.preview_type.setText("Type: ")
+            self.preview_status.clear()
             # clear table and xml and thumbnail
             self.meta_table.setRowCount(0)
             self.preview_xml.clear()
             self.thumbnail_label.clear()
+            self.thumbnail_ref = None
             try:
                 self.open_button.setEnabled(False)
             except Exception:
@@ -189,196 +350,136 @@ class BrowserTab(QWidget):
             self.current_preview_url = None
             return
 
-        # preview the first selected item
-        item = selected[0]
-        ref = item.data(0, Qt.ItemDataRole.UserRole)
-        if not ref:
-            return
-
-        try:
-            try:
-                entity = self.client.asset(ref)
-                etype = 'ASSET'
-            except Exception:
-                entity = self.client.folder(ref)
-                etype = 'FOLDER'
-
-            qdc_xml, meta_dict = fetch_current_metadata(self.client, ref)
-
-            self.preview_title.setText(f"Title: {getattr(entity, 'title', '')}")
-            self.preview_ref.setText(f"Reference: {ref}")
-            self.preview_type.setText(f"Type: {etype}")
-
-            # Populate metadata table with sorted keys
-            keys = sorted(meta_dict.keys())
-            self.meta_table.setRowCount(len(keys))
-            for row_idx, k in enumerate(keys):
-                key_item = QTableWidgetItem(k)
-                val_item = QTableWidgetItem(meta_dict[k])
-                self.meta_table.setItem(row_idx, 0, key_item)
-                self.meta_table.setItem(row_idx, 1, val_item)
-
-            self.preview_xml.setPlainText(qdc_xml or "")
-
-            # Attempt to fetch a thumbnail/rendition if available
-            self.thumbnail_label.setPixmap(QPixmap())
-            # Try common attributes on the entity for an image URL
-            thumb_url = None
-            # pyPreservica may expose rendition URLs in different attributes; attempt several names
-            for attr in ("thumbnail_url", "thumbnail", "rendition_url", "representative_url", "representations"):
-                try:
-                    v = getattr(entity, attr, None)
-                    if isinstance(v, str) and v.startswith("http"):
-                        thumb_url = v
-                        break
-                    # If representations is a dict or list, attempt to extract a URL
-                    if isinstance(v, dict):
-                        # pick first URL-like value
-                        for vv in v.values():
-                            if isinstance(vv, str) and vv.startswith("http"):
-                                thumb_url = vv
-                                break
-                        if thumb_url:
-                            break
-                    if isinstance(v, (list, tuple)) and v:
-                        for vv in v:
-                            if isinstance(vv, str) and vv.startswith("http"):
-                                thumb_url = vv
-                                break
-                        if thumb_url:
-                            break
-                except Exception:
-                    continue
-
-            if thumb_url:
-                # fetch in background
-                threading.Thread(target=self._fetch_and_set_thumbnail, args=(thumb_url,)).start()
-
-        except Exception as e:
+        # Whatever the last selection's worker hasn't started is no longer needed
+        self._stop_preview_worker()
+        missing = [ref for ref in refs if ref not in self.preview.cached(refs)]
+        if missing:
+            worker = PreviewWorker(self.preview, missing)
+            worker.row_ready.connect(self._on_preview_row)
+            worker.finished.connect(lambda w=worker: self.preview_workers.remove(w))
+            self.preview_workers.append(worker)
+            self.preview_worker = worker
+            worker.start()
+        self._render_preview()
+
+    def _stop_preview_worker(self):
+        if self.preview_worker is not None:
+            self.preview_worker.stop()
+            self.preview_worker = None
+
+    def _on_preview_row(self, ref, row, error):
+        if row is None:
+            self.preview_errors[ref] = error
+        else:
+            self.preview_errors.pop(ref, None)
+            entity = self.preview.entity(ref)
+            identifiers = [v for k, v in row.items() if k.split(".")[0].endswith(":identifier") and v]
+            self._remember([{"reference": ref, "title": row.get("title"),
+                             "parent": getattr(entity, "parent", None), "type": row.get("type"),
+                             "identifiers": identifiers}])
+        if ref in self.preview_refs:
+            self.render_timer.start()  # coalesce a burst of rows into one redraw
+
+    def _render_preview(self):
+        refs = self.preview_refs
+        if len(refs) == 1:
+            self._show_single(refs[0])
+        elif refs:
+            self._show_comparison(refs)
+
+    def _show_single(self, ref):
+        row = self.preview.cached([ref]).get(ref)
+        self.preview_ref.setText(f"Reference: {ref}")
+        self.preview_status.clear()
+        self.meta_table.setColumnCount(2)
+        self.meta_table.setHorizontalHeaderLabels(["Field", "Value"])
+        if row is None:
+            error = self.preview_errors.get(ref)
+            self.preview_title.setText("Title: ")
+            self.preview_type.setText("Type: ")
             # show error in XML area and clear meta table
             self.meta_table.setRowCount(0)
-            self.preview_xml.setPlainText(f"Error loading preview: {e}")
+            self.preview_xml.setPlainText(f"Error loading preview: {error}" if error else "Loading...")
             try:
                 self.open_button.setEnabled(False)
             except Exception:
                 pass
-
-    def _fetch_and_set_thumbnail(self, url):
-        try:
-            resp = requests.get(url, timeout=10)
-            if resp.status_code != 200:
-                return
-            img_data = resp.content
-
-            lower = url.lower()
-            # PDF handling: can't render easily — enable open button and show placeholder
-            if lower.endswith('.pdf'):
-                def set_pdf_placeholder():
-                    self.thumbnail_label.setText('PDF (open)')
-                    self.open_button.setEnabled(True)
-                    self.current_preview_url = url
-                QTimer.singleShot(0, set_pdf_placeholder)
-                return
-
-            # Try to load image data (including TIFF). If loading fails, enable open button.
-            pix = QPixmap()
-            loaded = pix.loadFromData(img_data)
-            if not loaded or pix.isNull():
-                # failed to load image; provide open button
-                def set_failed():
-                    self.thumbnail_label.setText('Preview not available; open file')
-                    self.open_button.setEnabled(True)
-                    self.current_preview_url = url
-                QTimer.singleShot(0, set_failed)
-                return
-
-            # scale to label size preserving aspect
-            scaled = pix.scaled(self.thumbnail_label.width(), self.thumbnail_label.height(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-            def set_pix():
-                self.thumbnail_label.setPixmap(scaled)
-                self.open_button.setEnabled(False)
-                self.current_preview_url = None
-            QTimer.singleShot(0, set_pix)
-        except Exception:
-            try:
-                QTimer.singleShot(0, lambda: self.thumbnail_label.setText('Preview failed'))
-            except Exception:
-                pass
-
-    def _open_current_url(self):
-        if not getattr(self, 'current_preview_url', None):
-            return
-        try:
-            webbrowser.open(self.current_preview_url)
-        except Exception:
-            QMessageBox.warning(self, 'Open Failed', 'Could not open the file URL externally.')
-
-    def _copy_xml_to_clipboard(self):
-        clipboard = QApplication.clipboard()
-        clipboard.setText(self.preview_xml.toPlainText())
-
-    def _refresh_current_preview(self):
-        # re-run selection handler to refresh data
-        self.on_selection_changed()
-
-    def export_metadata_from_selection(self):
-        selected_items = self.tree.selectedItems()
-        if not selected_items:
-            QMessageBox.warning(self, "No Selection", "Please select one or more items to export.")
-            return
-
-        refs = []
-        for item in selected_items:
-            ref = item.data(0, Qt.ItemDataRole.UserRole)
-            if ref:
-                refs.append(ref)
-
-        # Ask for export path
-        export_path, _ = QFileDialog.getSaveFileName(self, "Save Metadata", filter="Excel Files (*.xlsx)")
-        if not export_path:
-            return
-        if not export_path.endswith(".xlsx"):
-            export_path += ".xlsx"
-
-        # Start the export via ExportTab
-        self.export_tab.start_export_with_refs(refs, export_path)
-
-
-
-    def move_selected_assets(self):
-        selected_refs = [
-            item.data(0, Qt.ItemDataRole.UserRole)
-            for item in self.tree.selectedItems()
-            if item.data(0, Qt.ItemDataRole.UserRole)
-        ]
-
-        if not selected_refs:
-            QMessageBox.warning(self, "No Selection", "Please select one or more assets or folders to move.")
-            return
-
-        destination_ref, ok = QInputDialog.getText(self, "Destination Folder", "Enter destination folder reference ID:")
-        if not ok or not destination_ref.strip():
             return
 
-        destination_ref = destination_ref.strip()
-
-        # Switch to Move tab and start move
-        self.parentWidget().parentWidget().setCurrentIndex(2)  # index of Move tab in QTabWidget
-        self.move_tab.move_items(selected_refs, destination_ref)
-
-
-        def set_tabs(self, export_tab, move_tab):
-            self.export_tab = export_tab
-            self.move_tab = move_tab
-
-        except Exception as e:
-            # show error in XML area and clear meta table
-            self.meta_table.setRowCount(0)
-            self.preview_xml.setPlainText(f"Error loading preview: {e}")
+        self.preview_title.setText(f"Title: {row.get('title') or ''}")
+        self.preview_type.setText(f"Type: {row.get('type') or ''}")
+
+        # Populate metadata table with sorted keys
+        keys = sorted(k for k in row if k not in EXPORT_BASE_FIELDS and k != "qdc_xml")
+        self.meta_table.setRowCount(len(keys))
+        for row_idx, k in enumerate(keys):
+            self.meta_table.setItem(row_idx, 0, QTableWidgetItem(k))
+            self.meta_table.setItem(row_idx, 1, QTableWidgetItem(row[k]))
+
+        self.preview_xml.setPlainText(row.get("qdc_xml") or "")
+
+        if self.thumbnail_ref == ref:
+            return  # redraw of the same item: keep the thumbnail already shown or loading
+        self.thumbnail_ref = ref
+        self.thumbnail_label.setPixmap(QPixmap())
+        thumb_url = self._thumbnail_url(self.preview.entity(ref))
+        if thumb_url:
+            # fetch in background
+            threading.Thread(target=self._fetch_and_set_thumbnail, args=(thumb_url,)).start()
+
+    def _show_comparison(self, refs):
+        """Field-by-field table of the first MAX_COMPARE_COLUMNS selected items; differing rows in bold."""
+        rows_by_ref = self.preview.cached(refs)
+        shown = refs[:MAX_COMPARE_COLUMNS]
+        rows = [rows_by_ref.get(ref, {"reference": ref}) for ref in shown]
+        _, table = compare_rows(rows)
+
+        self.preview_title.setText(f"Title: {len(refs)} items selected")
+        self.preview_ref.setText(f"Reference: {', '.join(shown[:3])}{', ...' if len(refs) > 3 else ''}")
+        types = sorted({row.get("type") for row in rows_by_ref.values() if row.get("type")})
+        self.preview_type.setText(f"Type: {', '.join(types)}")
+        status = f"Loaded {len(rows_by_ref)} of {len(refs)}"
+        failed = sum(1 for ref in refs if ref in self.preview_errors)
+        if failed:
+            status += f", {failed} failed"
+        if len(refs) > len(shown):
+            status += f"; comparing the first {len(shown)}"
+        self.preview_status.setText(status)
+
+        self.meta_table.setColumnCount(len(shown) + 1)
+        self.meta_table.setHorizontalHeaderLabels(
+            ["Field"] + [row.get("title") or row["reference"][:8] for row in rows])
+        self.meta_table.setRowCount(len(table))
+        bold = QFont()
+        bold.setBold(True)
+        for row_idx, entry in enumerate(table):
+            field_item = QTableWidgetItem(entry["field"])
+            if entry["differs"]:
+                field_item.setFont(bold)
+            self.meta_table.setItem(row_idx, 0, field_item)
+            for col, value in enumerate(entry["values"], start=1):
+                self.meta_table.setItem(row_idx, col, QTableWidgetItem(value))
+
+        self.preview_xml.setPlainText("Select a single item to see its raw QDC XML.")
+        self.thumbnail_label.clear()
+        self.thumbnail_ref = None
+
+    @staticmethod
+    def _thumbnail_url(entity):
+        """First image URL on the entity; pyPreservica may expose rendition URLs in different attributes."""
+        for attr in ("thumbnail_url", "thumbnail", "rendition_url", "representative_url", "representations"):
             try:
-                self.open_button.setEnabled(False)
+                v = getattr(entity, attr, None)
+                if isinstance(v, str) and v.startswith("http"):
+                    return v
+                # If representations is a dict or list, attempt to extract a URL
+                values = v.values() if isinstance(v, dict) else v if isinstance(v, (list, tuple)) else ()
+                for vv in values:
+                    if isinstance(vv, str) and vv.startswith("http"):
+                        return vv
             except Exception:
-                pass
+                continue
+        return None
 
     def _fetch_and_set_thumbnail(self, url):
         try:
@@ -499,7 +600,9 @@ class BrowserTab(QWidget):
         clipboard.setText(self.preview_xml.toPlainText())
 
     def _refresh_current_preview(self):
-        # re-run selection handler to refresh data
+        # drop the cached rows, then re-run selection handler to refetch them
+        self.preview.invalidate(self.preview_refs)
+        self.thumbnail_ref = None
         self.on_selection_changed()
 
     def export_metadata_from_selection(self):
@@ -547,7 +650,6 @@ class BrowserTab(QWidget):
         self.parentWidget().parentWidget().setCurrentIndex(2)  # index of Move tab in QTabWidget
         self.move_tab.move_items(selected_refs, destination_ref)
 
-
-        def set_tabs(self, export_tab, move_tab):
-            self.export_tab = export_tab
-            self.move_tab = move_tab
+    def set_tabs(self, export_tab, move_tab):
+        self.export_tab = export_tab
+        self.move_tab = move_tab
@@ -1,97 +1,76 @@
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QLabel, QPushButton, QProgressBar,
-    QFileDialog, QMessageBox, QInputDialog
+    QFileDialog, QMessageBox, QInputDialog, QCheckBox, QLineEdit
 )
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
 from backend.preservica_client import PreservicaClient
-import pyPreservica as pyp
-import xml.etree.ElementTree as ET
-import openpyxl
-from openpyxl.styles import Font
-from openpyxl.utils import get_column_letter
+from backend.cache import get_cache
+from backend.export_engine import export_metadata, export_folder, export_folder_indexed
+from backend.row_cache import get_row_cache
+from backend.inventory_engine import parse_columns
+from backend.search_backend import SearchIndexBackend, content_client_for
+from backend.subtree_stats import SubtreeStats
+from backend.jobs import Job, get_job_manager, CANCELLED, DONE
+from backend.progress import ProgressReporter
+from gui.progress_view import show_progress
+
+# Parquet is for dumps past Excel's row limit or headed for pandas
+EXPORT_FILTERS = "Excel Files (*.xlsx);;Parquet Files (*.parquet)"
 
 
 class ExportWorker(QThread):
-    progress = pyqtSignal(int)
+    progress = pyqtSignal(object)  # ProgressSnapshot, every PROGRESS_INTERVAL at most
     finished = pyqtSignal(str)
+    cancelled = pyqtSignal(str, int)  # path of the partial export ("" if none), rows in it
 
-    def __init__(self, client, ref_list, export_path):
+    def __init__(self, client, ref_list, export_path, folder_ref=None, schemas=None, walk=False):
         super().__init__()
         self.client = client
         self.ref_list = ref_list
         self.export_path = export_path
+        self.schemas = schemas  # None = every metadata block
+        # With folder_ref the whole subtree is exported instead of ref_list: read from the search
+        # index, or with walk=True listed from the tree while the first rows are already fetched
+        self.folder_ref = folder_ref
+        self.walk = walk
+        if folder_ref and walk:
+            self.job = Job(f"Export {folder_ref}", self._export)
+        elif folder_ref:
+            self.job = Job(f"Export {folder_ref} (search index)", self._export)
+        else:
+            self.job = Job(f"Export {len(ref_list)} item(s)", self._export)
 
     def run(self):
-        rows = []
-        fieldnames = {"reference", "title", "type", "qdc_xml"}
-
-        total = len(self.ref_list)
-        for i, ref in enumerate(self.ref_list, 1):
-            try:
-                entity = self.client.asset(ref)
-                etype = "ASSET"
-            except Exception:
-                try:
-                    entity = self.client.folder(ref)
-                    etype = "FOLDER"
-                except Exception:
-                    continue  # skip invalid refs
-
-            row = {
-                "reference": entity.reference,
-                "title": entity.title,
-                "type": etype,
-                "qdc_xml": ""
-            }
-
-            for url, schema in (entity.metadata or {}).items():
-                if "dc" in schema.lower():
-                    try:
-                        xml = self.client.metadata(url).strip()
-                        row["qdc_xml"] = xml
-                        root = ET.fromstring(xml)
-                        ns = {
-                            "dc": "http://purl.org/dc/elements/1.1/",
-                            "dcterms": "http://purl.org/dc/terms/"
-                        }
-                        counts = {}
-                        for prefix in ns:
-                            for elem in root.findall(f".//{{{ns[prefix]}}}*"):
-                                tag = elem.tag.split("}")[-1]
-                                value = (elem.text or "").strip()
-                                if not value:
-                                    continue
-                                base = f"{prefix}:{tag}"
-                                count = counts.get(base, 0)
-                                col = base if count == 0 else f"{base}.{count}"
-                                row[col] = value
-                                fieldnames.add(col)
-                                counts[base] = count + 1
-                    except ET.ParseError:
-                        continue
-
-            rows.append(row)
-            self.progress.emit(int(i / total * 100))
-
-        # Write to Excel
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Metadata"
-
-        headers = sorted(fieldnames - {"reference", "title", "type"})
-        final_headers = ["reference", "title", "type"] + headers
-        ws.append(final_headers)
-
-        for i, header in enumerate(final_headers, 1):
-            col_letter = get_column_letter(i)
-            ws[f"{col_letter}1"].font = Font(bold=True)
-
-        for row_data in rows:
-            row = [row_data.get(h, "") for h in final_headers]
-            ws.append(row)
-
-        wb.save(self.export_path)
-        self.finished.emit(self.export_path)
+        try:
+            get_job_manager().run(self.job)
+        except Exception as e:
+            print(f"Export failed: {e}")
+        if self.job.state == DONE:
+            self.finished.emit(self.export_path)
+        elif self.job.state == CANCELLED:
+            # The engine writes out the rows finished before the cancel
+            summary = self.job.result or {}
+            self.cancelled.emit(summary.get("path", ""), summary.get("rows", 0))
+        else:
+            self.finished.emit("")
+
+    def cancel(self):
+        self.job.cancel()
+
+    def _export(self, job):
+        with ProgressReporter(job, self.progress.emit):
+            if self.folder_ref and self.walk:
+                client = job.client(self.client)
+                return export_folder(client, self.folder_ref, self.export_path, progress=job, cache=get_cache(),
+                                     schemas=self.schemas, row_cache=get_row_cache(),
+                                     stats=SubtreeStats(client, get_cache()))
+            if self.folder_ref:
+                search = SearchIndexBackend(job.client(content_client_for(self.client)))
+                return export_folder_indexed(job.client(self.client), search, self.folder_ref, self.export_path,
+                                             progress=job, cache=get_cache())
+            # Rows the Browser preview already fetched are reused without API calls
+            return export_metadata(job.client(self.client), self.ref_list, self.export_path, progress=job,
+                                   cache=get_cache(), schemas=self.schemas, row_cache=get_row_cache())
 
 
 class ExportTab(QWidget):
@@ -119,57 +98,112 @@ class ExportTab(QWidget):
         self.export_by_ref_button.clicked.connect(self.export_folder_by_reference)
         self.layout.addWidget(self.export_by_ref_button)
 
+        self.cancel_button = QPushButton("Cancel Export")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_export)
+        self.layout.addWidget(self.cancel_button)
+
+        self.use_index_checkbox = QCheckBox("Use search index for folder exports (indexed fields only, much faster)")
+        self.layout.addWidget(self.use_index_checkbox)
+
+        self.layout.addWidget(QLabel("Schemas to export (comma-separated URIs, \"qdc\" for QDC; blank = all blocks):"))
+        self.schemas_input = QLineEdit()
+        self.schemas_input.setPlaceholderText("qdc, http://example.org/schema")
+        self.layout.addWidget(self.schemas_input)
+
         self.ref_list = []
         self.worker = None
+        self.workers = []
 
     def start_export(self):
         if not self.ref_list:
             QMessageBox.warning(self, "No Items", "No items selected for export.")
             return
 
-        export_path, _ = QFileDialog.getSaveFileName(self, "Save Metadata", filter="Excel Files (*.xlsx)")
+        export_path = self.ask_export_path()
         if not export_path:
             return
-        if not export_path.endswith(".xlsx"):
-            export_path += ".xlsx"
 
         self.start_export_with_refs(self.ref_list, export_path)
 
+    def ask_export_path(self):
+        """Save dialog for xlsx or parquet (large dumps); adds the extension of the chosen filter."""
+        export_path, selected = QFileDialog.getSaveFileName(self, "Save Metadata", filter=EXPORT_FILTERS)
+        if not export_path:
+            return None
+        if not export_path.lower().endswith((".xlsx", ".parquet")):
+            export_path += ".parquet" if "parquet" in selected.lower() else ".xlsx"
+        return export_path
+
     def export_folder_by_reference(self):
         folder_ref, ok = QInputDialog.getText(self, "Folder Reference", "Enter the folder reference ID:")
         if not ok or not folder_ref.strip():
             return
 
-        try:
-            folder = self.client.folder(folder_ref.strip())
-            descendants = list(self.client.descendants(folder))
-            asset_refs = [e.reference for e in descendants if isinstance(e, pyp.Asset)]
-            if not asset_refs:
-                QMessageBox.information(self, "No Assets", "No assets found in the specified folder.")
+        if self.use_index_checkbox.isChecked():
+            if self.schemas_input.text().strip():
+                QMessageBox.warning(self, "Schemas Not Supported",
+                                    "The search index export reads indexed fields only; clear the schemas box "
+                                    "or untick \"Use search index\".")
                 return
+            export_path = self.ask_export_path()
+            if export_path:
+                self.start_export_with_refs([], export_path, folder_ref=folder_ref.strip())
+            return
 
-            export_path, _ = QFileDialog.getSaveFileName(self, "Save Metadata", filter="Excel Files (*.xlsx)")
-            if not export_path:
-                return
-            if not export_path.endswith(".xlsx"):
-                export_path += ".xlsx"
+        # The subtree is listed by the export job itself; only a cached count is checked here
+        counts = SubtreeStats(self.client, get_cache()).cached(folder_ref.strip())
+        if counts is not None and not counts["assets"]:
+            QMessageBox.information(self, "No Assets", "No assets found in the specified folder.")
+            return
 
-            self.start_export_with_refs(asset_refs, export_path)
+        export_path = self.ask_export_path()
+        if not export_path:
+            return
 
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to export from folder: {e}")
+        self.start_export_with_refs([], export_path, folder_ref=folder_ref.strip(), walk=True)
 
-    def start_export_with_refs(self, ref_list, export_path):
+    def start_export_with_refs(self, ref_list, export_path, folder_ref=None, walk=False):
         self.ref_list = ref_list
         self.progress_bar.setValue(0)
         self.status_label.setText("Exporting metadata...")
 
-        self.worker = ExportWorker(self.client, ref_list, export_path)
-        self.worker.progress.connect(self.progress_bar.setValue)
+        # Keep a reference to every running worker; a second export no longer replaces the first
+        self.workers = [w for w in self.workers if w.isRunning()]
+        schemas = parse_columns(self.schemas_input.text()) or None
+        self.worker = ExportWorker(self.client, ref_list, export_path, folder_ref=folder_ref, schemas=schemas,
+                                   walk=walk)
+        self.worker.progress.connect(lambda s: show_progress(self.progress_bar, self.status_label, s, "Exported"))
         self.worker.finished.connect(self.export_finished)
+        self.worker.cancelled.connect(self.export_cancelled)
+        self.workers.append(self.worker)
+        self.cancel_button.setEnabled(True)
         self.worker.start()
 
+    def cancel_export(self):
+        if self.worker:
+            self.worker.cancel()
+            self.status_label.setText("Cancelling export; writing the rows finished so far...")
+
+    def export_cancelled(self, export_path, rows):
+        self.progress_bar.setRange(0, 100)
+        if self.sender() is self.worker:
+            self.cancel_button.setEnabled(False)
+        if not export_path:
+            self.status_label.setText("Export cancelled.")
+            return
+        self.status_label.setText(f"Export cancelled; {rows} row(s) written.")
+        QMessageBox.information(self, "Export Cancelled",
+                                f"Export cancelled. The {rows} row(s) finished before the cancel were saved to:\n"
+                                f"{export_path}")
+
     def export_finished(self, export_path):
+        self.progress_bar.setRange(0, 100)
+        if self.sender() is self.worker:
+            self.cancel_button.setEnabled(False)
+        if not export_path:
+            self.status_label.setText("Export cancelled or failed.")
+            return
         self.status_label.setText("Export complete!")
         QMessageBox.information(self, "Export Complete", f"Metadata exported to:\n{export_path}")
         self.progress_bar.setValue(100)
@@ -1,15 +1,19 @@
 from PyQt6.QtWidgets import (
-    QWidget, QVBoxLayout, QPushButton, QLineEdit, QLabel, QFileDialog, QMessageBox, QProgressBar
+    QWidget, QVBoxLayout, QPushButton, QLineEdit, QLabel, QFileDialog, QMessageBox, QProgressBar, QCheckBox
 )
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
-import csv
 from backend.preservica_client import PreservicaClient
-from backend.metadata_diff import fetch_current_metadata
-import pyPreservica as pyp
+from backend.inventory_engine import export_inventory, parse_columns, InventoryPlan, INVENTORY_FIELDS
+from backend.cache import get_cache
+from backend.search_backend import SearchIndexBackend, content_client_for
+from backend.subtree_stats import SubtreeStats
+from backend.jobs import Job, get_job_manager, CANCELLED, DONE
+from backend.progress import ProgressReporter
+from gui.progress_view import show_progress
 
 
 class InventoryTab(QWidget):
-    """Export a full inventory (recursive) of a Preservica folder to CSV."""
+    """Export a full inventory (recursive) of a Preservica folder to CSV or Parquet."""
 
     def __init__(self, client):
         super().__init__()
@@ -18,7 +22,7 @@ class InventoryTab(QWidget):
         self.layout = QVBoxLayout()
         self.setLayout(self.layout)
 
-        self.instructions = QLabel("Enter parent folder reference and click Export. Exports a CSV of all items under the folder (recursive).")
+        self.instructions = QLabel("Enter parent folder reference and click Export. Exports a CSV (or Parquet) file of all items under the folder (recursive).")
         self.instructions.setWordWrap(True)
         self.layout.addWidget(self.instructions)
 
@@ -26,10 +30,27 @@ class InventoryTab(QWidget):
         self.ref_input.setPlaceholderText("Enter folder reference ID (e.g. REF-12345)")
         self.layout.addWidget(self.ref_input)
 
+        # Only the API calls these columns need are made (reference/title/parent_path cost nothing extra)
+        self.columns_input = QLineEdit(", ".join(INVENTORY_FIELDS))
+        self.columns_input.setToolTip(
+            "Comma-separated columns: any dc:*/dcterms:* field, reference, title, entity_type, parent, "
+            "parent_path, description, security_tag, custom_type, filename"
+        )
+        self.layout.addWidget(QLabel("Columns:"))
+        self.layout.addWidget(self.columns_input)
+
+        self.use_index_checkbox = QCheckBox("Use search index (pages through indexed fields instead of walking the tree)")
+        self.layout.addWidget(self.use_index_checkbox)
+
         self.export_button = QPushButton("Export Inventory")
         self.export_button.clicked.connect(self.start_export)
         self.layout.addWidget(self.export_button)
 
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_export)
+        self.layout.addWidget(self.cancel_button)
+
         self.progress_bar = QProgressBar()
         self.progress_bar.setMinimum(0)
         self.progress_bar.setMaximum(100)
@@ -40,6 +61,7 @@ class InventoryTab(QWidget):
         self.layout.addWidget(self.status_label)
 
         self.worker = None
+        self.workers = []
 
     def start_export(self):
         ref = self.ref_input.text().strip()
@@ -47,29 +69,56 @@ class InventoryTab(QWidget):
             QMessageBox.warning(self, "Missing Reference", "Please enter a parent folder reference ID.")
             return
 
-        path, _ = QFileDialog.getSaveFileName(self, "Save Inventory", filter="CSV Files (*.csv)")
+        columns = parse_columns(self.columns_input.text())
+        try:
+            InventoryPlan(columns)
+        except ValueError as e:
+            QMessageBox.warning(self, "Invalid Columns", str(e))
+            return
+
+        path, selected = QFileDialog.getSaveFileName(
+            self, "Save Inventory", filter="CSV Files (*.csv);;Parquet Files (*.parquet)"
+        )
         if not path:
             return
-        if not path.lower().endswith('.csv'):
-            path += '.csv'
+        if not path.lower().endswith(('.csv', '.parquet')):
+            path += '.parquet' if 'parquet' in selected.lower() else '.csv'
 
         self.export_button.setEnabled(False)
         self.status_label.setText("Preparing export...")
-        self.progress_bar.setValue(0)
+        # Assets are streamed while the tree is listed; the total arrives once the subtree is counted
+        self.progress_bar.setRange(0, 0)
 
-        self.worker = InventoryWorker(self.client, ref, path)
+        self.workers = [w for w in self.workers if w.isRunning()]
+        self.worker = InventoryWorker(self.client, ref, path, columns, use_index=self.use_index_checkbox.isChecked())
         self.worker.progress.connect(self._on_progress)
         self.worker.finished.connect(self._on_finished)
+        self.worker.cancelled.connect(self._on_cancelled)
         self.worker.status.connect(self._update_status)
+        self.workers.append(self.worker)
+        self.cancel_button.setEnabled(True)
         self.worker.start()
 
-    def _on_progress(self, pct: int):
-        try:
-            self.progress_bar.setValue(pct)
-        except Exception:
-            pass
+    def cancel_export(self):
+        if self.worker:
+            self.worker.cancel()
+            self.status_label.setText("Cancelling; closing the inventory with the rows written so far...")
+
+    def _on_progress(self, snapshot):
+        show_progress(self.progress_bar, self.status_label, snapshot, "Exported")
+
+    def _on_cancelled(self, path: str, rows: int):
+        self.progress_bar.setRange(0, 100)
+        self.export_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+        if path:
+            QMessageBox.information(self, "Export Cancelled",
+                                    f"Inventory cancelled. The {rows} item(s) listed before the cancel "
+                                    f"were saved to:\n{path}")
 
     def _on_finished(self, path: str):
+        self.progress_bar.setRange(0, 100)
+        self.cancel_button.setEnabled(False)
         try:
             if path:
                 QMessageBox.information(self, "Export Complete", f"Inventory exported to:\n{path}")
@@ -84,146 +133,49 @@ class InventoryTab(QWidget):
                 pass
 
     def _update_status(self, text: str):
-        try:
-            from PyQt6.QtCore import QTimer
-            QTimer.singleShot(0, lambda: self.status_label.setText(text))
-        except Exception:
-            try:
-                self.status_label.setText(text)
-            except Exception:
-                pass
+        # Queued signal from the worker thread, so this already runs on the GUI thread
+        self.status_label.setText(text)
 
     
 class InventoryWorker(QThread):
-    progress = pyqtSignal(int)
+    progress = pyqtSignal(object)  # ProgressSnapshot, every PROGRESS_INTERVAL at most
     finished = pyqtSignal(str)
+    cancelled = pyqtSignal(str, int)  # path of the partial inventory ("" if none), rows in it
     status = pyqtSignal(str)
 
-    def __init__(self, client, root_ref, out_path):
+    def __init__(self, client, root_ref, out_path, columns=None, use_index=False):
         super().__init__()
         self.client = client
         self.root_ref = root_ref
         self.out_path = out_path
+        self.columns = columns
+        self.use_index = use_index
+        self.job = Job(f"Inventory {root_ref}", self._inventory)
 
     def run(self):
         try:
-            # Attempt to count assets first using descendants (fast path)
-            total = None
-            asset_refs = None
-            try:
-                folder = self.client.folder(self.root_ref)
-                descendants = list(self.client.descendants(folder))
-                asset_refs = [e.reference for e in descendants if isinstance(e, pyp.Asset)]
-                total = len(asset_refs)
-            except Exception:
-                # Couldn't use descendants; we'll stream recursively without a known total
-                total = None
-
-            self.status.emit("Writing CSV...")
-            with open(self.out_path, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(['reference', 'dc:title', 'dcterms:identifier', 'dc:identifier', 'filename'])
-
-                count = 0
-
-                if asset_refs is not None:
-                    # Determinate mode
-                    for i, ref in enumerate(asset_refs, 1):
-                        try:
-                            try:
-                                entity = self.client.asset(ref)
-                            except Exception:
-                                # skip if not asset
-                                continue
-
-                            qdc_xml, meta = fetch_current_metadata(self.client, ref)
-
-                            dcterms_id = ''
-                            dc_id = ''
-                            for k, v in meta.items():
-                                if k.startswith('dcterms:identifier') and not dcterms_id:
-                                    dcterms_id = v
-                                if k.startswith('dc:identifier') and not dc_id:
-                                    dc_id = v
-
-                            filename = getattr(entity, 'file_name', '') or getattr(entity, 'filename', '') or ''
-                            if not filename:
-                                try:
-                                    bstreams = self.client.bitstreams_for_asset(ref)
-                                    for bs in bstreams:
-                                        name = getattr(bs, 'filename', None) or getattr(bs, 'name', None)
-                                        if name:
-                                            filename = name
-                                            break
-                                except Exception:
-                                    pass
-
-                            writer.writerow([ref, getattr(entity, 'title', ''), dcterms_id, dc_id, filename])
-                            count += 1
-                            self.progress.emit(int(i / total * 100))
-                        except Exception:
-                            continue
-
-                else:
-                    # Indeterminate mode: traverse children recursively and emit no percentage
-                    def process_folder(ref):
-                        nonlocal count
-                        try:
-                            children = self.client.children(ref)
-                        except Exception:
-                            return
-
-                        for child in getattr(children, 'results', []) or []:
-                            try:
-                                if isinstance(child, pyp.Folder):
-                                    process_folder(child.reference)
-                                else:
-                                    cr = child.reference
-                                    try:
-                                        qdc_xml, meta = fetch_current_metadata(self.client, cr)
-                                    except Exception:
-                                        qdc_xml, meta = ('', {})
-
-                                    dcterms_id = ''
-                                    dc_id = ''
-                                    for k, v in meta.items():
-                                        if k.startswith('dcterms:identifier') and not dcterms_id:
-                                            dcterms_id = v
-                                        if k.startswith('dc:identifier') and not dc_id:
-                                            dc_id = v
-
-                                    filename = getattr(child, 'file_name', '') or getattr(child, 'filename', '') or ''
-                                    if not filename:
-                                        try:
-                                            bstreams = self.client.bitstreams_for_asset(cr)
-                                            for bs in bstreams:
-                                                name = getattr(bs, 'filename', None) or getattr(bs, 'name', None)
-                                                if name:
-                                                    filename = name
-                                                    break
-                                        except Exception:
-                                            pass
-
-                                    writer.writerow([cr, getattr(child, 'title', ''), dcterms_id, dc_id, filename])
-                                    count += 1
-                                    if count % 100 == 0:
-                                        self.status.emit(f"Exported {count} items...")
-                            except Exception:
-                                continue
-
-                    process_folder(self.root_ref)
-
-            self.finished.emit(self.out_path)
-            self.status.emit(f"Export complete: {count} items written to {self.out_path}")
-
+            get_job_manager().run(self.job)
         except Exception as e:
             self.status.emit(f"Export failed: {e}")
             self.finished.emit("")
-
-    
-    
-    
-    
-    
-
-    
+            return
+        result = self.job.result or {}
+        if self.job.state == DONE:
+            self.finished.emit(self.out_path)
+            self.status.emit(f"Export complete: {result['rows']} items written to {self.out_path}")
+        elif self.job.state == CANCELLED:
+            # A cancel during the walk still leaves a valid file with the rows written so far
+            self.status.emit(f"Export cancelled: {result.get('rows', 0)} items written")
+            self.cancelled.emit(result.get("path", ""), result.get("rows", 0))
+
+    def cancel(self):
+        self.job.cancel()
+
+    def _inventory(self, job):
+        self.status.emit("Writing inventory...")
+        search = SearchIndexBackend(job.client(content_client_for(self.client))) if self.use_index else None
+        # Rows stream from the first listing page; the bar turns determinate once the subtree is counted
+        stats = SubtreeStats(job.client(self.client), get_cache())
+        with ProgressReporter(job, self.progress.emit):
+            return export_inventory(job.client(self.client), self.root_ref, self.out_path, progress=job,
+                                    columns=self.columns, cache=get_cache(), search=search, stats=stats)
@@ -0,0 +1,164 @@
+# gui/jobs_panel.py
+
+from PyQt6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QTableWidget, QTableWidgetItem,
+    QLabel, QSpinBox, QComboBox, QHeaderView, QFileDialog, QMessageBox, QCheckBox
+)
+from PyQt6.QtCore import QTimer
+from backend.jobs import get_job_manager, PRIORITY_LOW, PRIORITY_NORMAL, PRIORITY_HIGH
+from backend.instrumentation import get_global_metrics
+from backend.progress import format_eta
+
+REFRESH_MS = 500
+
+PRIORITY_NAMES = {PRIORITY_LOW: "Low", PRIORITY_NORMAL: "Normal", PRIORITY_HIGH: "High"}
+COLUMNS = ["#", "Job", "State", "Priority", "Progress", "Items/sec", "ETA", "Requests in flight"]
+
+
+class JobsPanel(QWidget):
+    """Shows every background job with throughput/ETA and lets the user pause, resume or cancel it."""
+
+    def __init__(self):
+        super().__init__()
+        self.manager = get_job_manager()
+
+        self.layout = QVBoxLayout()
+        self.setLayout(self.layout)
+
+        limits_layout = QHBoxLayout()
+        limits_layout.addWidget(QLabel("Jobs running at once:"))
+        self.max_jobs_spin = QSpinBox()
+        self.max_jobs_spin.setRange(1, 16)
+        self.max_jobs_spin.setValue(self.manager.max_jobs)
+        self.max_jobs_spin.valueChanged.connect(self.manager.set_max_jobs)
+        limits_layout.addWidget(self.max_jobs_spin)
+
+        limits_layout.addWidget(QLabel("API requests in flight, at most (all jobs):"))
+        self.budget_spin = QSpinBox()
+        self.budget_spin.setRange(1, 128)
+        self.budget_spin.setValue(self.manager.budget.limit)
+        self.budget_spin.valueChanged.connect(self.manager.budget.set_limit)
+        limits_layout.addWidget(self.budget_spin)
+
+        self.adaptive_check = QCheckBox("Adapt to server load")
+        self.adaptive_check.setToolTip("Raise the request limit while responses stay fast; back off on "
+                                       "429/503 responses and latency spikes, honouring Retry-After")
+        self.adaptive_check.setChecked(self.manager.budget.adaptive is not None)
+        self.adaptive_check.toggled.connect(self.manager.budget.set_adaptive)
+        limits_layout.addWidget(self.adaptive_check)
+        self.limit_label = QLabel()
+        limits_layout.addWidget(self.limit_label)
+        limits_layout.addStretch()
+        self.layout.addLayout(limits_layout)
+
+        self.table = QTableWidget()
+        self.table.setColumnCount(len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        self.layout.addWidget(self.table)
+
+        button_layout = QHBoxLayout()
+        self.pause_button = QPushButton("Pause")
+        self.pause_button.clicked.connect(lambda: self._apply(lambda job: job.pause()))
+        button_layout.addWidget(self.pause_button)
+
+        self.resume_button = QPushButton("Resume")
+        self.resume_button.clicked.connect(lambda: self._apply(lambda job: job.resume()))
+        button_layout.addWidget(self.resume_button)
+
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(lambda: self._apply(lambda job: job.cancel()))
+        button_layout.addWidget(self.cancel_button)
+
+        button_layout.addWidget(QLabel("Priority:"))
+        self.priority_combo = QComboBox()
+        for value, name in PRIORITY_NAMES.items():
+            self.priority_combo.addItem(name, value)
+        self.priority_combo.activated.connect(self._set_priority)
+        button_layout.addWidget(self.priority_combo)
+
+        self.clear_button = QPushButton("Clear Finished")
+        self.clear_button.clicked.connect(self.clear_finished)
+        button_layout.addWidget(self.clear_button)
+
+        self.metrics_button = QPushButton("Save Metrics...")
+        self.metrics_button.setToolTip("Save API latency metrics for all jobs in Prometheus text format")
+        self.metrics_button.clicked.connect(self.save_metrics)
+        button_layout.addWidget(self.metrics_button)
+        self.layout.addLayout(button_layout)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(REFRESH_MS)
+
+    def _selected_jobs(self):
+        rows = {index.row() for index in self.table.selectionModel().selectedRows()}
+        jobs = self.manager.jobs()
+        return [jobs[r] for r in rows if r < len(jobs)]
+
+    def _apply(self, action):
+        for job in self._selected_jobs():
+            action(job)
+        self.refresh()
+
+    def _set_priority(self, _index):
+        priority = self.priority_combo.currentData()
+        for job in self._selected_jobs():
+            self.manager.set_priority(job, priority)
+        self.refresh()
+
+    def clear_finished(self):
+        self.manager.clear_finished()
+        self.refresh()
+
+    def save_metrics(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Metrics", "toolkit_metrics.prom",
+                                              "Prometheus Text (*.prom *.txt)")
+        if not path:
+            return
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(get_global_metrics().to_prometheus())
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Could not save metrics:\n{e}")
+
+    def refresh(self):
+        budget = self.manager.budget
+        if budget.adaptive is not None:
+            paused = budget.adaptive.pause_remaining()
+            text = f"Current limit: {budget.current_limit()}"
+            if paused:
+                text += f" (server asked us to wait {paused:.0f}s)"
+            self.limit_label.setText(text)
+        else:
+            self.limit_label.setText("")
+        jobs = self.manager.jobs()
+        self.table.setRowCount(len(jobs))
+        for row, job in enumerate(jobs):
+            if job.total:
+                progress = f"{job.done}/{job.total}"
+            else:
+                progress = str(job.done)
+            if job.failed_items:
+                progress += f" ({job.failed_items} failed)"
+            values = [
+                str(job.id),
+                job.name,
+                job.state,
+                PRIORITY_NAMES.get(job.priority, str(job.priority)),
+                progress,
+                f"{job.throughput():.1f}",
+                format_eta(job.eta()),
+                str(job.in_flight),
+            ]
+            for col, value in enumerate(values):
+                item = self.table.item(row, col)
+                if item is None:
+                    item = QTableWidgetItem(value)
+                    self.table.setItem(row, col, item)
+                elif item.text() != value:
+                    item.setText(value)
+                # Finished jobs point at their performance report
+                item.setToolTip(f"Performance report: {job.report_path}" if job.report_path else "")
@@ -6,6 +6,7 @@ from gui.export_tab import ExportTab
 from gui.update_tab import UpdateTab
 from gui.move_tab import MoveTab
 from gui.inventory_tab import InventoryTab
+from gui.jobs_panel import JobsPanel
 
 class MainWindow(QMainWindow):
     def __init__(self, client):
@@ -16,6 +17,7 @@ class MainWindow(QMainWindow):
         self.inventory_tab = InventoryTab(client)
         self.browser_tab = BrowserTab(self.export_tab, self.move_tab, client)
         self.update_tab = UpdateTab(client)
+        self.jobs_panel = JobsPanel()
 
         self.tabs = QTabWidget()
         self.tabs.addTab(self.browser_tab, "Browser")
@@ -23,6 +25,7 @@ class MainWindow(QMainWindow):
         self.tabs.addTab(self.inventory_tab, "Inventory")
         self.tabs.addTab(self.move_tab, "Move")
         self.tabs.addTab(self.update_tab, "Update")
+        self.tabs.addTab(self.jobs_panel, "Jobs")
 
         self.setCentralWidget(self.tabs)
         # Menu Bar
@@ -2,97 +2,131 @@
 
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QLabel, QPushButton, QProgressBar,
-    QInputDialog, QMessageBox
+    QInputDialog, QMessageBox, QFileDialog
 )
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
 from backend.preservica_client import PreservicaClient
-import pyPreservica as pyp
-import time
+from backend.move_engine import (
+    move_folder, move_references, plan_move, summarize_manifest, write_manifest,
+    DEFAULT_MOVE_WORKERS, MODE_FLATTEN, MODE_SUBTREE
+)
+from backend.jobs import Job, get_job_manager, CANCELLED, PRIORITY_LOW
+from backend.progress import ProgressReporter
+from gui.progress_view import show_progress
+
 
 class MoveWorker(QThread):
-    progress = pyqtSignal(int)
+    progress = pyqtSignal(object)  # ProgressSnapshot, every PROGRESS_INTERVAL at most
+    status = pyqtSignal(str)
     finished = pyqtSignal(int, int)
 
-    def __init__(self, client, source_ref, destination_ref):
+    def __init__(self, client, source_ref, destination_ref, mode=MODE_FLATTEN, max_workers=DEFAULT_MOVE_WORKERS):
         super().__init__()
         self.client = client
         self.source_ref = source_ref
         self.destination_ref = destination_ref
+        self.mode = mode
+        self.max_workers = max_workers
+        self.manifest = []
+        self.job = Job(f"Move {source_ref} -> {destination_ref} ({mode})", self._move)
 
     def run(self):
         try:
-            source_folder = self.client.folder(self.source_ref)
-            destination_folder = self.client.folder(self.destination_ref)
+            get_job_manager().run(self.job)
         except Exception as e:
+            self.status.emit(f"Move failed: {e}")
             self.finished.emit(0, 0)
             return
+        if self.job.state == CANCELLED:
+            self.status.emit("Move cancelled")
+        self.finished.emit(*summarize_manifest(self.manifest))
+
+    def cancel(self):
+        self.job.cancel()
+
+    def _move(self, job):
+        # The folder is listed inside move_folder, so the total isn't known up
+        # front; the reporter sends the running count, rate and ETA on a fixed cadence.
+        def on_result(entry):
+            self.manifest.append(entry)
+            job.advance(failed=0 if entry["status"] == "moved" else 1)
 
-        moved = 0
-        skipped = 0
-        assets = []
+        with ProgressReporter(job, self.progress.emit):
+            move_folder(
+                job.client(self.client), self.source_ref, self.destination_ref, mode=self.mode,
+                max_workers=self.max_workers, on_result=on_result, job=job
+            )
 
-        # Get all children recursively
+
+class MovePlanWorker(QThread):
+    """Runs the dry-run planner off the GUI thread (the flatten estimate walks the whole tree)."""
+    finished = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    def __init__(self, client, source_ref, include_flatten=True):
+        super().__init__()
+        self.client = client
+        self.source_ref = source_ref
+        self.include_flatten = include_flatten
+        self.job = Job(f"Move plan {source_ref}", self._plan, priority=PRIORITY_LOW)
+
+    def run(self):
         try:
-            descendants = self.client.descendants(source_folder)
-            assets = [a for a in descendants if isinstance(a, pyp.Asset)]
-        except Exception:
-            self.finished.emit(0, 0)
+            get_job_manager().run(self.job)
+        except Exception as e:
+            self.failed.emit(str(e))
             return
+        if self.job.state == CANCELLED:
+            self.failed.emit("Dry run cancelled")
 
-        total = len(assets)
+    def cancel(self):
+        self.job.cancel()
 
-        for i, asset in enumerate(assets, 1):
-            try:
-                self.client.move(asset, destination_folder)
-                moved += 1
-            except Exception:
-                skipped += 1
-            self.progress.emit(int((i / total) * 100))
-            time.sleep(0.05)  # slight delay for smoother UI feedback
+    def _plan(self, job):
+        self.finished.emit(plan_move(job.client(self.client), self.source_ref, include_flatten=self.include_flatten))
 
-        self.finished.emit(moved, skipped)
 
 class MoveSelectionWorker(QThread):
-        progress = pyqtSignal(int)
-        finished = pyqtSignal(int, int)
-
-        def __init__(self, client, refs, destination_ref):
-            super().__init__()
-            self.client = client
-            self.refs = refs
-            self.destination_ref = destination_ref
-
-        def run(self):
-            try:
-                destination_folder = self.client.folder(self.destination_ref)
-            except Exception:
-                self.finished.emit(0, len(self.refs))
-                return
-
-            total = len(self.refs)
-            moved = 0
-            skipped = 0
-
-            for i, ref in enumerate(self.refs, 1):
-                try:
-                    entity = self.client.asset(ref)  # Try as asset
-                except Exception:
-                    try:
-                        entity = self.client.folder(ref)  # Try as folder
-                    except Exception:
-                        skipped += 1
-                        self.progress.emit(int((i / total) * 100))
-                        continue
-
-                try:
-                    self.client.move(entity, destination_folder)
-                    moved += 1
-                except Exception:
-                    skipped += 1
-
-                self.progress.emit(int((i / total) * 100))
-
-            self.finished.emit(moved, skipped)
+    progress = pyqtSignal(object)  # ProgressSnapshot, every PROGRESS_INTERVAL at most
+    status = pyqtSignal(str)
+    finished = pyqtSignal(int, int)
+
+    def __init__(self, client, refs, destination_ref, max_workers=DEFAULT_MOVE_WORKERS):
+        super().__init__()
+        self.client = client
+        self.refs = refs
+        self.destination_ref = destination_ref
+        self.max_workers = max_workers
+        self.manifest = []
+        self.job = Job(f"Move {len(refs)} item(s) -> {destination_ref}", self._move)
+
+    def run(self):
+        try:
+            get_job_manager().run(self.job)
+        except Exception as e:
+            self.status.emit(f"Move failed: {e}")
+            self.finished.emit(0, len(self.refs))
+            return
+        if self.job.state == CANCELLED:
+            self.status.emit("Move cancelled")
+        self.finished.emit(*summarize_manifest(self.manifest))
+
+    def cancel(self):
+        self.job.cancel()
+
+    def _move(self, job):
+        job.set_total(len(self.refs))
+
+        def on_result(entry):
+            self.manifest.append(entry)
+            job.advance(failed=0 if entry["status"] == "moved" else 1)
+
+        with ProgressReporter(job, self.progress.emit):
+            move_references(
+                job.client(self.client), self.refs, self.destination_ref,
+                max_workers=self.max_workers, on_result=on_result, job=job
+            )
+
 
 class MoveTab(QWidget):
     def __init__(self, client):
@@ -101,19 +135,40 @@ class MoveTab(QWidget):
         self.layout = QVBoxLayout()
         self.setLayout(self.layout)
 
-        self.info_label = QLabel("Move all assets from one folder to another.")
+        self.info_label = QLabel(
+            "Move the contents of one folder to another: flatten (every asset moved individually) or "
+            "keep structure (child folders moved whole). A dry run shows the API call count for each mode."
+        )
+        self.info_label.setWordWrap(True)
         self.layout.addWidget(self.info_label)
 
         self.move_button = QPushButton("Move Assets Between Folders")
         self.move_button.clicked.connect(self.handle_move)
         self.layout.addWidget(self.move_button)
 
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setToolTip("Stop starting moves; moves the server already began may still complete")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_move)
+        self.layout.addWidget(self.cancel_button)
+
         self.progress_bar = QProgressBar()
         self.progress_bar.setMinimum(0)
         self.progress_bar.setMaximum(100)
         self.progress_bar.setValue(0)
         self.layout.addWidget(self.progress_bar)
 
+        self.status_label = QLabel("")
+        self.layout.addWidget(self.status_label)
+
+        self.manifest_button = QPushButton("Save Move Manifest...")
+        self.manifest_button.setEnabled(False)
+        self.manifest_button.clicked.connect(self.save_manifest)
+        self.layout.addWidget(self.manifest_button)
+
+        self.worker = None
+        self.workers = []
+
     def handle_move(self):
         src_ref, ok1 = QInputDialog.getText(self, "Source Folder", "Enter the source folder reference ID:")
         if not ok1 or not src_ref.strip():
@@ -123,25 +178,149 @@ class MoveTab(QWidget):
         if not ok2 or not dst_ref.strip():
             return
 
+        box = QMessageBox(self)
+        box.setWindowTitle("Move Mode")
+        box.setText("Keep the folder structure, flatten every asset into the destination, "
+                    "or compare both with a dry run first?")
+        subtree_button = box.addButton("Keep Structure", QMessageBox.ButtonRole.AcceptRole)
+        flatten_button = box.addButton("Flatten Assets", QMessageBox.ButtonRole.AcceptRole)
+        dry_run_button = box.addButton("Dry Run", QMessageBox.ButtonRole.AcceptRole)
+        box.addButton(QMessageBox.StandardButton.Cancel)
+        box.exec()
+
+        clicked = box.clickedButton()
+        if clicked is subtree_button:
+            mode = MODE_SUBTREE
+        elif clicked is flatten_button:
+            mode = MODE_FLATTEN
+        elif clicked is dry_run_button:
+            mode = None
+        else:
+            return
+
+        self.pending_move = (src_ref.strip(), dst_ref.strip())
+        self.pending_mode = mode
+        self.move_button.setEnabled(False)
+        self.progress_bar.setRange(0, 0)
+        self.status_label.setText("Planning move...")
+        # Only the flatten estimate walks the whole tree; keep structure just lists the source folder
+        self.plan_worker = MovePlanWorker(self.client, src_ref.strip(), include_flatten=mode != MODE_SUBTREE)
+        self.plan_worker.finished.connect(self.confirm_plan)
+        self.plan_worker.failed.connect(self.plan_failed)
+        self.cancel_button.setEnabled(True)
+        self.plan_worker.start()
+
+    def cancel_move(self):
+        if getattr(self, "plan_worker", None) and self.plan_worker.isRunning():
+            self.plan_worker.cancel()
+        elif self.worker and self.worker.isRunning():
+            self.worker.cancel()
+            self.status_label.setText("Cancelling; moves already sent are listed in the manifest...")
+
+    def plan_failed(self, error):
+        self.move_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.status_label.setText("")
+        QMessageBox.critical(self, "Error", f"Failed to plan move: {error}")
+
+    def confirm_plan(self, plan):
+        self.move_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+        self.progress_bar.setRange(0, 100)
         self.progress_bar.setValue(0)
-        self.worker = MoveWorker(self.client, src_ref.strip(), dst_ref.strip())
-        self.worker.progress.connect(self.progress_bar.setValue)
+        self.status_label.setText("")
+
+        text = (
+            f"Source folder has {plan['children']} direct child item(s) "
+            f"({plan['child_folders']} folder(s), {plan['child_assets']} asset(s))"
+        )
+        if MODE_FLATTEN in plan:
+            text += f" and {plan['assets']} asset(s) in total"
+        text += f".\n\nKeep structure: ~{plan[MODE_SUBTREE]} API call(s)"
+        if MODE_FLATTEN in plan:
+            text += f"\nFlatten assets: ~{plan[MODE_FLATTEN]} API call(s)"
+
+        box = QMessageBox(self)
+        box.setWindowTitle("Move Plan")
+        box.setText(text)
+        # A dry run offers both modes; otherwise only the mode already chosen is confirmed
+        subtree_button = flatten_button = None
+        if self.pending_mode in (None, MODE_SUBTREE):
+            subtree_button = box.addButton("Keep Structure", QMessageBox.ButtonRole.AcceptRole)
+        if self.pending_mode in (None, MODE_FLATTEN):
+            flatten_button = box.addButton("Flatten Assets", QMessageBox.ButtonRole.AcceptRole)
+        box.addButton(QMessageBox.StandardButton.Cancel)
+        box.exec()
+
+        clicked = box.clickedButton()
+        if subtree_button is not None and clicked is subtree_button:
+            mode = MODE_SUBTREE
+        elif flatten_button is not None and clicked is flatten_button:
+            mode = MODE_FLATTEN
+        else:
+            return
+
+        src_ref, dst_ref = self.pending_move
+        # The total isn't known until the engine has listed the folder, so show a busy bar
+        self.progress_bar.setRange(0, 0)
+        self.status_label.setText("Moving...")
+        self.manifest_button.setEnabled(False)
+        self.workers = [w for w in self.workers if w.isRunning()]
+        self.worker = MoveWorker(self.client, src_ref, dst_ref, mode=mode)
+        self.worker.progress.connect(self._on_progress)
+        self.worker.status.connect(self.status_label.setText)
         self.worker.finished.connect(self.show_results)
+        self.workers.append(self.worker)
+        self.cancel_button.setEnabled(True)
         self.worker.start()
 
+    def _on_progress(self, snapshot):
+        show_progress(self.progress_bar, self.status_label, snapshot, "Moved")
+
     def show_results(self, moved, skipped):
-        msg = f"Moved {moved} asset(s)."
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(100)
+        self.cancel_button.setEnabled(False)
+        manifest = self.worker.manifest if self.worker else []
+        self.manifest_button.setEnabled(bool(manifest))
+        msg = f"Moved {moved} item(s)."
         if skipped > 0:
             msg += f"\nSkipped {skipped} item(s)."
-        QMessageBox.information(self, "Move Complete", msg)
-    
+        unconfirmed = sum(1 for m in manifest if m["status"] == "cancelled")
+        if unconfirmed:
+            msg += f"\n{unconfirmed} move(s) were in progress when cancelled; see the manifest."
+        self.status_label.setText(msg.replace("\n", " "))
+        title = "Move Cancelled" if self.worker and self.worker.job.state == CANCELLED else "Move Complete"
+        QMessageBox.information(self, title, msg)
+
+    def save_manifest(self):
+        if not self.worker or not self.worker.manifest:
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Save Move Manifest", filter="CSV Files (*.csv)")
+        if not path:
+            return
+        if not path.lower().endswith('.csv'):
+            path += '.csv'
+        try:
+            write_manifest(path, self.worker.manifest)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to save manifest: {e}")
+
     def move_items(self, ref_list, destination_ref):
+        self.progress_bar.setRange(0, 100)
         self.progress_bar.setValue(0)
+        self.status_label.setText("Moving selected items...")
+        self.manifest_button.setEnabled(False)
         self.ref_list = ref_list
         self.destination_ref = destination_ref
 
+        self.workers = [w for w in self.workers if w.isRunning()]
         self.worker = MoveSelectionWorker(self.client, ref_list, destination_ref)
-        self.worker.progress.connect(self.progress_bar.setValue)
+        self.worker.progress.connect(self._on_progress)
+        self.worker.status.connect(self.status_label.setText)
         self.worker.finished.connect(self.show_results)
+        self.workers.append(self.worker)
+        self.cancel_button.setEnabled(True)
         self.worker.start()
-
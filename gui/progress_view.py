@@ -0,0 +1,21 @@
+# gui/progress_view.py
+
+from backend.progress import ProgressSnapshot
+
+
+def show_progress(progress_bar, status_label, snapshot: ProgressSnapshot, verb: str = "Processed"):
+    """Applies a ProgressSnapshot to a tab's progress bar and status label.
+
+    Known totals get a percentage; streamed jobs (total not known yet) keep a
+    busy bar and show the running count, rate and ETA in the label.
+    """
+    pct = snapshot.percent()
+    if pct is None:
+        if progress_bar.maximum() != 0:
+            progress_bar.setRange(0, 0)
+    else:
+        if progress_bar.maximum() != 100:
+            progress_bar.setRange(0, 100)
+        progress_bar.setValue(pct)
+    if status_label is not None:
+        status_label.setText(snapshot.describe(verb))
@@ -1,3 +1,4 @@
+import os
 import threading
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QLabel, QPushButton, QTableWidget,
@@ -6,46 +7,131 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
 from backend.preservica_client import PreservicaClient
 from backend.metadata_diff import parse_csv, generate_diffs
-from backend.metadata_updater import update_asset_metadata
+from backend.coalesce import coalesce_rows
+from backend.update_engine import run_update
+from backend.preflight import validate_sheet, describe_problems
+from backend.cache import get_cache
+from backend.journal import Journal
+from backend.ledger import UpdateLedger
+from backend.restore_engine import restore_journal
+from backend.jobs import Job, get_job_manager, CANCELLED, DONE, PRIORITY_HIGH
+from backend.progress import ProgressReporter
+from gui.progress_view import show_progress
 import traceback
 
 
 class UpdateWorker(QThread):
-    progress = pyqtSignal(int)
+    progress = pyqtSignal(object)  # ProgressSnapshot, every PROGRESS_INTERVAL at most
     finished = pyqtSignal(int)
     cancelled = pyqtSignal()
 
-    def __init__(self, client, diffs):
+    def __init__(self, client, csv_rows, journal_path=None, ledger=None):
         super().__init__()
         self.client = client
-        self.diffs = diffs
-        self._cancel = False
+        self.csv_rows = csv_rows
+        # Every block write is journaled here with its previous XML (see "Restore from Journal...")
+        self.journal_path = journal_path
+        # Rows recorded in the sheet's UpdateLedger are skipped; finished rows are added to it
+        self.ledger = ledger
+        self.job = Job(f"Update {len(csv_rows)} row(s)", self._update, priority=PRIORITY_HIGH)
 
     def run(self):
-        total = len(self.diffs)
-        updated = 0
-        failed = 0
+        try:
+            get_job_manager().run(self.job)
+        except Exception as e:
+            print(f"Update run failed: {e}")
+            traceback.print_exc()
+            self.finished.emit(0)
+        if self.job.state == CANCELLED:
+            self.cancelled.emit()
+
+    def _update(self, job):
+        def on_result(result):
+            if result["status"] == "updated":
+                print(f"Update result for {result['reference']}: {result['message']}")
+            else:
+                print(f"Update failed for {result['reference']}: {result['message']}")
+
+        journal = Journal(self.journal_path) if self.journal_path else None
+        clean = False
+        try:
+            with ProgressReporter(job, self.progress.emit):
+                summary = run_update(job.client(self.client), self.csv_rows, progress=job, on_result=on_result,
+                                     checkpoint=self.ledger, journal=journal)
+            clean = summary["failed"] == 0
+        finally:
+            if journal is not None:
+                journal.close()
+            if self.ledger is not None:
+                # Only an interrupted or partly failed run leaves rows worth resuming
+                self.ledger.close(remove=clean)
+        self.finished.emit(summary["updated"])
 
-        for i, diff in enumerate(self.diffs, 1):
-            if self._cancel:
-                self.cancelled.emit()
-                return
+    def cancel(self):
+        self.job.cancel()
+
+
+class ValidateWorker(QThread):
+    """Runs the pre-flight check over the whole sheet before any write."""
+    progress = pyqtSignal(object)  # ProgressSnapshot
+    finished = pyqtSignal(object)  # validation report, or None if the check itself failed
+
+    def __init__(self, client, csv_rows):
+        super().__init__()
+        self.client = client
+        self.csv_rows = csv_rows
+        self.job = Job(f"Validate {len(csv_rows)} row(s)", self._validate, priority=PRIORITY_HIGH)
+
+    def run(self):
+        try:
+            get_job_manager().run(self.job)
+        except Exception as e:
+            print(f"Validation failed: {e}")
+            traceback.print_exc()
+        if self.job.state != DONE:
+            self.finished.emit(None)
+
+    def _validate(self, job):
+        with ProgressReporter(job, self.progress.emit):
+            report = validate_sheet(job.client(self.client), self.csv_rows, cache=get_cache(), progress=job)
+        self.finished.emit(report)
 
-            try:
-                res = update_asset_metadata(self.client, diff["reference"], diff["csv_row"])
-                print(f"Update result for {diff['reference']}: {res}")
-                updated += 1
-            except Exception as e:
-                failed += 1
-                print(f"Update failed for {diff['reference']}: {e}")
-                traceback.print_exc()
+    def cancel(self):
+        self.job.cancel()
 
-            self.progress.emit(int(i / total * 100))
 
-        self.finished.emit(updated)
+class RestoreWorker(QThread):
+    """Reverts the writes recorded in an update journal."""
+    progress = pyqtSignal(object)  # ProgressSnapshot
+    finished = pyqtSignal(object)  # restore summary, or None if cancelled/failed
+
+    def __init__(self, client, journal_path):
+        super().__init__()
+        self.client = client
+        self.journal_path = journal_path
+        self.job = Job(f"Restore {os.path.basename(journal_path)}", self._restore, priority=PRIORITY_HIGH)
+
+    def run(self):
+        try:
+            get_job_manager().run(self.job)
+        except Exception as e:
+            print(f"Restore failed: {e}")
+            traceback.print_exc()
+        if self.job.state != DONE:
+            self.finished.emit(None)
+
+    def _restore(self, job):
+        def on_result(result):
+            if result["status"] != "restored":
+                print(f"Restore {result['status']} for {result['reference']}: {result['message']}")
+
+        with ProgressReporter(job, self.progress.emit):
+            summary = restore_journal(job.client(self.client), self.journal_path, progress=job,
+                                      on_result=on_result, cache=get_cache())
+        self.finished.emit(summary)
 
     def cancel(self):
-        self._cancel = True
+        self.job.cancel()
 
 
 class UpdateTab(QWidget):
@@ -58,6 +144,7 @@ class UpdateTab(QWidget):
         self.file_path = None
         self.csv_rows = []
         self.worker = None
+        self.workers = []
 
         self.layout = QVBoxLayout()
         self.setLayout(self.layout)
@@ -84,6 +171,10 @@ class UpdateTab(QWidget):
         self.cancel_button.clicked.connect(self.cancel_update)
         self.layout.addWidget(self.cancel_button)
 
+        self.restore_button = QPushButton("Restore from Journal...")
+        self.restore_button.clicked.connect(self.restore_from_journal)
+        self.layout.addWidget(self.restore_button)
+
         self.progress_bar = QProgressBar()
         self.progress_bar.setMinimum(0)
         self.progress_bar.setMaximum(100)
@@ -108,7 +199,8 @@ class UpdateTab(QWidget):
 
         self.file_path = file_path
         self.csv_rows = rows
-        self.preview_diffs(rows[:10])  # Only preview first 10
+        # Only preview the first 10 references, each as the one merged row the update will write
+        self.preview_diffs([e["row"] for e in coalesce_rows(rows) if not e["conflicts"]][:10])
 
     def preview_diffs(self, preview_rows):
         self.status_label.setText("Checking for metadata differences...")
@@ -151,37 +243,124 @@ class UpdateTab(QWidget):
         if not self.csv_rows:
             return
 
-        self.status_label.setText("Processing all changes...")
+        self.status_label.setText("Checking references and headers before writing...")
         self.update_button.setEnabled(False)
         self.cancel_button.setEnabled(True)
-        self.table.setRowCount(0)
         self.progress_bar.setValue(0)
 
-        def full_diff():
-            all_diffs = generate_diffs(self.client, self.csv_rows)
-            changed = [d for d in all_diffs if d["changes"]]
-            self.run_update_worker(changed)
+        self.workers = [w for w in self.workers if w.isRunning()]
+        self.worker = ValidateWorker(self.client, self.csv_rows)
+        self.worker.progress.connect(lambda s: show_progress(self.progress_bar, self.status_label, s, "Checked"))
+        self.worker.finished.connect(self.validation_complete)
+        self.workers.append(self.worker)
+        self.worker.start()
 
-        threading.Thread(target=full_diff).start()
+    def validation_complete(self, report):
+        self.progress_bar.setRange(0, 100)
+        if report is None:
+            self.status_label.setText("Validation cancelled or failed; nothing was written.")
+            self.update_button.setEnabled(True)
+            self.cancel_button.setEnabled(False)
+            return
+        if report["errors"]:
+            QMessageBox.warning(self, "Fix the Sheet First", describe_problems(report))
+            self.status_label.setText(f"{report['errors']} problem(s) found; nothing was written.")
+            self.update_button.setEnabled(True)
+            self.cancel_button.setEnabled(False)
+            return
+        if report["warnings"]:
+            answer = QMessageBox.question(self, "Warnings", describe_problems(report) + "\n\nUpdate anyway?")
+            if answer != QMessageBox.StandardButton.Yes:
+                self.status_label.setText("Update not started.")
+                self.update_button.setEnabled(True)
+                self.cancel_button.setEnabled(False)
+                return
 
-    def run_update_worker(self, diffs):
-        self.worker = UpdateWorker(self.client, diffs)
-        self.worker.progress.connect(self.progress_bar.setValue)
+        self.status_label.setText("Processing all changes...")
+        self.table.setRowCount(0)
+        self.progress_bar.setValue(0)
+        self.run_update_worker(self.csv_rows)
+
+    def run_update_worker(self, csv_rows):
+        # The full diff now runs inside the worker's job, so it shares the request budget
+        self.workers = [w for w in self.workers if w.isRunning()]
+        journal_path = self.file_path + ".journal.gz" if self.file_path else None
+        ledger = self.open_ledger()
+        self.worker = UpdateWorker(self.client, csv_rows, journal_path, ledger)
+        self.worker.progress.connect(lambda s: show_progress(self.progress_bar, self.status_label, s, "Updated"))
         self.worker.finished.connect(self.update_complete)
         self.worker.cancelled.connect(self.update_cancelled)
+        self.workers.append(self.worker)
         self.worker.start()
 
+    def open_ledger(self):
+        """The sheet's UpdateLedger; offers to skip the rows an earlier run of the same sheet finished."""
+        if not self.file_path:
+            return None
+        try:
+            ledger = UpdateLedger(self.file_path)
+        except Exception as e:
+            print(f"Could not open the update ledger: {e}")
+            return None
+        if ledger.applied():
+            answer = QMessageBox.question(
+                self, "Resume Update",
+                f"{ledger.applied()} row(s) of this sheet were finished by an earlier run.\n\n"
+                "Skip them and resume? (No starts over and updates every row again.)"
+            )
+            if answer != QMessageBox.StandardButton.Yes:
+                ledger.close()
+                ledger = UpdateLedger(self.file_path, resume=False)
+        return ledger
+
     def cancel_update(self):
         if self.worker:
             self.worker.cancel()
             self.status_label.setText("Cancelling update...")
 
     def update_complete(self, updated_count):
+        self.progress_bar.setRange(0, 100)
         self.status_label.setText(f"Metadata update complete. {updated_count} items updated.")
         self.progress_bar.setValue(100)
         self.cancel_button.setEnabled(False)
 
     def update_cancelled(self):
+        self.progress_bar.setRange(0, 100)
         self.status_label.setText("Update cancelled by user.")
         self.cancel_button.setEnabled(False)
         self.progress_bar.setValue(0)
+
+    def restore_from_journal(self):
+        journal_path, _ = QFileDialog.getOpenFileName(
+            self, "Select Update Journal", filter="Update Journals (*.journal.gz);;All Files (*)"
+        )
+        if not journal_path:
+            return
+        answer = QMessageBox.question(
+            self, "Restore Metadata",
+            "Put back the metadata recorded in this journal? Blocks edited since the update are left alone."
+        )
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+
+        self.status_label.setText("Restoring metadata from journal...")
+        self.cancel_button.setEnabled(True)
+        self.progress_bar.setValue(0)
+        self.workers = [w for w in self.workers if w.isRunning()]
+        self.worker = RestoreWorker(self.client, journal_path)
+        self.worker.progress.connect(lambda s: show_progress(self.progress_bar, self.status_label, s, "Restored"))
+        self.worker.finished.connect(self.restore_complete)
+        self.workers.append(self.worker)
+        self.worker.start()
+
+    def restore_complete(self, summary):
+        self.progress_bar.setRange(0, 100)
+        self.cancel_button.setEnabled(False)
+        if summary is None:
+            self.status_label.setText("Restore cancelled or failed.")
+            return
+        self.progress_bar.setValue(100)
+        self.status_label.setText(
+            f"Restore complete. {summary['restored']} restored, {summary['conflicts']} changed since "
+            f"(skipped), {summary['failed']} failed."
+        )
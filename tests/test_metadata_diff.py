@@ -0,0 +1,52 @@
+# tests/test_metadata_diff.py
+
+import pytest
+from backend.export_utils import XlsxStream
+from backend.metadata_diff import parse_csv, parse_sheet
+
+
+def _write_split_export(path, count):
+    fields = ["reference", "dc:title"]
+    with XlsxStream(str(path), fields, max_sheet_rows=3, max_file_bytes=None) as stream:
+        for i in range(count):
+            stream.write({"reference": f"r{i}", "dc:title": f"0{i}"})
+    return stream
+
+
+def test_parse_sheet_reads_every_sheet(tmp_path):
+    stream = _write_split_export(tmp_path / "export.xlsx", 10)
+    assert stream.sheets == 4
+
+    frame = parse_sheet(str(tmp_path / "export.xlsx"))
+    assert frame["reference"].tolist() == [f"r{i}" for i in range(10)]
+    assert frame["dc:title"].tolist()[:2] == ["00", "01"]  # read as text
+    assert len(parse_csv(str(tmp_path / "export.xlsx"))) == 10
+
+
+def test_parse_sheet_reads_part_files(tmp_path):
+    path = tmp_path / "export.xlsx"
+    with XlsxStream(str(path), ["reference"], max_sheet_rows=2, max_file_bytes=1) as stream:
+        for i in range(7):
+            stream.write({"reference": f"r{i}"})
+    assert len(stream.files) > 1
+
+    assert parse_sheet(str(path))["reference"].tolist() == [f"r{i}" for i in range(7)]
+    with pytest.raises(ValueError, match="part 2 of a split export"):
+        parse_sheet(stream.files[1])
+
+
+def test_split_snapshot_keeps_later_sheets_unchanged(tmp_path):
+    from backend.metadata_diff import diff_against_snapshot, load_snapshot
+
+    path = tmp_path / "snapshot.xlsx"
+    with XlsxStream(str(path), ["reference", "dc:title", "urn:s::x"], max_sheet_rows=2, max_file_bytes=1) as stream:
+        for i in range(7):
+            stream.write({"reference": f"r{i}", "dc:title": f"T{i}", "urn:s::x": "1"})
+    assert len(stream.files) > 1
+
+    snapshot = load_snapshot(str(path))
+    assert sorted(snapshot.index) == [f"r{i}" for i in range(7)]
+    rows = [{"reference": f"r{i}", "dc:title": f"T{i}", "urn:s::x": "1"} for i in range(7)]
+    assert all(not d["changes"] for d in diff_against_snapshot(rows, snapshot))
+    with pytest.raises(ValueError):
+        load_snapshot(stream.files[-1])
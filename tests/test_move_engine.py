@@ -0,0 +1,58 @@
+# tests/test_move_engine.py
+
+import threading
+
+from backend import move_engine
+from backend.jobs import Job, CANCELLED, get_job_manager
+from backend.move_engine import move_references
+
+
+class Entity:
+    def __init__(self, reference):
+        self.reference = reference
+
+
+class StuckClient:
+    """A server whose moves never leave ACTIVE."""
+
+    def __init__(self):
+        self.polled = threading.Event()
+
+    def folder(self, reference):
+        return Entity(reference)
+
+    def asset(self, reference):
+        return Entity(reference)
+
+    def move_async(self, entity, destination):
+        return entity.reference
+
+    def get_async_progress(self, pid):
+        self.polled.set()
+        return "ACTIVE"
+
+
+def test_move_that_never_settles_times_out_as_failed(monkeypatch):
+    monkeypatch.setattr(move_engine, "POLL_START", 0.01)
+    monkeypatch.setattr(move_engine, "MOVE_TIMEOUT", 0.05)
+    manifest = move_references(StuckClient(), ["a1"], "dest")
+    assert [(m["status"], m["server_status"]) for m in manifest] == [("failed", "TIMEOUT")]
+
+
+def test_cancel_stops_following_a_move(monkeypatch):
+    monkeypatch.setattr(move_engine, "POLL_START", 60.0)
+    client = StuckClient()
+    manifest = []
+
+    def target(job):
+        move_references(client, ["a1"], "dest", on_result=manifest.append, job=job)
+
+    job = Job("move", target)
+    runner = threading.Thread(target=get_job_manager().run, args=(job,))
+    runner.start()
+    assert client.polled.wait(5)
+    job.cancel()
+    runner.join(5)
+    assert not runner.is_alive()
+    assert job.state == CANCELLED
+    assert [m["status"] for m in manifest] == ["cancelled"]
@@ -0,0 +1,42 @@
+# tests/test_preview_service.py
+
+from backend.preview_service import PreviewService
+from backend.row_cache import RowCache
+
+
+class Entity:
+    def __init__(self, reference):
+        self.reference = reference
+        self.title = f"Title {reference}"
+        self.metadata = {f"{reference}|urn:s": "urn:s"}
+
+
+class Client:
+    def __init__(self):
+        self.fetched = []
+
+    def asset(self, reference):
+        self.fetched.append(reference)
+        return Entity(reference)
+
+    def metadata(self, url):
+        return '<m xmlns="urn:s"><a>1</a></m>'
+
+
+def test_warm_refetches_rows_cached_under_an_allow_list():
+    row_cache = RowCache()
+    # An export limited to another schema cached a narrower row for a1
+    row_cache.put("a1", {"reference": "a1", "title": "Title a1", "type": "asset", "qdc_xml": ""},
+                  Entity("a1"), ["urn:s"], schemas=["urn:other"])
+    client = Client()
+    preview = PreviewService(client, row_cache=row_cache)
+
+    assert preview.cached(["a1"]) == {}
+    assert preview.warm(["a1"]) == 1
+    assert client.fetched == ["a1"]
+    assert row_cache.entry("a1")["schemas"] is None
+    assert "urn:s::a" in preview.cached(["a1"])["a1"]
+
+    # Now the full row is cached, warming again costs nothing
+    assert preview.warm(["a1"]) == 0
+    assert client.fetched == ["a1"]
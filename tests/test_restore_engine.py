@@ -0,0 +1,48 @@
+# tests/test_restore_engine.py
+
+from backend.journal import Journal
+from backend.restore_engine import restore_journal
+
+SCHEMA = "urn:s"
+
+
+class Entity:
+    def __init__(self, reference, blocks):
+        self.reference = reference
+        self.metadata = {f"{reference}|{schema}": schema for schema in blocks}
+
+
+class Client:
+    def __init__(self, blocks):
+        self.blocks = blocks  # reference -> {schema: xml}
+        self.deleted = []
+
+    def asset(self, reference):
+        return Entity(reference, self.blocks[reference])
+
+    def metadata(self, url):
+        reference, schema = url.split("|")
+        return self.blocks[reference][schema]
+
+    def delete_metadata(self, entity, schema):
+        self.deleted.append((entity.reference, schema))
+        del self.blocks[entity.reference][schema]
+
+
+def test_restore_reports_absent_added_block_as_unchanged(tmp_path):
+    path = str(tmp_path / "run.journal.gz")
+    with Journal(path) as journal:
+        # An add that failed: begun but never committed, and the block never appeared
+        journal.begin("r1", SCHEMA, "added", None, '<m xmlns="urn:s"><a>1</a></m>')
+        # An add that went through
+        journal.commit(journal.begin("r2", SCHEMA, "added", None, '<m xmlns="urn:s"><a>2</a></m>'))
+    client = Client({"r1": {}, "r2": {SCHEMA: '<m xmlns="urn:s"><a>2</a></m>'}})
+
+    summary = restore_journal(client, path, rate=0)
+
+    results = {r["reference"]: r for r in summary["results"]}
+    assert [b["action"] for b in results["r1"]["blocks"]] == ["unchanged"]
+    assert "Deleted" not in results["r1"]["message"]
+    assert [b["action"] for b in results["r2"]["blocks"]] == ["deleted"]
+    assert client.deleted == [("r2", SCHEMA)]
+    assert summary["failed"] == 0 and summary["conflicts"] == 0
@@ -0,0 +1,60 @@
+# tests/test_toolkit_cli.py
+
+import csv
+import os
+import sys
+
+import pytest
+
+import backend.ledger as ledger_module
+from backend.cache import disable_cache
+from backend.jobs import Job, get_job_manager
+from backend.ledger import UpdateLedger
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+import toolkit_cli  # noqa: E402
+
+
+class MissingClient:
+    """Every reference is unknown, so the pre-flight check fails."""
+
+    def asset(self, reference):
+        raise KeyError(reference)
+
+    def folder(self, reference):
+        raise KeyError(reference)
+
+
+def test_failed_validation_keeps_the_ledger(tmp_path, monkeypatch):
+    monkeypatch.setattr(ledger_module, "LEDGER_DIR", tmp_path / "ledgers")
+    disable_cache()
+    sheet = tmp_path / "edits.csv"
+    with open(sheet, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, ["reference", "dc:title"])
+        writer.writeheader()
+        writer.writerows([{"reference": "r1", "dc:title": "A"}, {"reference": "r2", "dc:title": "B"}])
+
+    # An earlier, interrupted run of the same sheet
+    earlier = UpdateLedger(str(sheet), resume=False)
+    earlier.record("2:r1", {"xml": "abc", "message": "Updated"})
+    earlier.close()
+
+    args = toolkit_cli.build_parser().parse_args(["update", str(sheet), "--no-journal", "--workers", "2"])
+    _, target, _ = toolkit_cli.cmd_update(args, MissingClient())
+    job = Job("update", target)
+    get_job_manager().run(job)
+
+    assert job.result["failed"] > 0 and "validation" in job.result
+    kept = UpdateLedger(str(sheet))
+    assert kept.applied() == 1
+    kept.close()
+
+
+def test_export_rejects_schemas_with_search_index(tmp_path):
+    args = toolkit_cli.build_parser().parse_args(
+        ["export", "--folder", "f1", "--search-index", "--schemas", "qdc", "-o", str(tmp_path / "out.csv"),
+         "--no-checkpoint"])
+    _, target, _ = toolkit_cli.cmd_export(args, MissingClient())
+    job = Job("export", target)
+    with pytest.raises(ValueError, match="--schemas"):
+        target(job)
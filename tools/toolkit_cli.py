@@ -0,0 +1,407 @@
+# Headless entry point for the export, inventory, update and move engines.
+#
+# Progress and the final summary are printed to stdout as JSON lines, e.g.
+#     {"event": "progress", "job": "export", "done": 120, "total": 500, ...}
+# Every run writes a JSON performance report (per-API-call latency, errors, bytes
+# and local stage timings); --metrics-port serves live Prometheus metrics.
+# Exit codes: 0 success, 1 finished with item failures, 2 bad usage,
+# 3 login failed, 4 job failed, 130 cancelled (Ctrl+C).
+#
+# Examples:
+#     python tools/toolkit_cli.py inventory REF-123 -o inventory.csv --workers 16
+#     python tools/toolkit_cli.py export --folder REF-123 -o export.xlsx --resume
+#     python tools/toolkit_cli.py export --folder REF-123 -o export.parquet
+#     python tools/toolkit_cli.py update edits.xlsx --dry-run
+#     python tools/toolkit_cli.py move --source REF-1 --dest REF-2 --mode subtree --manifest moved.csv
+
+import sys
+from pathlib import Path
+
+# Ensure repo root is on sys.path so `backend` imports work when running this script directly
+repo_root = Path(__file__).resolve().parent.parent
+if str(repo_root) not in sys.path:
+    sys.path.insert(0, str(repo_root))
+
+import argparse
+import json
+import signal
+import time
+
+from pyPreservica import EntityAPI
+from backend.cache import set_cache_dir, disable_cache, get_cache
+from backend.checkpoint import Checkpoint
+from backend.coalesce import coalesce_rows, describe_conflicts
+from backend.export_utils import FORMATS
+from backend.instrumentation import get_global_metrics, serve_metrics
+from backend.export_engine import export_metadata, export_folder, export_folder_indexed, DEFAULT_EXPORT_WORKERS
+from backend.search_backend import SearchIndexBackend, content_client_for
+from backend.subtree_stats import SubtreeStats
+from backend.inventory_engine import export_inventory, parse_columns, DEFAULT_INVENTORY_WORKERS
+from backend.jobs import Job, get_job_manager, CANCELLED, FAILED
+from backend.progress import ProgressReporter
+from backend.metadata_diff import parse_csv, generate_diffs, diff_against_snapshot, load_snapshot
+from backend.move_engine import (
+    move_folder, move_references, plan_move, summarize_manifest, write_manifest,
+    DEFAULT_MOVE_WORKERS, MODE_FLATTEN, MODE_SUBTREE
+)
+from backend.traversal import iter_descendants
+from backend.update_engine import run_update, DEFAULT_UPDATE_WORKERS
+from backend.preflight import validate_sheet
+from backend.journal import Journal
+from backend.ledger import UpdateLedger
+from backend.restore_engine import restore_journal, DEFAULT_RESTORE_RATE, DEFAULT_RESTORE_WORKERS
+
+EXIT_OK = 0
+EXIT_ITEM_FAILURES = 1
+EXIT_USAGE = 2
+EXIT_LOGIN_FAILED = 3
+EXIT_JOB_FAILED = 4
+EXIT_CANCELLED = 130
+
+CREDENTIALS_FILE = Path.home() / ".preservica_toolkit_credentials.json"
+
+
+def emit(event, **fields):
+    print(json.dumps({"event": event, "time": round(time.time(), 3), **fields}, default=str), flush=True)
+
+
+def connect(args):
+    """Logs in with the GUI's saved credentials file; pyPreservica falls back to the
+    PRESERVICA_USERNAME / PRESERVICA_PASSWORD / PRESERVICA_TENANT / PRESERVICA_SERVER
+    environment variables for anything missing."""
+    creds = {}
+    path = Path(args.credentials)
+    if path.exists():
+        with open(path, "r") as f:
+            creds = json.load(f)
+    return EntityAPI(**creds)
+
+
+def read_refs(args):
+    refs = list(args.refs or [])
+    if args.refs_file:
+        with open(args.refs_file, "r", encoding="utf-8") as f:
+            refs.extend(line.strip() for line in f if line.strip())
+    return refs
+
+
+def open_checkpoint(args, default_path):
+    if args.no_checkpoint:
+        return None
+    return Checkpoint(args.checkpoint or default_path, resume=args.resume)
+
+
+# --- commands --------------------------------------------------------------
+# Each command returns (job name, target(job) -> summary dict, checkpoint or None)
+
+def cmd_export(args, client):
+    checkpoint = open_checkpoint(args, args.output + ".checkpoint.jsonl")
+
+    def target(job):
+        api = job.client(client)
+        refs = read_refs(args)
+        if args.search_index:
+            if not args.folder or refs:
+                raise ValueError("--search-index works with --folder only")
+            if args.schemas:
+                raise ValueError("--schemas can't be combined with --search-index (use --fields to pick columns)")
+            search = SearchIndexBackend(job.client(content_client_for(client)))
+            fields = parse_columns(args.fields) if args.fields else None
+            return export_folder_indexed(api, search, args.folder, args.output, fields=fields, fmt=args.format,
+                                         max_workers=args.workers, checkpoint=checkpoint, progress=job,
+                                         cache=get_cache())
+        schemas = parse_columns(args.schemas) if args.schemas else None
+        if args.folder and not refs:
+            # Fetching starts with the first listing page; the total comes from the subtree count
+            return export_folder(api, args.folder, args.output, fmt=args.format, max_workers=args.workers,
+                                 checkpoint=checkpoint, progress=job, cache=get_cache(), schemas=schemas,
+                                 stats=SubtreeStats(api, get_cache()))
+        if args.folder:
+            refs.extend(e.reference for e in iter_descendants(api, args.folder, assets_only=True))
+        if not refs:
+            raise ValueError("Nothing to export: pass --refs, --refs-file or --folder")
+        return export_metadata(api, refs, args.output, fmt=args.format, max_workers=args.workers,
+                               checkpoint=checkpoint, progress=job, cache=get_cache(), schemas=schemas)
+
+    return "export", target, checkpoint
+
+
+def cmd_inventory(args, client):
+    checkpoint = open_checkpoint(args, args.output + ".checkpoint.jsonl")
+
+    def target(job):
+        columns = parse_columns(args.columns) if args.columns else None
+        search = SearchIndexBackend(job.client(content_client_for(client))) if args.search_index else None
+        stats = SubtreeStats(job.client(client), get_cache())
+        return export_inventory(job.client(client), args.folder, args.output, fmt=args.format,
+                                max_workers=args.workers, checkpoint=checkpoint, progress=job,
+                                columns=columns, cache=get_cache(), search=search, stats=stats)
+
+    return "inventory", target, checkpoint
+
+
+def cmd_update(args, client):
+    def target(job):
+        rows = parse_csv(args.file)
+        snapshot = load_snapshot(args.snapshot) if args.snapshot else None
+        if args.dry_run:
+            # Diffed as the update would write them: one merged row per reference
+            entries = coalesce_rows(rows)
+            merged = [e["row"] for e in entries if not e["conflicts"]]
+            if snapshot is not None:
+                diffs = diff_against_snapshot(merged, snapshot)
+            else:
+                diffs = generate_diffs(job.client(client), merged, max_workers=args.workers)
+            changed = [d for d in diffs if d["changes"]]
+            conflicts = {e["reference"]: describe_conflicts(e) for e in entries if e["conflicts"]}
+            return {
+                "rows": len(rows),
+                "changed": len(changed),
+                "changes": {d["reference"]: sorted(d["changes"]) for d in changed},
+                "conflicts": conflicts,
+                "failed": len(conflicts),
+            }
+        report = None
+        if args.validate_only or not args.no_validate:
+            # Pre-flight: find bad references, headers and blocks before the first write
+            report = validate_sheet(job.client(client), rows, max_workers=args.workers, cache=get_cache(),
+                                    progress=job if args.validate_only else None)
+            if args.validate_only or report["errors"]:
+                return {"rows": len(rows), "validation": report, "failed": report["errors"]}
+        # Opened only now: without --resume the ledger is truncated, and a run stopped by validation
+        # must leave an earlier run's progress intact. The ledger is found again by the sheet's content
+        # hash and removed once a run finishes without failures; it's closed here, not by main().
+        ledger = None
+        if not args.no_checkpoint:
+            if args.checkpoint:
+                ledger = Checkpoint(args.checkpoint, resume=args.resume)
+            else:
+                ledger = UpdateLedger(args.file, resume=args.resume)
+        journal = None if args.no_journal else Journal(args.journal or args.file + ".journal.gz")
+        clean = False
+        try:
+            summary = run_update(job.client(client), rows, max_workers=args.workers,
+                                 checkpoint=ledger, progress=job, snapshot=snapshot, journal=journal)
+            clean = summary["failed"] == 0
+        finally:
+            if journal is not None:
+                journal.close()
+            if ledger is not None:
+                ledger.close(remove=clean)
+        if summary["skipped"]:
+            emit("warning", job="update", message=f"Skipped {summary['skipped']} row(s) already applied by an "
+                 f"earlier run (ledger {ledger.path}); run without --resume to apply them again")
+        summary["results"] = [r for r in summary["results"] if r["status"] != "updated"]
+        summary["journal"] = journal.path if journal is not None else None
+        summary["ledger"] = ledger.path if ledger is not None and not clean else None
+        if report is not None:
+            summary["validation_warnings"] = report["problems"]
+        return summary
+
+    return "update", target, None
+
+
+def cmd_restore(args, client):
+    def target(job):
+        summary = restore_journal(job.client(client), args.journal, max_workers=args.workers, rate=args.rate,
+                                  force=args.force, progress=job, cache=get_cache())
+        summary["results"] = [r for r in summary["results"] if r["status"] != "restored"]
+        return summary
+
+    return "restore", target, None
+
+
+def cmd_move(args, client):
+    checkpoint = open_checkpoint(args, args.checkpoint) if args.checkpoint else None
+
+    def target(job):
+        api = job.client(client)
+        if args.plan:
+            if not args.source:
+                raise ValueError("--plan needs --source")
+            plan = plan_move(api, args.source)
+            plan["failed"] = 0
+            return plan
+
+        manifest = []
+
+        def on_result(entry):
+            manifest.append(entry)
+            job.advance(failed=0 if entry["status"] == "moved" else 1)
+
+        refs = read_refs(args)
+        if refs:
+            job.set_total(len(refs))
+            move_references(api, refs, args.dest, max_workers=args.workers,
+                            on_result=on_result, checkpoint=checkpoint, job=job)
+        elif args.source:
+            move_folder(api, args.source, args.dest, mode=args.mode, max_workers=args.workers,
+                        on_result=on_result, checkpoint=checkpoint, job=job)
+        else:
+            raise ValueError("Nothing to move: pass --source or --refs/--refs-file")
+
+        if args.manifest:
+            write_manifest(args.manifest, manifest)
+        moved, failed = summarize_manifest(manifest)
+        cancelled = sum(1 for m in manifest if m["status"] == "cancelled")
+        return {"moved": moved, "failed": failed, "cancelled": cancelled, "manifest": args.manifest}
+
+    return "move", target, checkpoint
+
+
+# --- runner ----------------------------------------------------------------
+
+def run_job(name, target, interval, report_path=None):
+    job = Job(name, target)
+    job.report_path = report_path
+
+    def report(snapshot):
+        emit("progress", job=name, state=snapshot.state, done=snapshot.done, total=snapshot.total,
+             failed=snapshot.failed, rate=round(snapshot.rate, 2),
+             eta=round(snapshot.eta, 1) if snapshot.eta is not None else None)
+
+    def on_sigint(signum, frame):
+        # First Ctrl+C cancels cleanly; a second one falls through to KeyboardInterrupt
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        emit("cancelling", job=name)
+        job.cancel()
+
+    signal.signal(signal.SIGINT, on_sigint)
+    emit("start", job=name)
+    with ProgressReporter(job, report, interval=interval):
+        try:
+            get_job_manager().run(job)
+        except Exception:
+            pass  # recorded on job.error
+    return job
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run Preservica toolkit jobs without the GUI.")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--workers", type=int, help="Concurrent calls per job (engine default if omitted)")
+    common.add_argument("--max-requests", type=int, help="Global cap on API requests in flight")
+    common.add_argument("--fixed-concurrency", action="store_true",
+                        help="Keep --max-requests in flight instead of adapting to latency and 429/503s")
+    common.add_argument("--checkpoint", help="Checkpoint file (default: next to the output/input file)")
+    common.add_argument("--resume", action="store_true", help="Skip items recorded in the checkpoint")
+    common.add_argument("--no-checkpoint", action="store_true", help="Don't write a checkpoint")
+    common.add_argument("--cache-dir", help="Directory for the persistent cache")
+    common.add_argument("--no-cache", action="store_true", help="Disable the persistent cache")
+    common.add_argument("--credentials", default=str(CREDENTIALS_FILE), help="Saved credentials JSON")
+    common.add_argument("--progress-interval", type=float, default=2.0, help="Seconds between progress events")
+    common.add_argument("--report", help="Performance report JSON (default: ~/.preservica_toolkit_reports/)")
+    common.add_argument("--metrics-port", type=int, help="Serve live Prometheus metrics on this port")
+    common.add_argument("--metrics-file", help="Write Prometheus metrics to this file when the job ends")
+
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("export", parents=[common], help="Export metadata for references or a folder")
+    p.add_argument("--refs", nargs="*", help="Asset/folder references")
+    p.add_argument("--refs-file", help="File with one reference per line")
+    p.add_argument("--folder", help="Export every asset below this folder")
+    p.add_argument("-o", "--output", required=True)
+    p.add_argument("--format", choices=FORMATS, help="Output format (default: from extension)")
+    p.add_argument("--search-index", action="store_true",
+                   help="With --folder: read fields from the search index in pages instead of per asset")
+    p.add_argument("--fields", help="With --search-index: comma-separated dc:*/dcterms:* fields (default: all indexed)")
+    p.add_argument("--schemas", help="Comma-separated schema URIs to export, \"qdc\" for the QDC block "
+                                     "(default: every block; not with --search-index)")
+    p.set_defaults(func=cmd_export, default_workers=DEFAULT_EXPORT_WORKERS)
+
+    p = sub.add_parser("inventory", parents=[common], help="Recursive inventory of a folder")
+    p.add_argument("folder")
+    p.add_argument("-o", "--output", required=True)
+    p.add_argument("--format", choices=FORMATS, help="Output format (default: from extension)")
+    p.add_argument("--columns", help="Comma-separated columns, e.g. reference,parent_path,dc:title "
+                                     "(default: reference,dc:title,dcterms:identifier,dc:identifier,filename)")
+    p.add_argument("--search-index", action="store_true",
+                   help="Read the subtree from the search index; per-asset calls only for unindexed columns")
+    p.set_defaults(func=cmd_inventory, default_workers=DEFAULT_INVENTORY_WORKERS)
+
+    p = sub.add_parser("update", parents=[common], help="Apply a metadata sheet (.csv/.xlsx)")
+    p.add_argument("file")
+    p.add_argument("--dry-run", action="store_true", help="Only report which references would change")
+    p.add_argument("--validate-only", action="store_true",
+                   help="Only run the pre-flight check (references, headers, XML) and report problems")
+    p.add_argument("--no-validate", action="store_true", help="Skip the pre-flight check before writing")
+    p.add_argument("--snapshot", help="Diff against this earlier export (.csv/.xlsx/.parquet) instead of "
+                                      "fetching every row's current metadata")
+    p.add_argument("--journal", help="Rollback journal path (default: FILE.journal.gz)")
+    p.add_argument("--no-journal", action="store_true", help="Don't record previous XML for rollback")
+    p.set_defaults(func=cmd_update, default_workers=DEFAULT_UPDATE_WORKERS)
+
+    p = sub.add_parser("restore", parents=[common], help="Revert the writes recorded in an update journal")
+    p.add_argument("journal")
+    p.add_argument("--rate", type=float, default=DEFAULT_RESTORE_RATE,
+                   help=f"Most restore writes per second (default {DEFAULT_RESTORE_RATE}, 0 = unlimited)")
+    p.add_argument("--force", action="store_true", help="Also restore blocks changed since they were journaled")
+    p.set_defaults(func=cmd_restore, default_workers=DEFAULT_RESTORE_WORKERS)
+
+    p = sub.add_parser("move", parents=[common], help="Move a folder's contents or a list of references")
+    p.add_argument("--source", help="Source folder reference")
+    p.add_argument("--refs", nargs="*", help="References to move")
+    p.add_argument("--refs-file", help="File with one reference per line")
+    p.add_argument("--dest", help="Destination folder reference")
+    p.add_argument("--mode", choices=[MODE_FLATTEN, MODE_SUBTREE], default=MODE_FLATTEN)
+    p.add_argument("--plan", action="store_true", help="Dry run: print the API call estimate for each mode")
+    p.add_argument("--manifest", help="Write the per-reference manifest CSV here")
+    p.set_defaults(func=cmd_move, default_workers=DEFAULT_MOVE_WORKERS)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "move" and not args.plan and not args.dest:
+        parser.error("move needs --dest (or --plan)")
+    if args.workers is None:
+        args.workers = args.default_workers
+
+    if args.no_cache:
+        disable_cache()
+    elif args.cache_dir:
+        set_cache_dir(args.cache_dir)
+    if args.max_requests:
+        get_job_manager().budget.set_limit(args.max_requests)
+    if args.fixed_concurrency:
+        get_job_manager().budget.set_adaptive(False)
+
+    try:
+        client = connect(args)
+    except Exception as e:
+        emit("error", message=f"Login failed: {e}")
+        return EXIT_LOGIN_FAILED
+
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+        emit("metrics", url=f"http://127.0.0.1:{args.metrics_port}/metrics")
+
+    name, target, checkpoint = args.func(args, client)
+    job = run_job(name, target, args.progress_interval, args.report)
+    if args.metrics_file:
+        with open(args.metrics_file, "w", encoding="utf-8") as f:
+            f.write(get_global_metrics().to_prometheus())
+
+    summary = job.result or {}
+    if job.state == CANCELLED:
+        code = EXIT_CANCELLED
+    elif job.state == FAILED:
+        code = EXIT_JOB_FAILED
+        summary = {"error": f"{type(job.error).__name__}: {job.error}"}
+    elif summary.get("failed"):
+        code = EXIT_ITEM_FAILURES
+    else:
+        code = EXIT_OK
+
+    if checkpoint is not None:
+        # Keep the checkpoint around unless everything finished cleanly
+        checkpoint.close(remove=(code == EXIT_OK))
+
+    emit("done", job=name, state=job.state, exit_code=code, elapsed=round(job.elapsed(), 2),
+         report=job.report_path, **summary)
+    return code
+
+
+if __name__ == '__main__':
+    sys.exit(main())